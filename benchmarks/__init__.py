@@ -0,0 +1,4 @@
+"""
+Benchmarks, run from the repository root:
+    PYTHONPATH=src python -m benchmarks.<name>
+"""
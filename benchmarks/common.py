@@ -0,0 +1,23 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# database module reads its settings on import
+os.environ.setdefault("BSO_SQL_PATH", os.path.join(REPO_PATH, "sql"))
+os.environ.setdefault("BSO_DB_PATH", os.path.join(tempfile.gettempdir(), "bso.sqlite3"))
+# slow query log would add EXPLAIN to timings of long benches
+os.environ.setdefault("BSO_SLOW_QUERY_MS", "inf")
+
+import database  # noqa: E402
+
+
+@contextmanager
+def temp_database() -> Iterator[str]:
+    """Yields path of an initialized database, removes it afterwards"""
+    with tempfile.TemporaryDirectory() as dir_:
+        db_path = os.path.join(dir_, "bench.sqlite3")
+        database.init_database(db_path)
+        yield db_path
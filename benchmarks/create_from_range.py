@@ -0,0 +1,51 @@
+"""
+Rows/sec and peak python memory of BlankCRUD.create_from_range
+
+    PYTHONPATH=src python -m benchmarks.create_from_range [sizes...]
+"""
+import sys
+import tracemalloc
+from time import perf_counter
+
+from benchmarks.common import temp_database
+
+import database
+from blanks.crud import BlankCRUD
+from blanks.models import BlankRangeInDTO, MAX_NUMBER
+
+SIZES = (10_000, 1_000_000, MAX_NUMBER)
+
+
+def bench(size: int) -> dict:
+    with temp_database() as db_path:
+        pool = database.ConnectionPool(db_path)
+        crud = BlankCRUD(pool.get_connection)
+        range_ = BlankRangeInDTO(series="AA", start=1, end=size)
+        tracemalloc.start()
+        started = perf_counter()
+        crud.create_from_range(range_)
+        elapsed = perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del crud
+        pool.close()
+    return {
+        "rows": size,
+        "seconds": elapsed,
+        "rows_per_sec": size / elapsed,
+        "peak_kib": peak / 1024,
+    }
+
+
+def main(sizes=SIZES):
+    print(f"{'rows':>10} {'seconds':>9} {'rows/sec':>12} {'peak KiB':>9}")
+    for size in sizes:
+        r = bench(size)
+        print(
+            f"{r['rows']:>10} {r['seconds']:>9.3f} "
+            f"{r['rows_per_sec']:>12.0f} {r['peak_kib']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(i) for i in sys.argv[1:]] or SIZES)
@@ -0,0 +1,50 @@
+"""
+Rows/sec of decoding c_blanks rows into BlankOutDTO,
+validated from_dict path against trusted row_decoder one
+
+    PYTHONPATH=src python -m benchmarks.decode [rows]
+"""
+import sys
+import sqlite3
+from time import perf_counter
+
+from benchmarks.common import temp_database
+
+import database
+from blanks.crud import BlankAdapter, BlankCRUD
+from blanks.models import BlankRangeInDTO
+
+ROWS = 100_000
+
+
+def main(rows: int = ROWS):
+    with temp_database() as db_path:
+        pool = database.ConnectionPool(db_path)
+        crud = BlankCRUD(pool.get_connection)
+        crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=rows))
+        conn = pool.get_connection()
+        conn.execute(
+            "UPDATE blanks SET date = date(created_at) || ' 00:00:00', status = 1, "
+            "updated_at = created_at WHERE number % 2 = 0"
+        )
+
+        started = perf_counter()
+        cur = conn.execute("SELECT * FROM c_blanks")
+        cur.row_factory = sqlite3.Row
+        expected = [BlankAdapter.from_dict(dict(i)) for i in cur]
+        before = perf_counter() - started
+
+        started = perf_counter()
+        result = crud.read()
+        after = perf_counter() - started
+
+        assert all(a.full_compare(b) for a, b in zip(expected, result))
+        print(f"{'path':>12} {'seconds':>9} {'rows/sec':>12}")
+        for name, elapsed in (("from_dict", before), ("row_decoder", after)):
+            print(f"{name:>12} {elapsed:>9.3f} {rows / elapsed:>12.0f}")
+        del crud
+        pool.close()
+
+
+if __name__ == "__main__":
+    main(*[int(i) for i in sys.argv[1:]])
@@ -0,0 +1,88 @@
+"""
+Seeded synthetic ledger, generated inside SQLite
+
+    PYTHONPATH=src python -m benchmarks.ledger <db path> [series] [per series] [seed]
+"""
+import sys
+import sqlite3
+from time import perf_counter
+
+from benchmarks.common import temp_database  # noqa: F401, sets environment
+
+import database
+
+SERIES = 200
+PER_SERIES = 100_000
+SEED = 0
+START = "2023-01-01"
+MONTHS = 24
+
+# Every series gets per_series numbers issued in order over `months`,
+# a month's worth of numbers is created on one day of it.
+# 60% of blanks are used, 5% spoiled, 1% lost, dated within about
+# 4 months after creation and mostly in the first weeks, 0.5% are
+# soft deleted. h1..h3 are independent per row hashes mixed with seed
+LEDGER_QUERY = (
+    "WITH RECURSIVE n(x) AS "
+    "(SELECT 0 UNION ALL SELECT x+1 FROM n WHERE x < :rows - 1) "
+    "INSERT INTO blanks(series, number, created_at, date, status, deleted_at) "
+    "SELECT series, number, created_at, "
+    "CASE WHEN status > 0 THEN date(created_at, "
+    "'+' || ((h2 % 121) * (h2 / 121 % 121) / 120) || ' days') || ' 00:00:00' "
+    "END, "
+    "status, "
+    "CASE WHEN h3 < 5 THEN datetime(created_at, '+1 days') END "
+    "FROM (SELECT *, "
+    "CASE WHEN h1 % 100 < 60 THEN 1 WHEN h1 % 100 < 65 THEN 2 "
+    "WHEN h1 % 100 < 66 THEN 3 ELSE 0 END AS status "
+    "FROM (SELECT "
+    "char(65 + x / :per_series / 26, 65 + x / :per_series % 26) AS series, "
+    "x % :per_series + 1 AS number, "
+    "datetime(:start, "
+    "'+' || (x % :per_series * :months / :per_series) || ' months', "
+    "'+' || ((x / :per_series * 7 + x % :per_series * :months / :per_series) "
+    "% 28) || ' days', '+9 hours') AS created_at, "
+    "((x + :seed) * 2654435761) % 1000003 AS h1, "
+    "((x + :seed) * 40503 + 12345) % 999983 AS h2, "
+    "((x + :seed) * 69069 + 1) % 1000 AS h3 "
+    "FROM n))"
+)
+
+
+def generate_ledger(
+    conn: sqlite3.Connection,
+    series: int = SERIES,
+    per_series: int = PER_SERIES,
+    seed: int = SEED,
+    start: str = START,
+    months: int = MONTHS
+) -> int:
+    """Insert series * per_series blanks, same seed gives same rows"""
+    if series > 26 * 26:
+        raise ValueError("at most 676 two letter series")
+    rows = series * per_series
+    with database.transaction(conn):
+        conn.execute(
+            LEDGER_QUERY,
+            {
+                "rows": rows,
+                "per_series": per_series,
+                "seed": seed,
+                "start": start,
+                "months": months,
+            }
+        )
+    return rows
+
+
+def main(db_path: str, *args: str):
+    database.init_database(db_path)
+    conn = database.configure_connection(database.get_connection(db_path))
+    started = perf_counter()
+    rows = generate_ledger(conn, *[int(i) for i in args])
+    print(f"generated {rows} rows in {perf_counter() - started:.1f}s")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
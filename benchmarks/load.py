@@ -0,0 +1,311 @@
+"""
+HTTP load test: serves main:app with uvicorn on a temporary synthetic
+ledger and drives mixed traffic from keep-alive clients
+
+    PYTHONPATH=src python -m benchmarks.load [--concurrency 16]
+        [--duration 30] [--mix lookup=50,create=5,patch=30,report=15]
+        [--workers 1] [--series 20] [--per-series 100000] [--output path]
+
+Server settings (BSO_DB_POOL_SIZE, BSO_DB_WORKERS, ...) are inherited
+from environment, results are printed per route and saved with --output
+"""
+import os
+import sys
+import json
+import random
+import socket
+import argparse
+import datetime
+import itertools
+import statistics
+import subprocess
+import threading
+import http.client
+from time import perf_counter, sleep
+from typing import Optional
+
+from benchmarks.common import REPO_PATH, temp_database
+from benchmarks.ledger import PER_SERIES, SEED, START, MONTHS
+from benchmarks.ledger import generate_ledger
+from benchmarks.suite import SERIES, commit
+
+import database
+
+CONCURRENCY = 16
+DURATION = 30.0
+MIX = "lookup=50,create=5,patch=30,report=15"
+CREATE_SIZE = 100
+STARTUP_TIMEOUT = 60.0
+
+# (method, route template) of every operation, results are keyed by them
+ROUTES = {
+    "lookup": ("GET", "/blank"),
+    "create": ("POST", "/blank"),
+    "patch": ("PATCH", "/blank"),
+    "report": ("GET", "/report"),
+}
+
+Request = tuple[str, str, Optional[dict]]
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    """lookup=50,create=5 -> {"lookup": 50, "create": 5}"""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ROUTES or not weight.isdigit():
+            raise ValueError(f"expected <{'|'.join(ROUTES)}>=<weight>, got {item!r}")
+        weights[name] = int(weight)
+    if not any(weights.values()):
+        raise ValueError("mix has no operations")
+    return weights
+
+
+class Traffic:
+    """Builds requests against a ledger of series * per_series blanks"""
+
+    def __init__(self, series: int, per_series: int):
+        self.series = series
+        self.per_series = per_series
+        # created ranges go to series counted down from ZZ, out of ledger
+        self._created = itertools.count()
+        first = int(START[:4]) * 12 + int(START[5:7]) - 1
+        self._months = [divmod(i, 12) for i in range(first, first + MONTHS)]
+
+    def _series(self, index: int) -> str:
+        return chr(65 + index // 26) + chr(65 + index % 26)
+
+    def lookup(self, rand: random.Random) -> Request:
+        if rand.random() < 0.5:
+            return "GET", f"/blank?blank_id={self._id(rand)}", None
+        series = self._series(rand.randrange(self.series))
+        number = rand.randint(1, self.per_series)
+        return "GET", f"/blank?number={series}{number}", None
+
+    def create(self, rand: random.Random) -> Request:
+        ranges = 10**6 // CREATE_SIZE
+        index, slot = divmod(next(self._created), ranges)
+        if index >= 26 * 26 - self.series:
+            raise RuntimeError("out of series for created ranges")
+        start = slot * CREATE_SIZE + 1
+        return "POST", "/blank", {
+            "series": self._series(26 * 26 - 1 - index),
+            "start": start,
+            "end": start + CREATE_SIZE - 1,
+        }
+
+    def patch(self, rand: random.Random) -> Request:
+        return "PATCH", "/blank", {
+            "id": self._id(rand),
+            "comment": f"load {rand.randrange(10**6)}",
+        }
+
+    def report(self, rand: random.Random) -> Request:
+        year, month = rand.choice(self._months)
+        return "GET", f"/report?year={year}&month={month + 1}", None
+
+    def _id(self, rand: random.Random) -> int:
+        return rand.randint(1, self.series * self.per_series)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(
+    db_path: str,
+    logs_path: str,
+    port: int,
+    workers: int
+) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "BSO_DB_PATH": db_path,
+        "BSO_LOGS_PATH": logs_path,
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "30"),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=os.path.join(REPO_PATH, "src"),
+        env=env
+    )
+
+
+def wait_ready(server: subprocess.Popen, port: int):
+    deadline = perf_counter() + STARTUP_TIMEOUT
+    while perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+        try:
+            conn.request("GET", "/report/cache")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        sleep(0.1)
+    raise RuntimeError(f"server is not ready in {STARTUP_TIMEOUT}s")
+
+
+def client(
+    port: int,
+    traffic: Traffic,
+    weights: dict[str, int],
+    seed: int,
+    deadline: float,
+    samples: list[tuple[str, int, float]]
+):
+    """Sends requests over one keep-alive connection until deadline"""
+    rand = random.Random(seed)
+    names, cum_weights = list(weights), list(itertools.accumulate(weights.values()))
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        while perf_counter() < deadline:
+            name = rand.choices(names, cum_weights=cum_weights)[0]
+            method, url, body = getattr(traffic, name)(rand)
+            started = perf_counter()
+            try:
+                if body is None:
+                    conn.request(method, url)
+                else:
+                    conn.request(
+                        method, url, json.dumps(body),
+                        {"Content-Type": "application/json"}
+                    )
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                # counted as an error, reconnects on the next request
+                conn.close()
+                status = 0
+            samples.append((name, status, perf_counter() - started))
+    finally:
+        conn.close()
+
+
+def summarize(samples: list[tuple[str, int, float]], elapsed: float) -> dict:
+    """
+    count, errors, throughput and latency percentiles (ms) per route.
+    Errors are 5xx and failed connections, ledger has soft deleted rows
+    so some lookups and patches get 404
+    """
+    by_route: dict[str, list[tuple[int, float]]] = {}
+    for name, status, seconds in samples:
+        route = " ".join(ROUTES[name])
+        by_route.setdefault(route, []).append((status, seconds))
+    by_route["total"] = [i for items in by_route.values() for i in items]
+    results = {}
+    for route, items in by_route.items():
+        seconds = sorted(i[1] * 1000 for i in items)
+        cuts = statistics.quantiles(seconds, n=100, method="inclusive") \
+            if len(seconds) > 1 else seconds * 99
+        results[route] = {
+            "requests": len(items),
+            "errors": sum(1 for status, _ in items if not 0 < status < 500),
+            "rps": len(items) / elapsed,
+            "p50": cuts[49],
+            "p95": cuts[94],
+            "p99": cuts[98],
+            "max": seconds[-1],
+        }
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--mix", default=MIX)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn")
+    parser.add_argument("--series", type=int, default=SERIES)
+    parser.add_argument("--per-series", type=int, default=PER_SERIES)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", help="JSON results path")
+    args = parser.parse_args(argv)
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with temp_database() as db_path:
+        conn = database.configure_connection(database.get_connection(db_path))
+        started = perf_counter()
+        rows = generate_ledger(conn, args.series, args.per_series, args.seed)
+        conn.close()
+        print(f"generated {rows} rows in {perf_counter() - started:.1f}s")
+
+        logs_path = os.path.join(os.path.dirname(db_path), "logs")
+        os.makedirs(logs_path)
+        port = free_port()
+        server = start_server(db_path, logs_path, port, args.workers)
+        try:
+            wait_ready(server, port)
+            traffic = Traffic(args.series, args.per_series)
+            samples: list[tuple[str, int, float]] = []
+            started = perf_counter()
+            deadline = started + args.duration
+            threads = [
+                threading.Thread(
+                    target=client,
+                    args=(
+                        port, traffic, weights, args.seed + i, deadline, samples
+                    )
+                )
+                for i in range(args.concurrency)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait()
+
+    results = summarize(samples, elapsed)
+    print(
+        f"{'route':<14} {'requests':>9} {'errors':>7} {'rps':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+    for route, result in results.items():
+        print(
+            f"{route:<14} {result['requests']:>9} {result['errors']:>7} "
+            f"{result['rps']:>9.1f} {result['p50']:>8.2f} "
+            f"{result['p95']:>8.2f} {result['p99']:>8.2f} {result['max']:>8.2f}"
+        )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "commit": commit(),
+                    "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+                    "settings": {
+                        **{
+                            k: v for k, v in os.environ.items()
+                            if k.startswith("BSO_")
+                            and k not in ("BSO_DB_PATH", "BSO_LOGS_PATH")
+                        },
+                        **{k: v for k, v in vars(args).items() if k != "output"},
+                    },
+                    "duration": elapsed,
+                    "results": results,
+                },
+                file,
+                indent=2
+            )
+        print(f"saved {args.output}")
+    return 1 if results["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+ReportService.get_report, with and without snapshots, against clean
+ranges queried from the whole history on a large ledger
+
+    PYTHONPATH=src python -m benchmarks.report [rows]
+"""
+import sys
+import datetime
+from time import perf_counter
+
+from benchmarks.common import temp_database
+from benchmarks.ledger import generate_ledger
+
+import database
+from blanks.crud import BlankCRUD
+from blanks.models import BlankRangeUpdateDTO
+from report_service import ReportService
+
+ROWS = 5_000_000
+PER_SERIES = 100_000
+MONTHS = ((2023, 1), (2023, 12), (2024, 6), (2024, 12))
+
+
+def timed(func, *args):
+    started = perf_counter()
+    result = func(*args)
+    return perf_counter() - started, result
+
+
+def main(rows: int = ROWS):
+    with temp_database() as db_path:
+        pool = database.ConnectionPool(db_path)
+        conn = pool.get_connection()
+        elapsed, rows = timed(
+            generate_ledger,
+            conn,
+            max(rows // PER_SERIES, 1),
+            min(PER_SERIES, rows)
+        )
+        print(f"generated {rows} rows in {elapsed:.1f}s")
+        # closes are saved at once instead of being queued to a writer
+        report_service = ReportService(
+            pool.get_connection,
+            on_close=lambda *args: report_service.save_closes(*args)
+        )
+        print(
+            f"{'month':>8} {'no snapshot':>12} {'snapshot':>9} "
+            f"{'history':>8}"
+        )
+        for year, month in MONTHS:
+            # month_closes is emptied to time a report without snapshots
+            conn.execute("DELETE FROM month_closes")
+            cold, report = timed(report_service.get_report, year, month)
+            warm, _ = timed(report_service.get_report, year, month)
+            history, expected = timed(
+                report_service._get_report_by_category, year, month
+            )
+            assert repr(report) == repr(expected)
+            print(
+                f"{year}-{month:02} {cold:>11.2f}s {warm:>8.2f}s "
+                f"{history:>7.2f}s"
+            )
+        # back-dated update drops 2024-11 and later snapshots,
+        # 2024-11 is rolled forward from 2024-10 one
+        report_service.get_report(2024, 10)
+        series, number = conn.execute(
+            "SELECT series, number FROM c_blanks "
+            "WHERE date IS NULL AND created_at < '2024-11-01' LIMIT 1"
+        ).fetchone()
+        BlankCRUD(pool.get_connection).update_range(
+            BlankRangeUpdateDTO(
+                series=series,
+                start=number,
+                end=number,
+                date=datetime.date(2024, 11, 15)
+            )
+        )
+        rolled, _ = timed(report_service.get_report, 2024, 12)
+        print(f"2024-12 after back-dated update in 2024-11: {rolled:.2f}s")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main(*[int(i) for i in sys.argv[1:]])
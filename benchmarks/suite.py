@@ -0,0 +1,242 @@
+"""
+Hot path benchmarks on a synthetic ledger, results are stored as JSON
+named after the current commit to compare them between commits
+
+    PYTHONPATH=src python -m benchmarks.suite [--series 200] [--per-series 100000]
+        [--seed 0] [--repeat 5] [--output path] [--compare path]
+
+With --compare exits with 1 if a median got slower than --threshold times
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import platform
+import datetime
+import statistics
+import subprocess
+from time import perf_counter
+from typing import Callable, Optional
+
+from benchmarks.common import REPO_PATH, temp_database
+from benchmarks.ledger import PER_SERIES, SEED, generate_ledger
+
+import database
+from blanks.crud import BlankCRUD
+from blanks.models import BlankBatchDTO, BlankRangeInDTO
+from blanks.models import BlankRangeUpdateDTO, BlankUpdateDTO
+from report_service import ReportService
+
+SERIES = 20
+REPEAT = 5
+THRESHOLD = 1.25
+RESULTS_PATH = os.path.join(REPO_PATH, "benchmarks", "results")
+
+Bench = tuple[Optional[Callable[[], None]], Callable[[], None]]
+
+
+def commit() -> str:
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_PATH, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=REPO_PATH, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{sha}-dirty" if dirty else sha
+
+
+def benches(
+    conn: sqlite3.Connection,
+    crud: BlankCRUD,
+    report_service: ReportService,
+    per_series: int
+) -> dict[str, Bench]:
+    """name: (setup, run), only run is timed"""
+    middle = per_series // 2
+    after = conn.execute(
+        "SELECT id FROM blanks WHERE series = 'AB' AND number = ?", (middle,)
+    ).fetchone()[0]
+    day = conn.execute(
+        "SELECT date FROM blanks WHERE date IS NOT NULL AND id > ? LIMIT 1",
+        (after,)
+    ).fetchone()[0]
+    new_series = iter(
+        f"{chr(first)}{chr(second)}"
+        for first in range(ord("Z"), ord("A"), -1)
+        for second in range(ord("A"), ord("Z") + 1)
+    )
+    updated = iter(range(1, 10**9))
+    batch = BlankBatchDTO.model_validate({
+        "operations": [
+            {"op": "update", "id": after + i, "comment": "batch"}
+            for i in range(100)
+        ]
+    })
+
+    def clear_snapshots():
+        conn.execute("DELETE FROM month_closes")
+
+    return {
+        "report.history": (
+            None, lambda: report_service._get_report_by_category(2024, 6)
+        ),
+        "report.no_snapshot": (
+            clear_snapshots, lambda: report_service.get_report(2024, 6)
+        ),
+        "report.snapshot": (None, lambda: report_service.get_report(2024, 6)),
+        "report_period.no_snapshot": (
+            clear_snapshots,
+            lambda: report_service.get_period_reports(2024, 1, 2024, 6)
+        ),
+        "report_period.snapshot": (
+            None, lambda: report_service.get_period_reports(2024, 1, 2024, 6)
+        ),
+        "read_with_filter.date": (
+            None, lambda: crud.read_with_filter("WHERE date = ?", (day,), 100)
+        ),
+        "read_with_filter.like": (
+            None,
+            lambda: crud.read_with_filter(
+                "WHERE series||number LIKE ?", ("A_1%5",), 100
+            )
+        ),
+        "read_page.middle": (None, lambda: crud.read_page(100, after)),
+        "search.exact": (None, lambda: crud.search(f"AB{middle}")),
+        "search.prefix": (None, lambda: crud.search("AB5%", 100)),
+        "read_page.10k": (None, lambda: crud.read_page(10_000)),
+        "create_from_range.100k": (
+            None,
+            lambda: crud.create_from_range(
+                BlankRangeInDTO(series=next(new_series), start=1, end=100_000)
+            )
+        ),
+        "update": (
+            None,
+            lambda: crud.update(
+                BlankUpdateDTO(id=after + next(updated), comment="update")
+            )
+        ),
+        "update_range.1k": (
+            None,
+            lambda: crud.update_range(
+                BlankRangeUpdateDTO(
+                    series="AC", start=middle, end=middle + 999, comment="range"
+                )
+            )
+        ),
+        "batch.100": (None, lambda: crud.batch(batch.operations)),
+    }
+
+
+def run(
+    setup: Optional[Callable[[], None]],
+    func: Callable,
+    repeat: int
+) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = perf_counter()
+        func()
+        seconds.append(perf_counter() - started)
+    return {
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+        "runs": repeat,
+    }
+
+
+def compare(results: dict, baseline_path: str, threshold: float) -> bool:
+    """Print median ratios against baseline, false on a regression"""
+    with open(baseline_path) as file:
+        baseline = json.load(file)
+    print(
+        f"\n{'vs ' + baseline['commit']:<24} "
+        f"{'before':>10} {'after':>10} {'ratio':>7}"
+    )
+    ok = True
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["median"]
+        ratio = result["median"] / before
+        flag = " slower" if ratio > threshold else ""
+        ok = ok and not flag
+        print(
+            f"{name:<24} {before:>10.5f} {result['median']:>10.5f} "
+            f"{ratio:>7.2f}{flag}"
+        )
+    return ok
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=SERIES)
+    parser.add_argument("--per-series", type=int, default=PER_SERIES)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--output", help="default results/<commit>.json")
+    parser.add_argument("--compare", help="results of another commit")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args(argv)
+    if args.series < 3:
+        parser.error("benches use series AA, AB and AC")
+
+    with temp_database() as db_path:
+        pool = database.ConnectionPool(db_path)
+        conn = pool.get_connection()
+        started = perf_counter()
+        rows = generate_ledger(conn, args.series, args.per_series, args.seed)
+        print(f"generated {rows} rows in {perf_counter() - started:.1f}s")
+        crud = BlankCRUD(pool.get_connection)
+        # closes are saved at once instead of being queued to a writer
+        report_service = ReportService(
+            pool.get_connection,
+            on_close=lambda *args: report_service.save_closes(*args)
+        )
+
+        results = {}
+        print(f"{'bench':<24} {'min':>10} {'median':>10}")
+        for name, (setup, func) in benches(
+            conn, crud, report_service, args.per_series
+        ).items():
+            results[name] = run(setup, func, args.repeat)
+            print(
+                f"{name:<24} {results[name]['min']:>10.5f} "
+                f"{results[name]['median']:>10.5f}"
+            )
+        del crud
+        pool.close()
+
+    results = {
+        "commit": commit(),
+        "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "ledger": {
+            "series": args.series,
+            "per_series": args.per_series,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    output = args.output or \
+        os.path.join(RESULTS_PATH, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"saved {output}")
+    if args.compare and not compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,4 +12,4 @@ CREATE TABLE IF NOT EXISTS blanks (
 	CONSTRAINT unique_num_ser UNIQUE(number, series)
 );
 
-CREATE VIEW IF NOT EXISTS c_blanks AS SELECT * FROM blanks WHERE deleted_at IS NULL;
\ No newline at end of file
+CREATE VIEW IF NOT EXISTS c_blanks AS SELECT * FROM blanks WHERE deleted_at IS NULL;
@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS idx_blanks_series_number ON blanks(series, number);
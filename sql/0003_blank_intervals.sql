@@ -0,0 +1,30 @@
+CREATE TABLE IF NOT EXISTS blank_intervals (
+	id          INTEGER NOT NULL,
+	series      TEXT NOT NULL,
+	start       INTEGER NOT NULL,
+	end         INTEGER NOT NULL CHECK(start <= end AND end <= 9999999),
+	date        TEXT,
+	comment     TEXT,
+	status      INTEGER DEFAULT 0,
+	created_at  TEXT DEFAULT CURRENT_TIMESTAMP,
+	updated_at  TEXT,
+	deleted_at  TEXT,
+	CONSTRAINT pk_interval_id PRIMARY KEY(id AUTOINCREMENT),
+	CONSTRAINT unique_ser_start UNIQUE(series, start)
+);
+
+CREATE VIEW IF NOT EXISTS c_blank_intervals AS SELECT * FROM blank_intervals WHERE deleted_at IS NULL;
+
+-- per-number projection of c_blank_intervals, same columns as c_blanks
+CREATE VIEW IF NOT EXISTS c_interval_blanks AS
+WITH RECURSIVE numbers(id, number, interval_id, end) AS (
+	SELECT
+		(unicode(substr(series, 1, 1))*65536 + unicode(substr(series, 2, 1)))*10000000 + start,
+		start, id, end
+	FROM c_blank_intervals
+	UNION ALL
+	SELECT id + 1, number + 1, interval_id, end FROM numbers WHERE number < end
+)
+SELECT n.id, n.number, i.series, i.date, i.comment, i.status, i.created_at, i.updated_at, i.deleted_at
+FROM numbers AS n JOIN blank_intervals AS i ON i.id = n.interval_id
+ORDER BY n.id;
@@ -0,0 +1,15 @@
+-- covering indexes for report_service.Queries and IntervalQueries,
+-- deleted_at is always NULL there but keeps the view filter covered
+CREATE INDEX IF NOT EXISTS idx_blanks_status_date
+	ON blanks(status, date, series, number, deleted_at)
+	WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_blanks_created_at
+	ON blanks(created_at, date, series, number, deleted_at)
+	WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_blank_intervals_status_date
+	ON blank_intervals(status, date, series, start, end, deleted_at)
+	WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_blank_intervals_created_at
+	ON blank_intervals(created_at, date, series, start, end, deleted_at)
+	WHERE deleted_at IS NULL;
@@ -0,0 +1,11 @@
+-- Queries.report also reads status of rows found by created_at,
+-- rebuild created_at indexes with it to keep them covering
+DROP INDEX IF EXISTS idx_blanks_created_at;
+CREATE INDEX idx_blanks_created_at
+	ON blanks(created_at, date, status, series, number, deleted_at)
+	WHERE deleted_at IS NULL;
+
+DROP INDEX IF EXISTS idx_blank_intervals_created_at;
+CREATE INDEX idx_blank_intervals_created_at
+	ON blank_intervals(created_at, date, status, series, start, end, deleted_at)
+	WHERE deleted_at IS NULL;
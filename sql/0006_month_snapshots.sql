@@ -0,0 +1,89 @@
+-- closing clean ranges of closed months, see ReportService.get_report;
+-- month is its first day, 'YYYY-MM-01'
+CREATE TABLE IF NOT EXISTS month_closes (
+	month       TEXT NOT NULL PRIMARY KEY,
+	closed_at   TEXT DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+-- ranges are packed int64 (start, end) pairs, see report_service
+CREATE TABLE IF NOT EXISTS month_snapshots (
+	month       TEXT NOT NULL,
+	series      TEXT NOT NULL,
+	ranges      BLOB NOT NULL,
+	PRIMARY KEY(month, series)
+) WITHOUT ROWID;
+
+-- movements of a month are rows dated or created in it
+CREATE INDEX IF NOT EXISTS idx_blanks_date
+	ON blanks(date, created_at, status, series, number, deleted_at)
+	WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_blank_intervals_date
+	ON blank_intervals(date, created_at, status, series, start, end, deleted_at)
+	WHERE deleted_at IS NULL;
+
+-- a blank is clean at the end of month M if it is created before M ends
+-- and not dated before M ends, so changing its date invalidates closes
+-- from the month of the earlier date, changing created_at or deleted_at
+-- from the month of the earlier created_at
+CREATE TRIGGER IF NOT EXISTS trg_blanks_date_closes
+AFTER UPDATE OF date ON blanks
+WHEN old.date IS NOT new.date
+BEGIN
+	DELETE FROM month_closes WHERE month >= substr(
+		min(coalesce(old.date, new.date), coalesce(new.date, old.date)), 1, 7
+	) || '-01';
+	DELETE FROM month_snapshots WHERE month >= substr(
+		min(coalesce(old.date, new.date), coalesce(new.date, old.date)), 1, 7
+	) || '-01';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_blanks_created_closes
+AFTER UPDATE OF created_at, deleted_at ON blanks
+WHEN old.created_at IS NOT new.created_at OR old.deleted_at IS NOT new.deleted_at
+BEGIN
+	DELETE FROM month_closes WHERE month >= substr(min(
+		coalesce(old.created_at, new.created_at),
+		coalesce(new.created_at, old.created_at)
+	), 1, 7) || '-01';
+	DELETE FROM month_snapshots WHERE month >= substr(min(
+		coalesce(old.created_at, new.created_at),
+		coalesce(new.created_at, old.created_at)
+	), 1, 7) || '-01';
+END;
+
+-- inserts are tracked by 0009_month_closes_insert_triggers
+CREATE TRIGGER IF NOT EXISTS trg_blanks_delete_closes
+AFTER DELETE ON blanks
+WHEN old.deleted_at IS NULL
+BEGIN
+	DELETE FROM month_closes WHERE month >= substr(old.created_at, 1, 7) || '-01';
+	DELETE FROM month_snapshots WHERE month >= substr(old.created_at, 1, 7) || '-01';
+END;
+
+-- interval splits and merges copy rows without changing any number,
+-- so only updates are tracked there
+CREATE TRIGGER IF NOT EXISTS trg_blank_intervals_date_closes
+AFTER UPDATE OF date ON blank_intervals
+WHEN old.date IS NOT new.date
+BEGIN
+	DELETE FROM month_closes WHERE month >= substr(
+		min(coalesce(old.date, new.date), coalesce(new.date, old.date)), 1, 7
+	) || '-01';
+	DELETE FROM month_snapshots WHERE month >= substr(
+		min(coalesce(old.date, new.date), coalesce(new.date, old.date)), 1, 7
+	) || '-01';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_blank_intervals_created_closes
+AFTER UPDATE OF created_at, deleted_at ON blank_intervals
+WHEN old.created_at IS NOT new.created_at OR old.deleted_at IS NOT new.deleted_at
+BEGIN
+	DELETE FROM month_closes WHERE month >= substr(min(
+		coalesce(old.created_at, new.created_at),
+		coalesce(new.created_at, old.created_at)
+	), 1, 7) || '-01';
+	DELETE FROM month_snapshots WHERE month >= substr(min(
+		coalesce(old.created_at, new.created_at),
+		coalesce(new.created_at, old.created_at)
+	), 1, 7) || '-01';
+END;
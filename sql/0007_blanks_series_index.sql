@@ -0,0 +1,5 @@
+-- (series, rowid) order for keyset pages filtered by series,
+-- see BlankCRUD.read_with_filter
+CREATE INDEX IF NOT EXISTS idx_blanks_series
+	ON blanks(series)
+	WHERE deleted_at IS NULL;
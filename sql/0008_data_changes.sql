@@ -0,0 +1,12 @@
+-- log of committed writes, a row per write transaction of BlankCRUD,
+-- since is the earliest date or created_at it touched, NULL if unknown.
+-- Report caches of every process drop months from since onwards by the
+-- rows newer than the version they have seen, see report_cache.
+-- BlankCRUD drops month_closes and month_snapshots from since onwards
+-- in the same transaction. Writes made outside BlankCRUD should do both
+-- too, e.g. INSERT INTO data_changes(since) VALUES(NULL) and
+-- DELETE FROM month_closes; DELETE FROM month_snapshots
+CREATE TABLE IF NOT EXISTS data_changes (
+	version     INTEGER PRIMARY KEY AUTOINCREMENT,
+	since       TEXT
+);
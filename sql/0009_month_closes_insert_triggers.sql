@@ -0,0 +1,36 @@
+-- rows created by the app are never in a closed month, but imported or
+-- hand-made ones may be back-dated: a new row drops closes from the
+-- month of its earlier created_at or date, if that month is closed.
+-- The guard is one lookup of the last close, so range inserts into open
+-- months only pay for it
+CREATE TRIGGER IF NOT EXISTS trg_blanks_insert_closes
+AFTER INSERT ON blanks
+WHEN min(new.created_at, coalesce(new.date, new.created_at))
+	< (SELECT date(max(month), '+1 month') FROM month_closes)
+BEGIN
+	DELETE FROM month_closes WHERE month >= substr(
+		min(new.created_at, coalesce(new.date, new.created_at)), 1, 7
+	) || '-01';
+	DELETE FROM month_snapshots WHERE month >= substr(
+		min(new.created_at, coalesce(new.date, new.created_at)), 1, 7
+	) || '-01';
+END;
+
+-- a split copies the rest of an interval, which still covers the copy
+-- when it is inserted, so only intervals of new numbers are tracked
+CREATE TRIGGER IF NOT EXISTS trg_blank_intervals_insert_closes
+AFTER INSERT ON blank_intervals
+WHEN min(new.created_at, coalesce(new.date, new.created_at))
+	< (SELECT date(max(month), '+1 month') FROM month_closes)
+	AND NOT EXISTS (
+		SELECT 1 FROM blank_intervals
+		WHERE series = new.series AND start < new.start AND end >= new.start
+	)
+BEGIN
+	DELETE FROM month_closes WHERE month >= substr(
+		min(new.created_at, coalesce(new.date, new.created_at)), 1, 7
+	) || '-01';
+	DELETE FROM month_snapshots WHERE month >= substr(
+		min(new.created_at, coalesce(new.date, new.created_at)), 1, 7
+	) || '-01';
+END;
@@ -0,0 +1,12 @@
+-- status of rows found by created_at is read only by Queries.movements
+-- of period reports, which looks those rows up instead, so the indexes
+-- every write keeps are back to the narrower ones of 0004
+DROP INDEX IF EXISTS idx_blanks_created_at;
+CREATE INDEX idx_blanks_created_at
+	ON blanks(created_at, date, series, number, deleted_at)
+	WHERE deleted_at IS NULL;
+
+DROP INDEX IF EXISTS idx_blank_intervals_created_at;
+CREATE INDEX idx_blank_intervals_created_at
+	ON blank_intervals(created_at, date, series, start, end, deleted_at)
+	WHERE deleted_at IS NULL;
@@ -0,0 +1,15 @@
+-- month closes are dropped once per write transaction, from the month of
+-- its data_changes.since, see BlankCRUD._log_change, instead of by row
+-- triggers on every changed, deleted or inserted row
+DROP TRIGGER IF EXISTS trg_blanks_date_closes;
+DROP TRIGGER IF EXISTS trg_blanks_created_closes;
+DROP TRIGGER IF EXISTS trg_blanks_delete_closes;
+DROP TRIGGER IF EXISTS trg_blanks_insert_closes;
+DROP TRIGGER IF EXISTS trg_blank_intervals_date_closes;
+DROP TRIGGER IF EXISTS trg_blank_intervals_created_closes;
+DROP TRIGGER IF EXISTS trg_blank_intervals_insert_closes;
+
+-- rows dated in a month are found by the (status, date) indexes of 0004,
+-- see report_service._ANY_STATUS
+DROP INDEX IF EXISTS idx_blanks_date;
+DROP INDEX IF EXISTS idx_blank_intervals_date;
@@ -0,0 +1,6 @@
+-- the partial index of 0007 covers every row c_blanks returns, so full
+-- listings scanned it in (series, id) order instead of the table in id
+-- order, a full index is only picked for series = ? filters
+DROP INDEX IF EXISTS idx_blanks_series;
+CREATE INDEX idx_blanks_series
+	ON blanks(series);
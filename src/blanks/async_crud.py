@@ -0,0 +1,130 @@
+import os
+import asyncio
+import logging
+import sqlite3
+import threading
+from functools import partial
+from typing import Any, Callable, Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from blanks.crud import BlankCRUD
+from blanks.writer import BlankWriter
+from blanks.models import BlankOutDTO, BlankRangeInDTO, BlankUpdateDTO
+from blanks.models import BlankOperation, BlankRangeUpdateDTO
+
+DB_WORKERS = int(os.environ.get("BSO_DB_WORKERS", 4))
+
+
+class AsyncBlankCRUD:
+    """
+    Awaitable facade over BlankCRUD.
+
+    Calls run on a bounded thread pool, every worker thread owns its own
+    BlankCRUD and therefore its own connection, so the event loop never
+    blocks on SQLite. Writes go through a single BlankWriter instead,
+    so they never wait for each other on SQLite locks.
+    """
+    def __init__(
+        self,
+        get_connection: Callable[[], sqlite3.Connection],
+        max_workers: int = DB_WORKERS,
+        crud_class: type[BlankCRUD] = BlankCRUD,
+        on_change: Optional[Callable[[Optional[str]], Any]] = None
+    ):
+        self._get_connection = get_connection
+        self._crud_class = crud_class
+        self._on_change = on_change
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="blanks"
+        )
+        self.writer = BlankWriter(get_connection, crud_class, on_change)
+        self._logger = logging.getLogger("blanks.AsyncCRUD")
+
+    def _crud(self) -> BlankCRUD:
+        crud = getattr(self._local, "crud", None)
+        if crud is None:
+            crud = self._local.crud = self._crud_class(
+                self._get_connection,
+                self._on_change
+            )
+        return crud
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run any blocking callable on the CRUD thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            partial(func, *args, **kwargs)
+        )
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        return await self.run(
+            lambda: getattr(self._crud(), method)(*args, **kwargs)
+        )
+
+    async def create_from_range(self, range_: BlankRangeInDTO) -> None:
+        await self.writer.call("create_from_range", range_)
+
+    async def read_with_filter(
+        self,
+        raw_filter: str = "",
+        params: Iterable | dict = tuple(),
+        limit: Optional[int] = None,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        return await self._call(
+            "read_with_filter", raw_filter, params, limit, after
+        )
+
+    async def read_page(
+        self,
+        limit: int,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        return await self._call("read_page", limit, after)
+
+    async def search(
+        self,
+        pattern: str,
+        limit: Optional[int] = None,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        return await self._call("search", pattern, limit, after)
+
+    async def read(self) -> list[BlankOutDTO]:
+        return await self._call("read")
+
+    async def get(self, id: int) -> Optional[BlankOutDTO]:
+        return await self._call("get", id)
+
+    async def update(self, updates: BlankUpdateDTO) -> bool:
+        return await self.writer.call("update", updates)
+
+    async def delete(self, id: int) -> bool:
+        return await self.writer.call("delete", id)
+
+    async def update_range(
+        self,
+        updates: BlankRangeUpdateDTO
+    ) -> tuple[int, list[tuple[int, int]]]:
+        return await self.writer.call("update_range", updates)
+
+    async def delete_range(
+        self,
+        range_: BlankRangeInDTO
+    ) -> tuple[int, list[tuple[int, int]]]:
+        return await self.writer.call("delete_range", range_)
+
+    async def batch(
+        self,
+        operations: list[BlankOperation],
+        atomic: bool = False
+    ) -> tuple[bool, list[Optional[str]]]:
+        return await self.writer.call("batch", operations, atomic)
+
+    def shutdown(self):
+        self.writer.close()
+        self._executor.shutdown()
+        self._logger.info("executor shutdown")
@@ -4,15 +4,27 @@ import datetime
 from typing import Annotated
 
 from abc import ABC
-from typing import Any, Callable, Iterable, Optional
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Iterable, Iterator, Optional
 
 from blanks.models import BlankStatus 
 from blanks.models import BlankOutDTO 
 from blanks.models import BlankInDTO, BlankRangeInDTO 
+from blanks.models import BlankRangeUpdateDTO
+from blanks.models import BlankCreateOperation, BlankOperation
+from blanks.models import BlankUpdateOperation
 from blanks.models import BlankUpdateDTO, Undefined
+from blanks.search import number_filter, parse_number_pattern
+from database import LazyParams, transaction
+from metrics import metered
 
 DictCursor = Annotated[sqlite3.Cursor, "sqlite3.Row"]
 
+# data_changes pruning, see BlankCRUD._log_change
+DATA_CHANGES_PRUNE = 1000
+DATA_CHANGES_KEPT = 10_000
+
 
 class BlankAdapter(ABC):
     _date_format = "%Y-%m-%d %H:%M:%S"
@@ -45,20 +57,110 @@ class BlankAdapter(ABC):
             dict_["status"] = BlankStatus(status)
         return BlankOutDTO(**dict_)
 
+    @staticmethod
+    def _construct(values: dict) -> BlankOutDTO:
+        """
+        Same as BlankOutDTO.model_construct for values of every field in
+        field order, without its per-field python loop. Sets pydantic
+        slots by hand, crud_test.test_construct pins them to the
+        installed pydantic
+        """
+        blank = BlankOutDTO.__new__(BlankOutDTO)
+        object.__setattr__(blank, "__dict__", values)
+        object.__setattr__(blank, "__pydantic_fields_set__", set(values))
+        object.__setattr__(blank, "__pydantic_extra__", None)
+        object.__setattr__(blank, "__pydantic_private__", None)
+        return blank
+
+    @staticmethod
+    def row_decoder(
+        columns: Iterable[str]
+    ) -> Callable[[tuple], BlankOutDTO]:
+        """
+        from_dict for tuple rows of our own database with given columns,
+        values are known to be valid so pydantic validation is skipped
+        """
+        positions = {name: i for i, name in enumerate(columns)}
+        decoders = tuple(
+            (
+                name,
+                positions.get(name),
+                _DECODERS.get(name),
+                field.get_default(call_default_factory=True)
+            )
+            for name, field in BlankOutDTO.model_fields.items()
+        )
+        construct = BlankAdapter._construct
+
+        def decode(row: tuple) -> BlankOutDTO:
+            values = {}
+            for name, i, decoder, default in decoders:
+                if i is None:
+                    values[name] = default
+                elif decoder is None or row[i] is None:
+                    values[name] = row[i]
+                else:
+                    values[name] = decoder(row[i])
+            return construct(values)
+        return decode
+
+    @staticmethod
+    def from_trusted(dict_: dict) -> BlankOutDTO:
+        """row_decoder for a single row as dict"""
+        columns = tuple(dict_)
+        decode = _TRUSTED_DECODERS.get(columns)
+        if decode is None:
+            decode = _TRUSTED_DECODERS[columns] = BlankAdapter.row_decoder(columns)
+        return decode(tuple(dict_.values()))
+
+
+_KEY_FIELDS = ("id", "series", "start", "end", "op")
+_STATUSES = {i.value: i for i in BlankStatus}
+_DECODERS = {
+    "date": lambda value: datetime.date.fromisoformat(value[:10]),
+    "created_at": datetime.datetime.fromisoformat,
+    "updated_at": datetime.datetime.fromisoformat,
+    "deleted_at": datetime.datetime.fromisoformat,
+    "status": lambda value: _STATUSES.get(value, value),
+}
+# from_trusted decoders by column names, queries have a few column sets
+_TRUSTED_DECODERS: dict[tuple[str, ...], Callable[[tuple], BlankOutDTO]] = {}
+
+
+class _BatchFailed(Exception):
+    """Rolls back atomic batch"""
+
 
 class _BlankCRUD_utils(ABC):    
     def _get_insert_stmt_from_range(
         self, 
         range_: BlankRangeInDTO
-    ) -> tuple[str, list[tuple]]:
-        query = "INSERT INTO blanks(series, number) VALUES(?, ?)"
-        params = [(range_.series, n) for n in range_.get_range()]
+    ) -> tuple[str, tuple]:
+        """Numbers are generated inside SQLite, range is never materialized"""
+        query = (
+            "WITH RECURSIVE numbers(n) AS "
+            "(SELECT ? UNION ALL SELECT n+1 FROM numbers WHERE n < ?) "
+            "INSERT INTO blanks(series, number) SELECT ?, n FROM numbers"
+        )
+        params = (range_.start, range_.end, range_.series)
         return query, params
 
-    def _get_update_stmt(
+    def _get_overlap_stmt(
         self, 
-        blank_update: BlankUpdateDTO
+        range_: BlankRangeInDTO
     ) -> tuple[str, tuple]:
+        """Index probe for any existing (even deleted) number in range"""
+        query = (
+            "SELECT number FROM blanks "
+            "WHERE series = ? AND number BETWEEN ? AND ? LIMIT 1"
+        )
+        return query, (range_.series, range_.start, range_.end)
+
+    def _get_sets(
+        self,
+        blank_update: BlankUpdateDTO | BlankRangeUpdateDTO
+    ) -> tuple[str, list]:
+        """SET clause body and its params, key and undefined fields skipped"""
         updates_dict = BlankAdapter.to_dict(blank_update)  # noqa
         params = []
         def tee(k, v):
@@ -68,9 +170,55 @@ class _BlankCRUD_utils(ABC):
             (
                 tee(k, v) 
                 for k, v in updates_dict.items() 
-                if not isinstance(v, Undefined) and k != "id"
+                if not isinstance(v, Undefined) and k not in _KEY_FIELDS
+            )
+        )
+        return sets, params
+
+    def _get_missing_stmt(self, range_: BlankRangeInDTO) -> tuple[str, dict]:
+        """(start, end) gaps of range without a live blank, in order"""
+        query = (
+            "WITH n(number) AS ("
+            "SELECT number FROM c_blanks "
+            "WHERE series = :series AND number BETWEEN :start AND :end "
+            "UNION ALL SELECT :end + 1"
+            ") SELECT prev + 1, number - 1 FROM ("
+            "SELECT number, lag(number, 1, :start - 1) OVER (ORDER BY number) "
+            "AS prev FROM n"
+            ") WHERE number > prev + 1"
+        )
+        return query, {
+            "series": range_.series, "start": range_.start, "end": range_.end
+        }
+
+    def _get_page_stmt(
+        self,
+        query: str,
+        params: Iterable | dict,
+        limit: int,
+        after: Optional[int]
+    ) -> tuple[str, tuple | dict]:
+        """
+        Keyset page of query by id, filter of query is flattened into
+        `id > after` so SQLite seeks instead of skipping rows
+        """
+        after = -1 if after is None else after
+        if isinstance(params, dict):
+            return (
+                f"SELECT * FROM ({query}) WHERE id > :_after "
+                "ORDER BY id LIMIT :_limit",
+                {**params, "_after": after, "_limit": limit}
             )
+        return (
+            f"SELECT * FROM ({query}) WHERE id > ? ORDER BY id LIMIT ?",
+            (*params, after, limit)
         )
+
+    def _get_update_stmt(
+        self, 
+        blank_update: BlankUpdateDTO
+    ) -> tuple[str, tuple]:
+        sets, params = self._get_sets(blank_update)
         return (
             (
                 f"UPDATE blanks SET {sets},updated_at=datetime('now') "
@@ -83,18 +231,26 @@ class _BlankCRUD_utils(ABC):
         self, 
         query: str, 
         params: Iterable = tuple(),
-        many: bool = False
+        many: bool = False,
+        row_factory: Optional[Callable] = sqlite3.Row,
+        name: Optional[str] = None
     ) -> DictCursor:
-        """forward ValueError when catch IntegrityError"""
-        self._logger.log(15, f"{query=}")
-        self._logger.log(15, f"{params=}")
+        """
+        forward ValueError when catch IntegrityError,
+        statement is metered under name, the class name if not given
+        """
+        self._logger.log(15, "query=%r params=%s", query, LazyParams(params))
+        started = perf_counter()
         try:
             if many:
                 cursor = self._connection.executemany(query, params)    
             else: 
                 cursor = self._connection.execute(query, params)
-            cursor.row_factory = sqlite3.Row
-            return cursor
+            cursor.row_factory = row_factory
+            return metered(
+                cursor, name or type(self).__name__, started,
+                query, None if many else params
+            )
         except sqlite3.IntegrityError as ie:
             self._logger.error(ie)
             self._connection.rollback()
@@ -102,21 +258,148 @@ class _BlankCRUD_utils(ABC):
             
 
 class BlankCRUD(_BlankCRUD_utils):
-    def __init__(self, get_connection: Callable[[], sqlite3.Connection]):
+    _view = "c_blanks"
+
+    def __init__(
+        self,
+        get_connection: Callable[[], sqlite3.Connection],
+        on_change: Optional[Callable[[Optional[str]], Any]] = None
+    ):
         self._connection = get_connection()
+        self._on_change = on_change
+        # changes of the open grouped() transaction
+        self._changes: Optional[list[Optional[str]]] = None
         self._logger = logging.getLogger("blanks.CRUD")
         self._id = hex(id(self))
         self._logger.info(f"{self._id}.__init__")
         
     def __del__(self):
+        # connection is the pool's, it is returned when the thread exits
         self._logger.info(f"{self._id}.__del__")
-        self._connection.close()
+
+    def _changed(self, *dates: Optional[str | datetime.date]):
+        """
+        Report data changed starting from the earliest of dates,
+        None of them means unknown. Inside grouped() it is collected
+        until commit, otherwise logged to data_changes at once
+        """
+        dates = [
+            BlankAdapter.strftime(i) if isinstance(i, datetime.date) else i
+            for i in dates
+            if i is not None and not isinstance(i, Undefined)
+        ]
+        since = min(dates) if dates else None
+        if self._changes is not None:
+            self._changes.append(since)
+            return
+        self._log_change(since)
+        if self._on_change is not None:
+            self._on_change(since)
+
+    def _updated(
+        self,
+        updates: BlankUpdateDTO | BlankRangeUpdateDTO,
+        old_date: Optional[str]
+    ):
+        """
+        Report data changed by updates of rows dated old_date at the
+        earliest. Reports do not depend on comment, nor on status of
+        rows without date, then nothing is changed
+        """
+        if isinstance(updates.date, Undefined) \
+                and isinstance(updates.status, Undefined):
+            return
+        if old_date is not None or updates.date is not None:
+            self._changed(old_date, updates.date)
+
+    def _range_changed(
+        self,
+        touched: tuple[Optional[str], Optional[str]],
+        updates: Optional[BlankRangeUpdateDTO | BlankUpdateDTO]
+    ):
+        """
+        touched is min(date), min(created_at) of changed rows, soft
+        deleted ones leave clean ranges from when they are created
+        """
+        if updates is None:
+            self._changed(*touched)
+        else:
+            self._updated(updates, touched[0])
+
+    def _log_change(self, since: Optional[str]):
+        """
+        Append data_changes row and drop month closes from the month of
+        since onwards, all of them if it is unknown. Old rows are pruned
+        every DATA_CHANGES_PRUNE versions, DATA_CHANGES_KEPT are left
+        """
+        month = f"{since[:7]}-01" if since is not None else ""
+        with transaction(self._connection):
+            version = self.execute(
+                "INSERT INTO data_changes(since) VALUES(?) RETURNING version",
+                (since,),
+                row_factory=None,
+                name="BlankCRUD._log_change"
+            ).fetchone()[0]
+            for table in ("month_closes", "month_snapshots"):
+                self.execute(
+                    f"DELETE FROM {table} WHERE month >= ?",
+                    (month,),
+                    name="BlankCRUD._log_change"
+                )
+            if version % DATA_CHANGES_PRUNE == 0:
+                self.execute(
+                    "DELETE FROM data_changes WHERE version <= ?",
+                    (version - DATA_CHANGES_KEPT,),
+                    name="BlankCRUD._log_change"
+                )
+
+    @contextmanager
+    def grouped(self) -> Iterator[None]:
+        """
+        Run several calls in one transaction, savepoint when nested.
+        Their changes are logged once, in it, and reported after
+        it is committed. Changes of a rolled back nested call are dropped
+        """
+        if self._changes is not None:
+            mark = len(self._changes)
+            try:
+                with transaction(self._connection):
+                    yield
+            except BaseException:
+                del self._changes[mark:]
+                raise
+            return
+        self._changes = changes = []
+        try:
+            with transaction(self._connection):
+                yield
+                since = None if None in changes else min(changes, default=None)
+                if changes:
+                    self._log_change(since)
+        finally:
+            self._changes = None
+        if changes and self._on_change is not None:
+            self._on_change(since)
 
     def create_from_range(self, range_: BlankRangeInDTO) -> sqlite3.Cursor:
-        return self.execute(
-            *self._get_insert_stmt_from_range(range_), 
-            many=True
-        )
+        """Raise ValueError before writing if range overlaps existing one"""
+        with transaction(self._connection):
+            overlap = self.execute(
+                *self._get_overlap_stmt(range_),
+                name="BlankCRUD.create_from_range"
+            ).fetchone()
+            if overlap:
+                self._logger.error(
+                    f"{range_.series}{overlap['number']} already exists"
+                )
+                raise ValueError
+            cur = self.execute(
+                *self._get_insert_stmt_from_range(range_),
+                name="BlankCRUD.create_from_range"
+            )
+        # created_at defaults to CURRENT_TIMESTAMP, UTC
+        self._changed(datetime.datetime.now(datetime.UTC))
+        return cur
 
     def _create(self, blanks: BlankInDTO | list[BlankInDTO]) -> sqlite3.Cursor:
         """ONLY FOR TESTS"""
@@ -128,40 +411,243 @@ class BlankCRUD(_BlankCRUD_utils):
             return self.execute(
                 query, 
                 [BlankAdapter.to_dict(i) for i in blanks],
-                many=True
+                many=True,
+                name="BlankCRUD._create"
             )
-        return self.execute(query, BlankAdapter.to_dict(blanks))   
+        return self.execute(
+            query, BlankAdapter.to_dict(blanks), name="BlankCRUD._create"
+        )
 
     def read_with_filter(
         self, 
         raw_filter: str = "", 
-        params: Iterable | dict = tuple()
+        params: Iterable | dict = tuple(),
+        limit: Optional[int] = None,
+        after: Optional[int] = None
     ) -> list[BlankOutDTO]:
-        query = "SELECT * FROM c_blanks"
+        """
+        Blanks ordered by id. With limit returns page starting after
+        `after` id, pass id of the last blank to get the next page
+        """
+        query = f"SELECT * FROM {self._view}"
         if raw_filter:
             query += f" {raw_filter}"
-        cur = self.execute(query, params)
-        return [BlankAdapter.from_dict(dict(i)) for i in cur]
+        if limit is not None:
+            query, params = self._get_page_stmt(query, params, limit, after)
+        else:
+            # partial indexes cover every c_blanks row, without ORDER BY
+            # a full listing may scan one of them instead of the table
+            query += " ORDER BY id"
+        cur = self.execute(
+            query, params, row_factory=None, name="BlankCRUD.read_with_filter"
+        )
+        decode = BlankAdapter.row_decoder(i[0] for i in cur.description)
+        return list(map(decode, cur))
+
+    def read_page(
+        self,
+        limit: int,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        return self.read_with_filter(limit=limit, after=after)
+
+    def search(
+        self,
+        pattern: str,
+        limit: Optional[int] = None,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        """Blanks which series||number is LIKE pattern, see blanks.search"""
+        parsed = parse_number_pattern(pattern)
+        if parsed is None or parsed.ranges is None:
+            raw_filter, params = number_filter(pattern)
+            return self.read_with_filter(raw_filter, params, limit, after)
+        # exact and prefix patterns are a few number ranges of one series,
+        # each one is an index range, pages go in number order
+        first = 0
+        if after is not None:
+            last = self.execute(
+                "SELECT series, number FROM blanks WHERE id = ?",
+                (after,),
+                name="BlankCRUD.search"
+            ).fetchone()
+            if last is None or last["series"] != parsed.series:
+                return []
+            first = last["number"] + 1
+        query = (
+            f"SELECT * FROM {self._view} "
+            "WHERE series = ? AND number BETWEEN ? AND ? "
+            "ORDER BY number LIMIT ?"
+        )
+        found = []
+        for low, high in parsed.ranges:
+            if limit is not None and len(found) >= limit:
+                break
+            if (low := max(low, first)) > high:
+                continue
+            cur = self.execute(
+                query,
+                (
+                    parsed.series, low, high,
+                    -1 if limit is None else limit - len(found)
+                ),
+                row_factory=None,
+                name="BlankCRUD.search"
+            )
+            decode = BlankAdapter.row_decoder(i[0] for i in cur.description)
+            found += map(decode, cur)
+        return found
 
     def read(self) -> list[BlankOutDTO]:
         return self.read_with_filter()
 
     def get(self, id: int) -> Optional[BlankOutDTO]:
-        query = "SELECT * FROM c_blanks WHERE id = ?"
-        cur = self.execute(query, (id,))
-        return BlankAdapter.from_dict(dict(cur.fetchone() or {}))
+        query = f"SELECT * FROM {self._view} WHERE id = ?"
+        cur = self.execute(query, (id,), row_factory=None, name="BlankCRUD.get")
+        if (row := cur.fetchone()) is None:
+            return None
+        return BlankAdapter.row_decoder(i[0] for i in cur.description)(row)
 
     def update(self, updates: BlankUpdateDTO) -> bool:
         """Return true if query was affect any row"""
-        _ = self.execute(*self._get_update_stmt(updates)).fetchone()
+        with transaction(self._connection):
+            old = self.execute(
+                "SELECT date FROM blanks WHERE id=?",
+                (updates.id,),
+                name="BlankCRUD.update"
+            ).fetchone()
+            _ = self.execute(
+                *self._get_update_stmt(updates), name="BlankCRUD.update"
+            ).fetchone()
+        if _:
+            self._updated(updates, old["date"])
         return not not _
 
+    def _update_range(
+        self,
+        series: str,
+        start: int,
+        end: int,
+        sets: str,
+        params: list,
+        updates: Optional[BlankRangeUpdateDTO | BlankUpdateDTO] = None,
+        live: bool = False
+    ) -> int:
+        """
+        Apply SET clause of updates, a soft delete if None, to blanks in
+        [start, end] with one statement, only to not deleted ones if live,
+        return count of them
+        """
+        live_filter = " AND deleted_at IS NULL" if live else ""
+        with transaction(self._connection):
+            touched = self.execute(
+                (
+                    "SELECT min(date), min(created_at) FROM blanks "
+                    f"WHERE series = ? AND number BETWEEN ? AND ?{live_filter}"
+                ),
+                (series, start, end),
+                name="BlankCRUD._update_range"
+            ).fetchone()
+            cur = self.execute(
+                (
+                    f"UPDATE blanks SET {sets},updated_at=datetime('now') "
+                    f"WHERE series = ? AND number BETWEEN ? AND ?{live_filter}"
+                ),
+                (*params, series, start, end),
+                name="BlankCRUD._update_range"
+            )
+            affected = cur.rowcount
+        if affected:
+            self._range_changed(touched, updates)
+        return affected
+
+    def _change_range(
+        self,
+        range_: BlankRangeInDTO,
+        sets: str,
+        params: list,
+        updates: Optional[BlankRangeUpdateDTO] = None
+    ) -> tuple[int, list[tuple[int, int]]]:
+        """Return count of changed blanks and ranges of missing numbers"""
+        with transaction(self._connection):
+            missing = self.execute(
+                *self._get_missing_stmt(range_),
+                row_factory=None,
+                name="BlankCRUD._change_range"
+            ).fetchall()
+            affected = self._update_range(
+                range_.series, range_.start, range_.end, sets, params, updates,
+                live=True
+            )
+        return affected, missing
+
+    def update_range(
+        self,
+        updates: BlankRangeUpdateDTO
+    ) -> tuple[int, list[tuple[int, int]]]:
+        """
+        Update every live blank of range in one transaction,
+        raise ValueError if there is nothing to set
+        """
+        sets, params = self._get_sets(updates)
+        if not sets:
+            raise ValueError
+        return self._change_range(updates, sets, params, updates)
+
+    def delete_range(
+        self,
+        range_: BlankRangeInDTO
+    ) -> tuple[int, list[tuple[int, int]]]:
+        """Soft delete every live blank of range in one transaction"""
+        return self._change_range(range_, "deleted_at=datetime('now')", [])
+
     def delete(self, id: int) -> bool:
         """Return true if query was affect any row"""
         query = (
             "UPDATE blanks "
             "SET updated_at=datetime('now'),deleted_at=datetime('now') "
-            "WHERE id=? RETURNING id"
+            "WHERE id=? RETURNING date, created_at"
         )
-        _ = self.execute(query, (id,)).fetchone()
+        _ = self.execute(query, (id,), name="BlankCRUD.delete").fetchone()
+        if _:
+            self._changed(_["date"], _["created_at"])
         return not not _
+
+    def _apply(self, operation: BlankOperation) -> Optional[str]:
+        """Run batch operation, return its error"""
+        if isinstance(operation, BlankCreateOperation):
+            self.create_from_range(operation)
+            return None
+        if isinstance(operation, BlankUpdateOperation):
+            found = self.update(operation)
+        else:
+            found = self.delete(operation.id)
+        return None if found else "Not found"
+
+    def batch(
+        self,
+        operations: list[BlankOperation],
+        atomic: bool = False
+    ) -> tuple[bool, list[Optional[str]]]:
+        """
+        Run operations in order in one transaction, so in one commit.
+        Return whether it was committed and error of every operation,
+        None for applied ones. Failed operation is rolled back to its
+        savepoint, with atomic the whole batch is
+        """
+        errors = []
+        try:
+            with self.grouped():
+                for operation in operations:
+                    try:
+                        with self.grouped():
+                            error = self._apply(operation)
+                    except ValueError:
+                        error = "Invalid range"
+                    errors.append(error)
+                    if error and atomic:
+                        raise _BatchFailed
+        except _BatchFailed:
+            errors += [None] * (len(operations) - len(errors))
+            return False, [i or "Rolled back" for i in errors]
+        return True, errors
@@ -1,24 +1,57 @@
 """
 FastAPI instance that will include the router
 should have middleware that 
-set request.state.crud: BlankCRUD
+set request.state.crud: AsyncBlankCRUD
 """
+import io
+import csv
+import base64
+import binascii
 import datetime
-from typing import Annotated, Optional
+from typing import Annotated, AsyncIterator, Literal, Optional
 
 from fastapi import Query
 from fastapi import APIRouter
 from fastapi import HTTPException
 from fastapi.requests import Request
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 
 from blanks.crud import BlankAdapter
-from blanks.models import BlankOutDTO, BlankRangeInDTO, BlankUpdateDTO
+from blanks.models import BlankOutDTO, BlankPageDTO, BlankStatus
+from blanks.models import BlankRangeInDTO, BlankUpdateDTO
+from blanks.models import BlankRangeResultDTO, BlankRangeUpdateDTO
+from blanks.models import BlankBatchDTO, BlankBatchItemDTO, BlankBatchResultDTO
 
 router = APIRouter(prefix="/blank")
 
+PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+EXPORT_PAGE_SIZE = 1000
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
 
-@router.get("", description="You can only use one query parameter",)
+
+def encode_cursor(id: int) -> str:
+    return base64.urlsafe_b64encode(str(id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def make_page(items: list[BlankOutDTO], limit: int) -> BlankPageDTO:
+    next_ = encode_cursor(items[-1].id) if len(items) == limit else None
+    return BlankPageDTO(items=items, next=next_)
+
+
+@router.get(
+    "",
+    description="You can only use one query parameter. "
+    "Passing `limit` or `after` returns a page {items, next} "
+    "instead of the whole list"
+)
 async def get_blanks(
         request: Request, 
         blank_id: Optional[int] = Query(
@@ -32,44 +65,168 @@ async def get_blanks(
         date: Optional[datetime.date] = Query(
             default=None, 
             description="YYYY-MM-DD"
-        )      
+        ),
+        limit: Optional[int] = Query(
+            default=None,
+            ge=1,
+            le=MAX_PAGE_LIMIT,
+            description=f"Page size, {PAGE_LIMIT} if only `after` is given"
+        ),
+        after: Optional[str] = Query(
+            default=None,
+            description="`next` cursor of the previous page"
+        )
     ):
-    if not any((blank_id, number, date)):
-        return request.state.crud.read()
-    result = None
+    after_id = decode_cursor(after) if after is not None else None
+    paginated = limit is not None or after is not None
+    if paginated and limit is None:
+        limit = PAGE_LIMIT
     if blank_id:
-        result = request.state.crud.get(blank_id)
-    elif number:
-        result = request.state.crud.read_with_filter(
-            "WHERE series||number LIKE ?", 
-            (number,)
-        )
-    elif date:
-        result = request.state.crud.read_with_filter(
+        if result := await request.state.crud.get(blank_id):
+            return result
+        raise HTTPException(status_code=404)
+    if not any((number, date)):
+        if not paginated:
+            return await request.state.crud.read()
+        items = await request.state.crud.read_page(limit, after_id)
+        return make_page(items, limit)
+    if number:
+        items = await request.state.crud.search(number, limit, after_id)
+    else:
+        items = await request.state.crud.read_with_filter(
             "WHERE date = ?", 
-            (BlankAdapter.strftime(date),)
+            (BlankAdapter.strftime(date),),
+            limit,
+            after_id
         )
-    if result:
-        return result 
+    if paginated and (items or after_id is not None):
+        return make_page(items, limit)
+    if items:
+        return items
     raise HTTPException(status_code=404)
 
 
+def export_ndjson(page: list[BlankOutDTO]) -> str:
+    return "".join(i.model_dump_json() + "\n" for i in page)
+
+
+def export_csv(page: list[BlankOutDTO]) -> str:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, BlankOutDTO.model_fields)
+    writer.writerows(i.model_dump(mode="json") for i in page)
+    return buffer.getvalue()
+
+
+@router.get("/export", description="Stream all blanks page by page")
+async def export_blanks(
+        request: Request,
+        format: Literal["ndjson", "csv"] = "ndjson",
+        series: Optional[str] = None,
+        date: Optional[datetime.date] = Query(
+            default=None,
+            description="YYYY-MM-DD"
+        ),
+        status: Optional[int] = Query(
+            default=None,
+            ge=min(i.value for i in BlankStatus),
+            le=max(i.value for i in BlankStatus),
+            description="BlankStatus value"
+        )
+    ):
+    conditions, params = [], []
+    if series is not None:
+        conditions.append("series = ?")
+        params.append(series)
+    if date is not None:
+        conditions.append("date = ?")
+        params.append(BlankAdapter.strftime(date))
+    if status is not None:
+        # unary + keeps keyset pages on rowid, status index would sort
+        # every matching row for each page
+        conditions.append("+status = ?")
+        params.append(status)
+    raw_filter = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    serialize = export_csv if format == "csv" else export_ndjson
+    crud = request.state.crud
+
+    async def chunks() -> AsyncIterator[str]:
+        # one keyset page in memory at a time, each one is a chunk
+        if format == "csv":
+            yield ",".join(BlankOutDTO.model_fields) + "\r\n"
+        after = None
+        while True:
+            if raw_filter:
+                page = await crud.read_with_filter(
+                    raw_filter, params, EXPORT_PAGE_SIZE, after
+                )
+            else:
+                page = await crud.read_page(EXPORT_PAGE_SIZE, after)
+            if page:
+                yield serialize(page)
+            if len(page) < EXPORT_PAGE_SIZE:
+                return
+            after = page[-1].id
+
+    return StreamingResponse(
+        chunks(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="blanks.{format}"'
+        }
+    )
+
+
 @router.post("")
 async def create_blanks(request: Request, range_: BlankRangeInDTO):
     try:
-        request.state.crud.create_from_range(range_)
+        await request.state.crud.create_from_range(range_)
     except ValueError:
         raise HTTPException(status_code=404, detail="Invalid range")
     return Response(status_code=201) 
 
 
+@router.post("/batch", description="Run operations in one transaction")
+async def run_batch(
+        request: Request,
+        batch: BlankBatchDTO
+    ) -> BlankBatchResultDTO:
+    committed, errors = await request.state.crud.batch(
+        batch.operations, batch.atomic
+    )
+    return BlankBatchResultDTO(
+        committed=committed,
+        results=[BlankBatchItemDTO(ok=i is None, detail=i) for i in errors]
+    )
+
+
+@router.patch("/range", description="Update every blank of range at once")
+async def update_blank_range(
+        request: Request,
+        updates: BlankRangeUpdateDTO
+    ) -> BlankRangeResultDTO:
+    try:
+        affected, missing = await request.state.crud.update_range(updates)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+    return BlankRangeResultDTO(affected=affected, missing=missing)
+
+
+@router.delete("/range", description="Delete every blank of range at once")
+async def delete_blank_range(
+        request: Request,
+        range_: Annotated[BlankRangeInDTO, Query()]
+    ) -> BlankRangeResultDTO:
+    affected, missing = await request.state.crud.delete_range(range_)
+    return BlankRangeResultDTO(affected=affected, missing=missing)
+
+
 @router.patch("")
 async def update_blank(request: Request, updates: BlankUpdateDTO):
-    if not request.state.crud.update(updates):
+    if not await request.state.crud.update(updates):
         raise HTTPException(status_code=404)
 
 
 @router.delete("")
 async def delete_blank(request: Request, id: int):
-    if not request.state.crud.delete(id):
+    if not await request.state.crud.delete(id):
         raise HTTPException(status_code=404)
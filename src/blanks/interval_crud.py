@@ -0,0 +1,405 @@
+"""
+Interval storage: one blank_intervals row per run of numbers
+sharing every attribute but updated_at, instead of one blanks row
+per number.
+
+Per-number API is kept: ids are derived from (series, number),
+reads expand only the intervals they match into c_blanks rows, the
+c_interval_blanks view is left for filters on number or id.
+"""
+import re
+import sqlite3
+import datetime
+from itertools import chain
+from typing import Iterable, Optional
+
+from blanks.crud import BlankAdapter, BlankCRUD
+from blanks.models import BlankOutDTO, BlankRangeInDTO, BlankRangeUpdateDTO
+from blanks.models import BlankUpdateDTO
+from blanks.models import MAX_NUMBER, SERIES_PATTERN
+from blanks.search import parse_number_pattern
+from database import transaction
+
+_SERIES = re.compile(SERIES_PATTERN)
+_SERIES_BASE = 65536
+_NUMBER_BASE = MAX_NUMBER + 1
+_ATTRIBUTES = (
+    "date", "comment", "status", "created_at", "updated_at", "deleted_at"
+)
+# adjacent intervals equal in these are joined, the latest updated_at is
+# kept, so a number's update time is the one of its merged interval
+_MERGE_KEY = tuple(i for i in _ATTRIBUTES if i != "updated_at")
+# filters on these columns differ per number of an interval
+_PER_NUMBER_COLUMNS = re.compile(r"\b(number|id)\b", re.IGNORECASE)
+
+
+def blank_id(series: str, number: int) -> int:
+    """Same as id column of c_interval_blanks, ordered by (series, number)"""
+    code = ord(series[0]) * _SERIES_BASE + ord(series[1])
+    return code * _NUMBER_BASE + number
+
+
+def split_blank_id(id: int) -> Optional[tuple[str, int]]:
+    code, number = divmod(id, _NUMBER_BASE)
+    first, second = divmod(code, _SERIES_BASE)
+    if id < 0 or first > 0x10FFFF:
+        return None
+    # ids not made by blank_id may decode to surrogates SQLite can't bind
+    series = chr(first) + chr(second)
+    if not _SERIES.fullmatch(series):
+        return None
+    return series, number
+
+
+class IntervalBlankCRUD(BlankCRUD):
+    _view = "c_interval_blanks"
+
+    def _find(self, series: str, number: int) -> Optional[sqlite3.Row]:
+        """Interval containing number, deleted included"""
+        query = (
+            "SELECT * FROM blank_intervals "
+            "WHERE series = ? AND start <= ? ORDER BY start DESC LIMIT 1"
+        )
+        interval = self.execute(
+            query, (series, number), name="IntervalBlankCRUD._find"
+        ).fetchone()
+        if interval is None or interval["end"] < number:
+            return None
+        return interval
+
+    def _split(self, series: str, at: int):
+        """Make `at` the first number of an interval"""
+        interval = self._find(series, at)
+        if interval is None or interval["start"] == at:
+            return
+        self.execute(
+            (
+                "INSERT INTO blank_intervals"
+                f"(series, start, end, {','.join(_ATTRIBUTES)}) "
+                f"SELECT series, ?, end, {','.join(_ATTRIBUTES)} "
+                "FROM blank_intervals WHERE id = ?"
+            ),
+            (at, interval["id"]),
+            name="IntervalBlankCRUD._split"
+        )
+        self.execute(
+            "UPDATE blank_intervals SET end = ? WHERE id = ?",
+            (at - 1, interval["id"]),
+            name="IntervalBlankCRUD._split"
+        )
+
+    def _merge(self, series: str, start: int, end: int):
+        """Join adjacent intervals with equal attributes around [start, end]"""
+        previous = self._find(series, start - 1)
+        query = (
+            "SELECT * FROM blank_intervals "
+            "WHERE series = ? AND start BETWEEN ? AND ? ORDER BY start"
+        )
+        intervals = self.execute(
+            query,
+            (series, previous["start"] if previous else start, end + 1),
+            name="IntervalBlankCRUD._merge"
+        ).fetchall()
+        head = None
+        for interval in intervals:
+            if (
+                head is not None
+                and head["end"] + 1 == interval["start"]
+                and all(head[k] == interval[k] for k in _MERGE_KEY)
+            ):
+                updated_at = max(
+                    (i for i in (head["updated_at"], interval["updated_at"]) if i),
+                    default=None
+                )
+                self.execute(
+                    "DELETE FROM blank_intervals WHERE id = ?",
+                    (interval["id"],),
+                    name="IntervalBlankCRUD._merge"
+                )
+                self.execute(
+                    "UPDATE blank_intervals SET end = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    (interval["end"], updated_at, head["id"]),
+                    name="IntervalBlankCRUD._merge"
+                )
+                head = {**head, "end": interval["end"], "updated_at": updated_at}
+                continue
+            head = interval
+
+    def _update_range(
+        self,
+        series: str,
+        start: int,
+        end: int,
+        sets: str,
+        params: list,
+        updates: Optional[BlankRangeUpdateDTO | BlankUpdateDTO] = None,
+        live: bool = False
+    ) -> int:
+        """
+        Apply SET clause of updates, a soft delete if None, to numbers in
+        [start, end], only to not deleted ones if live, return count of them
+        """
+        live_filter = " AND deleted_at IS NULL" if live else ""
+        with transaction(self._connection):
+            touched = self.execute(
+                (
+                    "SELECT min(date), min(created_at) FROM blank_intervals "
+                    f"WHERE series = ? AND start <= ? AND end >= ?{live_filter}"
+                ),
+                (series, end, start),
+                name="IntervalBlankCRUD._update_range"
+            ).fetchone()
+            self._split(series, start)
+            self._split(series, end + 1)
+            cur = self.execute(
+                (
+                    f"UPDATE blank_intervals "
+                    f"SET {sets},updated_at=datetime('now') "
+                    "WHERE series = ? AND start >= ? AND end <= ?"
+                    f"{live_filter} RETURNING end - start + 1"
+                ),
+                (*params, series, start, end),
+                name="IntervalBlankCRUD._update_range"
+            )
+            affected = sum(i[0] for i in cur)
+            self._merge(series, start, end)
+        if affected:
+            self._range_changed(touched, updates)
+        return affected
+
+    def _get_missing_stmt(self, range_: BlankRangeInDTO) -> tuple[str, dict]:
+        """Same as BlankCRUD._get_missing_stmt over live intervals"""
+        query = (
+            "WITH i(start, end) AS ("
+            "SELECT :start, end FROM ("
+            "SELECT end, deleted_at FROM blank_intervals "
+            "WHERE series = :series AND start < :start "
+            "ORDER BY start DESC LIMIT 1"
+            ") WHERE end >= :start AND deleted_at IS NULL "
+            "UNION ALL SELECT start, end FROM c_blank_intervals "
+            "WHERE series = :series AND start BETWEEN :start AND :end "
+            "UNION ALL SELECT :end + 1, :end + 1"
+            ") SELECT prev + 1, start - 1 FROM ("
+            "SELECT start, lag(end, 1, :start - 1) OVER (ORDER BY start) "
+            "AS prev FROM i"
+            ") WHERE start > prev + 1"
+        )
+        return query, {
+            "series": range_.series, "start": range_.start, "end": range_.end
+        }
+
+    def create_from_range(self, range_: BlankRangeInDTO) -> sqlite3.Cursor:
+        """Raise ValueError before writing if range overlaps existing one"""
+        with transaction(self._connection):
+            # intervals are disjoint, so the last one starting before
+            # range end is the only candidate
+            query = (
+                "SELECT start, end FROM blank_intervals "
+                "WHERE series = ? AND start <= ? ORDER BY start DESC LIMIT 1"
+            )
+            last = self.execute(
+                query, (range_.series, range_.end),
+                name="IntervalBlankCRUD.create_from_range"
+            ).fetchone()
+            if last and last["end"] >= range_.start:
+                self._logger.error(
+                    f"{range_.series}{max(last['start'], range_.start)} "
+                    "already exists"
+                )
+                raise ValueError
+            cur = self.execute(
+                "INSERT INTO blank_intervals(series, start, end) VALUES(?,?,?)",
+                (range_.series, range_.start, range_.end),
+                name="IntervalBlankCRUD.create_from_range"
+            )
+        self._changed(datetime.datetime.now(datetime.UTC))
+        return cur
+
+    def get(self, id: int) -> Optional[BlankOutDTO]:
+        if not (key := split_blank_id(id)):
+            return None
+        series, number = key
+        interval = self._find(series, number)
+        if interval is None or interval["deleted_at"] is not None:
+            return None
+        dict_ = {k: interval[k] for k in _ATTRIBUTES}
+        dict_.update(id=id, series=series, number=number)
+        return BlankAdapter.from_trusted(dict_)
+
+    def read_with_filter(
+        self,
+        raw_filter: str = "",
+        params: Iterable | dict = tuple(),
+        limit: Optional[int] = None,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        """
+        Same as BlankCRUD.read_with_filter. A filter on interval
+        attributes, e.g. series, date or status, is applied to
+        c_blank_intervals and only matched intervals are expanded, one
+        on number or id needs every number of c_interval_blanks
+        """
+        if _PER_NUMBER_COLUMNS.search(raw_filter):
+            return super().read_with_filter(raw_filter, params, limit, after)
+        key = split_blank_id(after) if after is not None else ("", -1)
+        if not key:
+            return []
+        series, number = key
+        if isinstance(params, dict):
+            keyset = "series > :_series OR series = :_series AND end > :_number"
+            params = {**params, "_series": series, "_number": number}
+        else:
+            keyset = "series > ? OR series = ? AND end > ?"
+            params = (*params, series, series, number)
+        query = (
+            f"SELECT * FROM (SELECT * FROM c_blank_intervals {raw_filter}) "
+            f"WHERE {keyset} ORDER BY series, start"
+        )
+        if limit is not None:
+            # every interval has a number at least
+            query += f" LIMIT {int(limit)}"
+        found = []
+        for interval in self.execute(
+            query, params, name="IntervalBlankCRUD.read_with_filter"
+        ):
+            start = max(interval["start"], number + 1) \
+                if interval["series"] == series else interval["start"]
+            for n in range(start, interval["end"] + 1):
+                if len(found) == limit:
+                    return found
+                dict_ = {k: interval[k] for k in _ATTRIBUTES}
+                dict_.update(
+                    id=blank_id(interval["series"], n),
+                    series=interval["series"],
+                    number=n
+                )
+                found.append(BlankAdapter.from_trusted(dict_))
+        return found
+
+    def read_page(
+        self,
+        limit: int,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        """
+        Same as BlankCRUD.read_page, only intervals of the page are read
+        instead of expanding c_interval_blanks up to `after`
+        """
+        key = split_blank_id(after) if after is not None else ("", -1)
+        if not key:
+            return []
+        series, number = key
+        intervals = []
+        head = self._find(series, number + 1)
+        if head is not None and head["deleted_at"] is None:
+            intervals.append(head)
+        query = (
+            "SELECT * FROM c_blank_intervals "
+            "WHERE (series, start) > (?, ?) ORDER BY series, start LIMIT ?"
+        )
+        intervals += self.execute(
+            query, (series, number + 1, limit),
+            name="IntervalBlankCRUD.read_page"
+        )
+        page = []
+        for interval in intervals:
+            start = max(interval["start"], number + 1) \
+                if interval["series"] == series else interval["start"]
+            for n in range(start, interval["end"] + 1):
+                if len(page) == limit:
+                    return page
+                dict_ = {k: interval[k] for k in _ATTRIBUTES}
+                dict_.update(
+                    id=blank_id(interval["series"], n),
+                    series=interval["series"],
+                    number=n
+                )
+                page.append(BlankAdapter.from_trusted(dict_))
+        return page
+
+    def search(
+        self,
+        pattern: str,
+        limit: Optional[int] = None,
+        after: Optional[int] = None
+    ) -> list[BlankOutDTO]:
+        """Same as BlankCRUD.search, only intervals in ranges are read"""
+        parsed = parse_number_pattern(pattern)
+        if parsed is None:
+            return super().search(pattern, limit, after)
+        series, ranges = parsed
+        first = 0
+        if after is not None:
+            if not (key := split_blank_id(after)) or key[0] > series:
+                return []
+            first = key[1] + 1 if key[0] == series else 0
+        query = (
+            "SELECT * FROM c_blank_intervals "
+            "WHERE series = ? AND start BETWEEN ? AND ? ORDER BY start"
+        )
+        found = []
+        for low, high in ranges if ranges is not None else ((0, MAX_NUMBER),):
+            low = max(low, first)
+            if low > high:
+                continue
+            head = self._find(series, low)
+            if head is None or head["deleted_at"] is not None \
+                    or head["start"] >= low:
+                head = None
+            # cursor is read lazily, up to limit
+            intervals = self.execute(
+                query, (series, low, high), name="IntervalBlankCRUD.search"
+            )
+            for interval in chain([head] if head else [], intervals):
+                for n in range(
+                    max(interval["start"], low),
+                    min(interval["end"], high) + 1
+                ):
+                    if limit is not None and len(found) == limit:
+                        return found
+                    dict_ = {k: interval[k] for k in _ATTRIBUTES}
+                    dict_.update(id=blank_id(series, n), series=series, number=n)
+                    found.append(BlankAdapter.from_trusted(dict_))
+        return found
+
+    def update(self, updates: BlankUpdateDTO) -> bool:
+        """Return true if query was affect any row"""
+        if not (key := split_blank_id(updates.id)):
+            return False
+        series, number = key
+        sets, params = self._get_sets(updates)
+        return self._update_range(
+            series, number, number, sets, params, updates
+        ) > 0
+
+    def delete(self, id: int) -> bool:
+        """Return true if query was affect any row"""
+        if not (key := split_blank_id(id)):
+            return False
+        series, number = key
+        return self._update_range(
+            series, number, number, "deleted_at=datetime('now')", []
+        ) > 0
+
+    def import_blanks(self) -> int:
+        """
+        Move rows of per-number storage into intervals,
+        return count of created intervals
+        """
+        query = (
+            "INSERT INTO blank_intervals"
+            f"(series, start, end, {','.join(_MERGE_KEY)}, updated_at) "
+            f"SELECT series, min(number), max(number), {','.join(_MERGE_KEY)}, "
+            "max(updated_at) FROM ("
+            "SELECT *, number - ROW_NUMBER() OVER ("
+            f"PARTITION BY series, {','.join(_MERGE_KEY)} ORDER BY number"
+            ") AS island FROM blanks"
+            f") GROUP BY series, {','.join(_MERGE_KEY)}, island "
+            "ORDER BY series, min(number)"
+        )
+        with transaction(self._connection):
+            cur = self.execute(query, name="IntervalBlankCRUD.import_blanks")
+            self.execute("DELETE FROM blanks", name="IntervalBlankCRUD.import_blanks")
+        self._changed(None)
+        return cur.rowcount
@@ -1,13 +1,14 @@
 import re
 import datetime
 from enum import Enum
-from typing import Optional, Annotated, Any
+from typing import Optional, Annotated, Any, Literal
 
 from pydantic import BaseModel
-from pydantic import AfterValidator
+from pydantic import AfterValidator, Field
 
 SERIES_PATTERN = r"[A-ZА-Я]{2}"
 MAX_NUMBER = 9999999
+MAX_BATCH_SIZE = 1000
 
 
 class SeriesValidator:
@@ -67,6 +68,12 @@ class BlankOutDTO(BlankInDTO):
     deleted_at: Optional[datetime.datetime] = None
 
 
+class BlankPageDTO(BaseModel):
+    """`next` is opaque cursor of the next page, None on the last one"""
+    items: list[BlankOutDTO]
+    next: Optional[str] = None
+
+
 class Undefined(object):
     pass
 
@@ -102,3 +109,53 @@ class BlankRangeInDTO(BaseModel):
 
     def get_range(self):
         return range(self.start, self.end+1)
+
+
+class BlankRangeUpdateDTO(BlankRangeInDTO):
+    date: datetime.date | None = Undefined()
+    comment: str | None = Undefined()
+    status: BlankStatus | int | None = Undefined()
+
+
+class BlankRangeResultDTO(BaseModel):
+    """`missing` are (start, end) ranges of numbers without a live blank"""
+    affected: int
+    missing: list[tuple[int, int]]
+
+
+class BlankCreateOperation(BlankRangeInDTO):
+    op: Literal["create"]
+
+
+class BlankUpdateOperation(BlankUpdateDTO):
+    op: Literal["update"]
+
+
+class BlankDeleteOperation(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+
+BlankOperation = Annotated[
+    BlankCreateOperation | BlankUpdateOperation | BlankDeleteOperation,
+    Field(discriminator="op")
+]
+
+
+class BlankBatchDTO(BaseModel):
+    """
+    Operations run in order in one transaction, with `atomic` the first
+    failed one rolls back all of them
+    """
+    operations: Annotated[list[BlankOperation], Field(max_length=MAX_BATCH_SIZE)]
+    atomic: bool = False
+
+
+class BlankBatchItemDTO(BaseModel):
+    ok: bool
+    detail: Optional[str] = None
+
+
+class BlankBatchResultDTO(BaseModel):
+    committed: bool
+    results: list[BlankBatchItemDTO]
@@ -0,0 +1,68 @@
+"""
+Number search of GET /blank: `<series><number>` SQL-like patterns are
+parsed into series and number ranges, so lookups use the
+(series, number) index instead of `series||number LIKE ?` scans
+"""
+import re
+from typing import NamedTuple, Optional
+
+from blanks.models import MAX_NUMBER
+
+_PATTERN = re.compile(
+    r"(?P<series>[^%_]{2})(?P<number>0|[1-9][0-9]*)?(?P<prefix>%+)?"
+)
+
+
+class NumberPattern(NamedTuple):
+    series: str
+    # sorted number ranges, None for whole series
+    ranges: Optional[tuple[tuple[int, int], ...]]
+
+
+def _prefix_ranges(prefix: str) -> tuple[tuple[int, int], ...]:
+    """Ranges of numbers which decimal representation starts with prefix"""
+    value = int(prefix)
+    if value == 0:
+        return ((0, 0),)
+    ranges = []
+    scale = 1
+    while value * scale <= MAX_NUMBER:
+        ranges.append((value * scale, min((value + 1) * scale - 1, MAX_NUMBER)))
+        scale *= 10
+    return tuple(ranges)
+
+
+def parse_number_pattern(pattern: str) -> Optional[NumberPattern]:
+    """
+    Exact, number prefix and whole series patterns,
+    None when pattern needs LIKE, e.g. wildcards inside series or number
+    """
+    if not (match := _PATTERN.fullmatch(pattern)):
+        return None
+    # LIKE is case insensitive for ASCII letters only
+    series = "".join(i.upper() if i.isascii() else i for i in match["series"])
+    number, prefix = match["number"], match["prefix"]
+    if number is None:
+        # series||number is never just series
+        return NumberPattern(series, None if prefix else ())
+    if prefix:
+        return NumberPattern(series, _prefix_ranges(number))
+    if int(number) > MAX_NUMBER:
+        return NumberPattern(series, ())
+    return NumberPattern(series, ((int(number), int(number)),))
+
+
+def number_filter(pattern: str) -> tuple[str, tuple]:
+    """WHERE clause for BlankCRUD.read_with_filter matching pattern"""
+    parsed = parse_number_pattern(pattern)
+    if parsed is None:
+        return "WHERE series||number LIKE ?", (pattern,)
+    if parsed.ranges is None:
+        return "WHERE series = ?", (parsed.series,)
+    if not parsed.ranges:
+        return "WHERE 0", ()
+    numbers = " OR ".join("number BETWEEN ? AND ?" for _ in parsed.ranges)
+    return (
+        f"WHERE series = ? AND ({numbers})",
+        (parsed.series, *(i for range_ in parsed.ranges for i in range_))
+    )
@@ -0,0 +1,133 @@
+"""
+Single writer: write calls of all request handlers are queued to one
+thread owning the only writing BlankCRUD, which runs them in short
+group-commit transactions
+"""
+import os
+import queue
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from blanks.crud import BlankCRUD
+
+WRITER_GROUP_SIZE = int(os.environ.get("BSO_WRITER_GROUP_SIZE", 64))
+
+_STOP = object()
+
+
+class BlankWriter:
+    """
+    Calls queued while the previous group commits are taken together,
+    up to `group_size`, and run in one transaction, each one in its own
+    savepoint. A failed call is rolled back alone and the group costs a
+    single commit. Futures are resolved once it is committed.
+    """
+    def __init__(
+        self,
+        get_connection: Callable[[], sqlite3.Connection],
+        crud_class: type[BlankCRUD] = BlankCRUD,
+        on_change: Optional[Callable[[Optional[str]], Any]] = None,
+        group_size: int = WRITER_GROUP_SIZE
+    ):
+        self._queue = queue.Queue()
+        self._group_size = group_size
+        self._lock = threading.Lock()
+        self._groups = 0
+        self._writes = 0
+        self._logger = logging.getLogger("blanks.Writer")
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(get_connection, crud_class, on_change),
+            name="blanks-writer",
+            daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, method: str | Callable, *args) -> Future:
+        """
+        Queue call of BlankCRUD method, or of a callable, which writes
+        on the writer thread's connection of get_connection
+        """
+        future = Future()
+        self._queue.put((future, method, args))
+        return future
+
+    async def call(self, method: str | Callable, *args) -> Any:
+        return await asyncio.wrap_future(self.submit(method, *args))
+
+    def _take(self) -> list:
+        """Block for the first queued call, then take what is queued"""
+        group = [self._queue.get()]
+        while len(group) < self._group_size and group[-1] is not _STOP:
+            try:
+                group.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return group
+
+    def _run(
+        self,
+        get_connection: Callable[[], sqlite3.Connection],
+        crud_class: type[BlankCRUD],
+        on_change: Optional[Callable[[Optional[str]], Any]]
+    ):
+        crud = crud_class(get_connection, on_change)
+        while True:
+            group = self._take()
+            stop = group[-1] is _STOP
+            if stop:
+                group.pop()
+            if group:
+                self._commit(crud, group)
+            if stop:
+                return
+
+    def _commit(self, crud: BlankCRUD, group: list):
+        results = []
+        try:
+            with crud.grouped():
+                for future, method, args in group:
+                    # cancelled by its caller
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        if isinstance(method, str):
+                            method = getattr(crud, method)
+                        with crud.grouped():
+                            result = method(*args)
+                        results.append((future, result, None))
+                    except Exception as e:
+                        results.append((future, None, e))
+        except Exception as e:
+            # e.g. BEGIN or COMMIT failed, nothing of the group is written
+            self._logger.error(f"group of {len(group)} failed: {e!r}")
+            for future, *_ in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+        with self._lock:
+            self._groups += 1
+            self._writes += len(results)
+
+    def close(self):
+        """Run queued calls and stop"""
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._logger.info("writer stopped")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "groups": self._groups,
+                "writes": self._writes,
+                "queued": self._queue.qsize(),
+            }
@@ -1,11 +1,32 @@
 import os
+import re
+import time
+import queue
 import sqlite3
 import logging
-from hashlib import md5
+import reprlib
+import pathlib
+import threading
+import importlib.util
+from itertools import count
+from time import perf_counter
+from contextlib import closing, contextmanager
+from typing import Any, Iterator
+
+from metrics import DB_POOL_WAIT, DB_POOL_HITS, DB_POOL_MISSES
+from metrics import DB_POOL_CHECKOUTS
 
 DB_PATH = os.environ["BSO_DB_PATH"]
 SQL_PATH = os.environ["BSO_SQL_PATH"]
-INIT_SCRIPT_MD5SUM = 'e4c08e6d78a54dff41ea015169b62c1d'
+
+DB_POOL_SIZE = int(os.environ.get("BSO_DB_POOL_SIZE", 8))
+DB_POOL_TIMEOUT = float(os.environ.get("BSO_DB_POOL_TIMEOUT", 30))
+DB_BUSY_TIMEOUT = int(os.environ.get("BSO_DB_BUSY_TIMEOUT", 5000))
+DB_CACHE_SIZE = int(os.environ.get("BSO_DB_CACHE_SIZE", 64*1024))
+DB_MMAP_SIZE = int(os.environ.get("BSO_DB_MMAP_SIZE", 256*1024*1024))
+
+# <version>_<name>.sql or <version>_<name>.py in SQL_PATH
+MIGRATION_PATTERN = re.compile(r"^(\d{4})_\w+\.(sql|py)$")
 
 logger = logging.getLogger("database")
 
@@ -14,17 +35,300 @@ def get_connection(db_path: str) -> sqlite3.Connection:
     return sqlite3.connect(db_path, autocommit=True)
 
 
+def get_read_only_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Connection that can not write, tuned as configure_connection
+    except journal mode, which is the writers' to set
+    """
+    uri = pathlib.Path(db_path).absolute().as_uri()
+    conn = sqlite3.connect(f"{uri}?mode=ro", uri=True, autocommit=True)
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}")
+    return conn
+
+
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """
+    Apply per-connection tuning.
+    cache_size is given in KiB, busy_timeout in milliseconds
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}")
+    return conn
+
+
+# bounded repr of query params, a range insert may pass millions of them
+_params_repr = reprlib.Repr(
+    maxlevel=2, maxtuple=8, maxlist=8, maxdict=8, maxstring=80, maxother=80
+)
+
+
+class LazyParams:
+    """
+    Log argument for query params, truncated repr is built only
+    when the record is emitted
+    """
+    __slots__ = ("params",)
+
+    def __init__(self, params: Any):
+        self.params = params
+
+    def __str__(self) -> str:
+        return _params_repr.repr(self.params)
+
+
+_savepoint_ids = count()
+
+
+@contextmanager
+def transaction(
+    conn: sqlite3.Connection,
+    immediate: bool = True
+) -> Iterator[sqlite3.Connection]:
+    """
+    Explicit transaction for autocommit connections.
+    Commit on success, rollback on exception.
+    Nested calls are mapped to savepoints
+    """
+    if conn.in_transaction:
+        savepoint = f"sp_{next(_savepoint_ids)}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+            raise
+        conn.execute(f"RELEASE {savepoint}")
+        return
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+class _Lease:
+    """
+    Thread's checked out connection, kept in thread-local storage.
+    Thread-local values are dropped when their thread exits, so a thread
+    that never calls release() still returns its connection then
+    """
+    __slots__ = ("pool", "connection")
+
+    def __init__(self, pool: "ConnectionPool", connection: sqlite3.Connection):
+        self.pool = pool
+        self.connection = connection
+
+    def __del__(self):
+        if self.connection is not None:
+            self.pool._put_back(self.connection)
+
+
+class ConnectionPool:
+    """
+    Hands out one tuned connection per thread.
+
+    A thread keeps its connection until it calls release() or exits, so
+    repeated get_connection() calls from the same thread are cheap. At most
+    `size` connections are checked out at once, other threads wait for a
+    free one. Long-lived threads, e.g. AsyncBlankCRUD workers and its
+    writer, hold theirs for good, so size should cover all of them.
+    """
+    def __init__(
+        self,
+        db_path: str,
+        size: int = DB_POOL_SIZE,
+        timeout: float = DB_POOL_TIMEOUT
+    ):
+        self._db_path = db_path
+        self._size = size
+        self._timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._hits = 0
+        self._misses = 0
+        self._checkouts = 0
+        self._wait_time = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._db_path,
+            autocommit=True,
+            check_same_thread=False
+        )
+        configure_connection(conn)
+        with self._lock:
+            self._connections.append(conn)
+        logger.info(f"pool opened connection #{len(self._connections)}")
+        return conn
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get_connection(self) -> sqlite3.Connection:
+        lease = getattr(self._local, "lease", None)
+        if lease is not None:
+            with self._lock:
+                self._hits += 1
+            DB_POOL_HITS.inc()
+            return lease.connection
+        started = perf_counter()
+        if not self._slots.acquire(timeout=self._timeout):
+            raise sqlite3.OperationalError("connection pool exhausted")
+        waited = perf_counter() - started
+        DB_POOL_WAIT.observe(waited)
+        try:
+            conn = self._idle.get_nowait()
+            hit = True
+        except queue.Empty:
+            conn = self._connect()
+            hit = False
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+            self._checkouts += 1
+            self._wait_time += waited
+        (DB_POOL_HITS if hit else DB_POOL_MISSES).inc()
+        DB_POOL_CHECKOUTS.inc()
+        self._local.lease = _Lease(self, conn)
+        return conn
+
+    def release(self):
+        """Return current thread's connection to the pool"""
+        lease = getattr(self._local, "lease", None)
+        if lease is None:
+            return
+        self._local.lease = None
+        conn, lease.connection = lease.connection, None
+        self._put_back(conn)
+
+    def _put_back(self, conn: sqlite3.Connection):
+        with self._lock:
+            closed = conn not in self._connections
+        try:
+            if not closed:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self._idle.put(conn)
+        except sqlite3.ProgrammingError:
+            # closed outside the pool, e.g. finalized at interpreter exit
+            pass
+        self._slots.release()
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._idle = queue.LifoQueue()
+        for conn in connections:
+            conn.close()
+        logger.info(f"pool closed {len(connections)} connections")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self._size,
+                "opened": len(self._connections),
+                "idle": self._idle.qsize(),
+                "hits": self._hits,
+                "misses": self._misses,
+                "checkouts": self._checkouts,
+                "wait_time": self._wait_time,
+            }
+
+
+def get_migrations(sql_path: str = SQL_PATH) -> list[tuple[int, str]]:
+    """(version, path) of every migration file, ordered by version"""
+    migrations = []
+    for name in sorted(os.listdir(sql_path)):
+        if match := MIGRATION_PATTERN.match(name):
+            migrations.append((int(match[1]), os.path.join(sql_path, name)))
+    return migrations
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_in_batches(
+    conn: sqlite3.Connection,
+    query: str,
+    batch_size: int = 10000,
+    pause: float = 0.01
+) -> int:
+    """
+    Repeat query with :batch_size param until it affects no rows.
+    Each batch is a short transaction, so other writers can interleave.
+    Query should touch only rows that are not migrated yet, e.g.
+    UPDATE t SET x=... WHERE rowid IN
+        (SELECT rowid FROM t WHERE x IS NULL LIMIT :batch_size)
+    """
+    total = 0
+    while True:
+        with transaction(conn):
+            affected = conn.execute(query, {"batch_size": batch_size}).rowcount
+        total += affected
+        if affected <= 0:
+            return total
+        time.sleep(pause)
+
+
+def _apply_sql_migration(conn: sqlite3.Connection, version: int, path: str):
+    with open(path, "r") as file:
+        script = file.read()
+    with transaction(conn):
+        if get_schema_version(conn) >= version:
+            return
+        conn.executescript(script)
+        conn.execute(f"PRAGMA user_version = {version}")
+
+
+def _apply_py_migration(conn: sqlite3.Connection, version: int, path: str):
+    """
+    Module should define migrate(conn) and manage its own transactions,
+    e.g. with run_in_batches, it must be safe to rerun after interruption
+    """
+    spec = importlib.util.spec_from_file_location(f"migration_{version}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.migrate(conn)
+    with transaction(conn):
+        if get_schema_version(conn) < version:
+            conn.execute(f"PRAGMA user_version = {version}")
+
+
+def migrate(db_path: str, sql_path: str = SQL_PATH) -> int:
+    """Apply pending migrations, return schema version"""
+    migrations = get_migrations(sql_path)
+    with closing(get_connection(db_path)) as conn:
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT}")
+        version = get_schema_version(conn)
+        pending = [i for i in migrations if i[0] > version]
+        if not pending:
+            logger.info(f"{db_path} is up to date, version {version}")
+            return version
+        for version, path in pending:
+            logger.info(f"apply {os.path.basename(path)}")
+            if path.endswith(".py"):
+                _apply_py_migration(conn, version, path)
+            else:
+                _apply_sql_migration(conn, version, path)
+        logger.info(f"{db_path} migrated to version {version}")
+        return version
+
+
 def init_database(db_path: str):
-    with open(os.path.join(SQL_PATH, "init.sql"), "r") as file:
-        init_script = file.read()
-        logger.info(f"read {db_path}")
-    init_script_sum = md5(init_script.encode()).hexdigest()
-    if init_script_sum != INIT_SCRIPT_MD5SUM:
-        logger.exception("Init script's sum doesn't equals")
-        logger.debug(f'script sum:"{init_script_sum}"')
-        logger.debug(f'should be: "{INIT_SCRIPT_MD5SUM}"')
-        raise Exception("Invalid init script")
-    with get_connection(db_path) as conn:
-        conn.executescript(init_script)
-        conn.commit()
-        logger.info("init database")
+    migrate(db_path)
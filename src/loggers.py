@@ -1,6 +1,8 @@
 import os
 import sys
+import atexit
 import logging.config
+import logging.handlers
 
 import colorama
 
@@ -18,7 +20,7 @@ LOGFILE_MAXSIZE = int(
 )
 LOGGS_PATH = os.environ["BSO_LOGS_PATH"]
 DEFAULT_LOGGER_SETTINGS = {
-    "handlers": ["console", "file"],
+    "handlers": ["queue"],
     "level": LOGGING_LEVEL,
     "propagate": False,
 }
@@ -42,6 +44,17 @@ class ColorFilter(logging.Filter):
         return True
 
 
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler.prepare formats the message and traceback on the logging
+    thread. Records here stay in process, so they are queued as logged and
+    formatted by the listener handlers, LazyParams included.
+    Arguments are kept by reference, do not change them after logging
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
 config = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -70,10 +83,35 @@ config = {
             "backupCount": 8,
             "formatter": "file",
         },
+        "slow_file": {
+            "()": logging.handlers.RotatingFileHandler,
+            "filename": os.path.join(LOGGS_PATH, "slow.log"),
+            "maxBytes": LOGFILE_MAXSIZE,
+            "backupCount": 8,
+            "formatter": "file",
+        },
+        # records are only put on a queue by the logging thread,
+        # console and file handlers format and write on the listener thread
+        "queue": {
+            "class": DeferredQueueHandler,
+            "handlers": ["console", "file"],
+            "respect_handler_level": True,
+        },
+        "slow_queue": {
+            "class": DeferredQueueHandler,
+            "handlers": ["slow_file"],
+        },
     },
     "loggers": {
         "database": DEFAULT_LOGGER_SETTINGS,
         "blanks": DEFAULT_LOGGER_SETTINGS,
+        "report_service": DEFAULT_LOGGER_SETTINGS,
+        # see slow_queries, BSO_SLOW_QUERY_MS sets the threshold
+        "slow_queries": {
+            "handlers": ["slow_queue"],
+            "level": logging.WARNING,
+            "propagate": False,
+        },
     },
     "root": {
         "level": logging.WARNING,
@@ -83,3 +121,7 @@ config = {
 
 
 logging.config.dictConfig(config)
+for name in ("queue", "slow_queue"):
+    listener = logging.getHandlerByName(name).listener
+    listener.start()
+    atexit.register(listener.stop)
@@ -1,34 +1,87 @@
+import os
 import logging
+from time import perf_counter
+from contextlib import asynccontextmanager
 from typing import Annotated
-from functools import partial
 
 from fastapi import FastAPI
 from fastapi import Request
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
 from pydantic import AfterValidator
 
 import loggers
 import database
+import metrics
 import blanks.handlers
 from blanks.crud import BlankCRUD
-from report_service import ReportService
+from blanks.async_crud import AsyncBlankCRUD, DB_WORKERS
+from blanks.interval_crud import IntervalBlankCRUD
+from report_cache import ReportCache, read_changes
+from report_service import ReportService, IntervalReportService
+from report_service import period_totals
+
+STORAGE = os.environ.get("BSO_STORAGE", "rows")
+STORAGES = {
+    "rows": (BlankCRUD, ReportService),
+    "intervals": (IntervalBlankCRUD, IntervalReportService),
+}
+CRUD_CLASS, REPORT_SERVICE_CLASS = STORAGES[STORAGE]
+MAX_PERIOD_MONTHS = int(os.environ.get("BSO_MAX_PERIOD_MONTHS", 36))
 
 
 # init database
 database.init_database(database.DB_PATH)
-get_connection = partial(database.get_connection, database.DB_PATH)
+pool = database.ConnectionPool(database.DB_PATH)
+get_connection = pool.get_connection
+# every CRUD worker thread and the writer hold a connection for good
+if pool.size < DB_WORKERS + 1:
+    raise RuntimeError(
+        f"BSO_DB_POOL_SIZE={pool.size} is less than BSO_DB_WORKERS + 1 "
+        f"(writer) = {DB_WORKERS + 1}"
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # writer drains queued writes before connections are closed
+    app.state.crud.shutdown()
+    app.state.pool.close()
 
 
 # fastapi settings
-app = FastAPI()
-app.state.crud = BlankCRUD(get_connection)
+app = FastAPI(lifespan=lifespan)
+app.state.pool = pool
+app.state.report_cache = ReportCache()
+app.state.crud = AsyncBlankCRUD(get_connection, crud_class=CRUD_CLASS)
 
-# forward BlankCRUD instance to handler
+# forward AsyncBlankCRUD instance to handler
 @app.middleware("http")
 async def add_crud(request: Request, call_next):
     request.state.crud = app.state.crud    
     response = await call_next(request)
     return response
 
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    started = perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # route template, not path, keeps label values bounded
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_DURATION.observe(
+            perf_counter() - started,
+            request.method,
+            route.path if route is not None else "unmatched",
+            status
+        )
+
 app.include_router(blanks.handlers.router)
 
 
@@ -38,11 +91,101 @@ def month_validator(month):
     return month
 
 
+def queue_closes(version: int, closes: list):
+    """Reports only read, closing snapshots they find are written by the writer"""
+    app.state.crud.writer.submit(
+        REPORT_SERVICE_CLASS(get_connection).save_closes, version, closes
+    )
+
+
+def report_service() -> ReportService:
+    return REPORT_SERVICE_CLASS(get_connection, on_close=queue_closes)
+
+
+async def sync_report_cache() -> int:
+    """
+    Apply writes of every process to the report cache, return data
+    version reports computed from now on are stored under
+    """
+    report_cache = app.state.report_cache
+    after = report_cache.version
+    changes = await app.state.crud.run(
+        lambda: read_changes(get_connection(), after)
+    )
+    return report_cache.sync(after, changes)
+
+
 @app.get("/report")
 async def get_report(
     request: Request,
     year: int,
     month: Annotated[int, AfterValidator(month_validator)]
 ):
-    report_service = ReportService(get_connection)
-    return report_service.get_report(year, month)
+    report_cache = app.state.report_cache
+    version = await sync_report_cache()
+    if (report := report_cache.get(year, month)) is not None:
+        return report
+    report = await app.state.crud.run(report_service().get_report, year, month)
+    report_cache.put(year, month, report, version)
+    return report
+
+
+@app.get(
+    "/report/period",
+    description="Reports of every month from start to end inclusive "
+    "and their totals, shaped like /report"
+)
+async def get_period_report(
+    request: Request,
+    start_year: int,
+    start_month: Annotated[int, AfterValidator(month_validator)],
+    end_year: int,
+    end_month: Annotated[int, AfterValidator(month_validator)]
+):
+    first = start_year * 12 + start_month - 1
+    count = end_year * 12 + end_month - first
+    if not 1 <= count <= MAX_PERIOD_MONTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Period should be from 1 to {MAX_PERIOD_MONTHS} months"
+        )
+    months = [divmod(first + i, 12) for i in range(count)]
+    months = [(year, month + 1) for year, month in months]
+    report_cache = app.state.report_cache
+    version = await sync_report_cache()
+    reports = []
+    for year, month in months:
+        if (report := report_cache.get(year, month)) is None:
+            break
+        reports.append(report)
+    # months from the first not cached one are computed in one pass
+    if len(reports) < count:
+        missing = months[len(reports):]
+        computed = await app.state.crud.run(
+            report_service().get_period_reports,
+            *missing[0], end_year, end_month
+        )
+        for (year, month), report in zip(missing, computed):
+            report_cache.put(year, month, report, version)
+        reports += computed
+    # plain JSON types, skips jsonable_encoder walking every range
+    return JSONResponse({
+        **period_totals(reports),
+        "months": [
+            {"year": year, "month": month, **report}
+            for (year, month), report in zip(months, reports)
+        ],
+    })
+
+
+@app.get("/report/cache")
+async def get_report_cache_stats():
+    return app.state.report_cache.stats()
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return Response(
+        content=metrics.REGISTRY.render(),
+        media_type=metrics.CONTENT_TYPE
+    )
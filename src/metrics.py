@@ -0,0 +1,299 @@
+"""
+In-process metrics exposed by GET /metrics in Prometheus text format.
+
+Observations are a bisect and a few additions under a lock,
+cheap enough to stay on in production.
+"""
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+from functools import cache
+from time import perf_counter
+from typing import Any, Iterator, Optional
+
+# seconds, upper bounds of histogram buckets, +Inf is implied
+BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+SLOW_QUERY_SECONDS = float(os.environ.get("BSO_SLOW_QUERY_MS", 500)) / 1000
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\"", r"\"").replace("\n", r"\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, **extra: str) -> str:
+    pairs = [*zip(names, values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self._label_names = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value: float = 1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self._label_names, labels)} {value}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = BUCKETS
+    ):
+        self.name = name
+        self.help = help
+        self._label_names = labels
+        self._buckets = buckets
+        # per labels: count of every bucket and +Inf, then sum
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect_left(self._buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self._buckets) + 1)
+                series.append(0.0)
+            series[i] += 1
+            series[-1] += value
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, values in series:
+            cumulative = 0
+            bounds = (*(repr(i) for i in self._buckets), "+Inf")
+            for bound, count in zip(bounds, values):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_labels(self._label_names, labels, le=bound)} {cumulative}"
+                )
+            yield f"{self.name}_sum{_labels(self._label_names, labels)} {values[-1]}"
+            yield f"{self.name}_count{_labels(self._label_names, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        self._metrics.append(metric := Counter(*args, **kwargs))
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        self._metrics.append(metric := Histogram(*args, **kwargs))
+        return metric
+
+    def render(self) -> str:
+        return "".join(
+            line + "\n" for metric in self._metrics for line in metric.collect()
+        )
+
+
+REGISTRY = Registry()
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "bso_http_request_duration_seconds",
+    "Time to response start by route template",
+    ("method", "route", "status")
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "bso_db_query_duration_seconds",
+    "Time spent in execute and fetch calls of a statement",
+    ("query",)
+)
+DB_QUERY_ROWS = REGISTRY.counter(
+    "bso_db_query_rows_total",
+    "Rows fetched by SELECT/RETURNING, changed by other statements",
+    ("query",)
+)
+DB_POOL_WAIT = REGISTRY.histogram(
+    "bso_db_pool_wait_seconds",
+    "Time a thread waited for a pooled connection"
+)
+DB_POOL_HITS = REGISTRY.counter(
+    "bso_db_pool_hits_total",
+    "get_connection calls served by a held or idle connection"
+)
+DB_POOL_MISSES = REGISTRY.counter(
+    "bso_db_pool_misses_total",
+    "get_connection calls that opened a new connection"
+)
+DB_POOL_CHECKOUTS = REGISTRY.counter(
+    "bso_db_pool_checkouts_total",
+    "Connections a thread took from the pool"
+)
+
+
+def _slow_query_plan(cursor: sqlite3.Cursor, sql: str, params: Any) -> str:
+    # imported here, database imports metrics
+    from slow_queries import slow_query_plan
+    return slow_query_plan(cursor.connection, sql, params)
+
+
+def observe_query(
+    query: str,
+    elapsed: float,
+    rows: int,
+    sql: str,
+    params: Optional[Any],
+    plan: Optional[str]
+):
+    """plan is None unless the statement is slow"""
+    DB_QUERY_DURATION.observe(elapsed, query)
+    DB_QUERY_ROWS.inc(rows, query)
+    if plan is not None:
+        from slow_queries import log_slow_query
+        log_slow_query(query, sql, params, elapsed, rows, plan)
+
+
+class MeteredCursor:
+    """
+    sqlite3.Cursor proxy observing duration and fetched rows of its
+    statement. Duration is the time spent in execute and fetch calls, not
+    by the reader between them. Plan of a slow statement is read as it
+    turns slow, on the thread using the cursor, the garbage collector
+    finishing a dropped cursor only logs it
+    """
+    __slots__ = (
+        "_cursor", "_query", "_elapsed", "_rows", "_sql", "_params",
+        "_plan", "_done"
+    )
+
+    def __init__(
+        self,
+        cursor: sqlite3.Cursor,
+        query: str,
+        started: float,
+        sql: str,
+        params: Optional[Any]
+    ):
+        self._cursor = cursor
+        self._query = query
+        self._elapsed = 0.0
+        self._rows = 0
+        self._sql = sql
+        self._params = params
+        self._plan = None
+        self._done = False
+        self._spent(started)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        rows = iter(self._cursor)
+        try:
+            while True:
+                started = perf_counter()
+                row = next(rows, None)
+                self._spent(started)
+                if row is None:
+                    return
+                self._rows += 1
+                yield row
+        finally:
+            self._finish()
+
+    def fetchone(self):
+        started = perf_counter()
+        row = self._cursor.fetchone()
+        self._spent(started)
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size: int = 1) -> list:
+        started = perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._spent(started)
+        if rows:
+            self._rows += len(rows)
+        else:
+            self._finish()
+        return rows
+
+    def fetchall(self) -> list:
+        started = perf_counter()
+        rows = self._cursor.fetchall()
+        self._spent(started)
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def _spent(self, started: float):
+        self._elapsed += perf_counter() - started
+        if self._plan is None and self._elapsed >= SLOW_QUERY_SECONDS:
+            self._plan = _slow_query_plan(self._cursor, self._sql, self._params)
+
+    def _finish(self):
+        if self._done:
+            return
+        self._done = True
+        observe_query(
+            self._query, self._elapsed, self._rows,
+            self._sql, self._params, self._plan
+        )
+
+    def __del__(self):
+        self._finish()
+
+
+def metered(
+    cursor: sqlite3.Cursor,
+    query: str,
+    started: float,
+    sql: str,
+    params: Optional[Any] = None
+) -> sqlite3.Cursor | MeteredCursor:
+    """
+    Cursor of sql named query executed at started, statements without
+    result rows are observed at once. params are kept for slow query
+    log, pass None for executemany ones
+    """
+    if cursor.description is None:
+        elapsed = perf_counter() - started
+        observe_query(
+            query, elapsed, max(cursor.rowcount, 0), sql, params,
+            _slow_query_plan(cursor, sql, params)
+            if elapsed >= SLOW_QUERY_SECONDS else None
+        )
+        return cursor
+    return MeteredCursor(cursor, query, started, sql, params)
+
+
+@cache
+def query_names(queries: type) -> dict[str, str]:
+    """`<class>.<attribute>` names of SQL string attributes of queries"""
+    return {
+        value: f"{queries.__name__}.{name}"
+        for name in dir(queries)
+        if not name.startswith("_")
+        and isinstance(value := getattr(queries, name), str)
+    }
@@ -0,0 +1,143 @@
+"""
+Offline report job: reports of every month of a year range written to
+files, one per month, by a pool of processes over read only connections
+
+    python report_batch.py <start year> [end year] [--output-dir reports]
+        [--format json|csv] [--processes N] [--db-path path]
+
+Storage is taken from BSO_STORAGE as by main.py. Months are split into
+one contiguous chunk per process, a chunk costs its opening clean ranges
+and a movements query per month, see ReportService.get_period_reports
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import Optional
+
+import database
+from report_service import CATEGORIES, ReportService, IntervalReportService
+
+REPORT_SERVICES = {
+    "rows": ReportService,
+    "intervals": IntervalReportService,
+}
+STORAGE = os.environ.get("BSO_STORAGE", "rows")
+OUTPUT_DIR = "reports"
+FORMATS = ("json", "csv")
+CSV_HEADER = ("year", "month", "category", "series", "start", "end")
+
+# per worker process, see _init_worker
+_report_service: Optional[ReportService] = None
+
+
+def split_months(first: int, last: int, parts: int) -> list[tuple[int, int]]:
+    """
+    Month indexes (year * 12 + month - 1) from first to last split into
+    at most `parts` contiguous (first, last) chunks of nearly equal size
+    """
+    count = last - first + 1
+    parts = max(1, min(parts, count))
+    size, extra = divmod(count, parts)
+    chunks = []
+    for i in range(parts):
+        end = first + size + (i < extra) - 1
+        chunks.append((first, end))
+        first = end + 1
+    return chunks
+
+
+def _year_month(index: int) -> tuple[int, int]:
+    return index // 12, index % 12 + 1
+
+
+def write_report(path: str, year: int, month: int, report: dict, format_: str):
+    """JSON is shaped like /report, CSV has a row per range"""
+    if format_ == "json":
+        with open(path, "w") as file:
+            json.dump({"year": year, "month": month, **report}, file)
+        return
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(CSV_HEADER)
+        for category in CATEGORIES:
+            for series, ranges in report[category].items():
+                writer.writerows(
+                    (year, month, category, series, start, end)
+                    for start, end in ranges
+                )
+
+
+def _init_worker(db_path: str, storage: str):
+    global _report_service
+    conn = database.get_read_only_connection(db_path)
+    # without on_close reports only read, closes are not queued anywhere
+    _report_service = REPORT_SERVICES[storage](lambda: conn)
+
+
+def _run_chunk(first: int, last: int, output_dir: str, format_: str) -> list[str]:
+    """Writes reports of months first..last, returns their paths"""
+    reports = _report_service.get_period_reports(
+        *_year_month(first), *_year_month(last)
+    )
+    paths = []
+    for index, report in enumerate(reports, first):
+        year, month = _year_month(index)
+        path = os.path.join(output_dir, f"{year}-{month:02}.{format_}")
+        write_report(path, year, month, report, format_)
+        paths.append(path)
+    return paths
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("start_year", type=int)
+    parser.add_argument("end_year", type=int, nargs="?")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--format", choices=FORMATS, default=FORMATS[0])
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--db-path", default=database.DB_PATH)
+    parser.add_argument("--storage", choices=REPORT_SERVICES, default=STORAGE)
+    args = parser.parse_args(argv)
+    end_year = args.end_year if args.end_year is not None else args.start_year
+    if end_year < args.start_year:
+        parser.error("end year is before start year")
+    if args.processes < 1:
+        parser.error("at least one process is needed")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    chunks = split_months(
+        args.start_year * 12, end_year * 12 + 11, args.processes
+    )
+    started = perf_counter()
+    written = 0
+    with ProcessPoolExecutor(
+        max_workers=len(chunks),
+        # fork of a process with threads, e.g. logging ones, may deadlock
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(args.db_path, args.storage)
+    ) as executor:
+        futures = [
+            executor.submit(
+                _run_chunk, first, last, args.output_dir, args.format
+            )
+            for first, last in chunks
+        ]
+        for future in as_completed(futures):
+            for path in future.result():
+                print(path)
+                written += 1
+    print(
+        f"{written} reports in {perf_counter() - started:.1f}s, "
+        f"{len(chunks)} processes"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
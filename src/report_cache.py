@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+REPORT_CACHE_SIZE = int(os.environ.get("BSO_REPORT_CACHE_SIZE", 64))
+
+
+Change = tuple[int, Optional[str]]
+
+
+def read_changes(conn: sqlite3.Connection, after: Optional[int]) -> list[Change]:
+    """
+    (version, since) rows of data_changes newer than `after`, by version.
+    Without `after` only the latest version is read, of unknown scope
+    """
+    if after is None:
+        return conn.execute(
+            "SELECT coalesce(max(version), 0), NULL FROM data_changes"
+        ).fetchall()
+    return conn.execute(
+        "SELECT version, since FROM data_changes WHERE version > ? "
+        "ORDER BY version",
+        (after,)
+    ).fetchall()
+
+
+class ReportCache:
+    """
+    LRU cache of reports keyed by (year, month).
+
+    A write touching a blank dated or created in month M can only change
+    reports of M and later months, so `invalidate` drops exactly those.
+    Writes of every process are logged to data_changes, `sync` applies
+    the rows newer than `version` and moves it forward, a report computed
+    from data older than `version` is not stored (see `put`).
+    """
+    def __init__(self, max_size: int = REPORT_CACHE_SIZE):
+        self._max_size = max_size
+        self._entries: OrderedDict[tuple[int, int], dict] = OrderedDict()
+        self._lock = threading.Lock()
+        # latest data_changes version applied, None before the first sync
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, year: int, month: int) -> Optional[dict]:
+        with self._lock:
+            report = self._entries.get((year, month))
+            if report is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((year, month))
+            self.hits += 1
+            return report
+
+    def sync(self, after: Optional[int], changes: list[Change]) -> int:
+        """
+        Apply changes read by read_changes(conn, after), `after` being
+        `version` at the time, return the version they were read at.
+        Changes already applied by another sync are skipped, a gap in
+        versions, e.g. of pruned rows, clears all
+        """
+        with self._lock:
+            for version, since in changes:
+                if self.version is not None and version <= self.version:
+                    continue
+                if self.version is None or version != self.version + 1:
+                    since = None
+                self._invalidate(since)
+                self.version = version
+        return changes[-1][0] if changes else after
+
+    def put(self, year: int, month: int, report: dict, version: int):
+        """Store report computed from data of `version`, see sync"""
+        with self._lock:
+            if version != self.version or self._max_size <= 0:
+                return
+            self._entries[(year, month)] = report
+            self._entries.move_to_end((year, month))
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, since: Optional[str] = None):
+        """
+        Drop reports of months starting from the one of `since`
+        ("YYYY-MM-DD..." string), all of them if it is unknown
+        """
+        with self._lock:
+            self._invalidate(since)
+
+    def _invalidate(self, since: Optional[str]):
+        if since is None:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            return
+        first = (int(since[:4]), int(since[5:7]))
+        for key in [k for k in self._entries if k >= first]:
+            del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "version": self.version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
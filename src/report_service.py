@@ -1,6 +1,49 @@
+import sys
 import logging
 import sqlite3
-from typing import Callable, Iterable
+import datetime
+from array import array
+from heapq import merge
+from itertools import chain, groupby
+from operator import itemgetter
+from time import perf_counter
+from typing import Any, Callable, Iterable, Optional
+
+from database import transaction
+from metrics import metered, query_names
+
+
+CATEGORIES = (
+    "use", "new", "spoiled", "lost", "clean_at_begin", "clean_at_end"
+)
+# month movements, dated and added turn opening clean ranges into closing
+MOVEMENTS = ("use", "new", "spoiled", "lost", "dated", "added")
+
+_DATED = "date >= :start AND date < :next_start"
+# every BlankStatus, keeps rows dated in a month on the (status, date)
+# indexes of 0004 whatever their status
+_ANY_STATUS = "status IN (0, 1, 2, 3)"
+# bit i of flags is set when row belongs to MOVEMENTS[i]
+_MOVEMENT_FLAGS = (
+    f"CASE WHEN status = 1 AND {_DATED} THEN 1 ELSE 0 END + "
+    "CASE WHEN created_at >= :start AND created_at < :next_start "
+    "THEN 2 ELSE 0 END + "
+    f"CASE WHEN status = 2 AND {_DATED} THEN 4 ELSE 0 END + "
+    f"CASE WHEN status = 3 AND {_DATED} THEN 8 ELSE 0 END + "
+    f"CASE WHEN {_DATED} THEN 16 ELSE 0 END + "
+    "CASE WHEN created_at >= :start AND created_at < :next_start "
+    "AND (date >= :next_start OR date IS NULL) THEN 32 ELSE 0 END"
+)
+# indexes of set bits for every flags value
+_BITS = tuple(
+    tuple(i for i in range(len(MOVEMENTS)) if flags >> i & 1)
+    for flags in range(1 << len(MOVEMENTS))
+)
+# rows created in period and not dated in it, the rest are _DATED
+_CREATED = (
+    "created_at >= :start AND created_at < :next_start "
+    "AND (date IS NULL OR date < :start OR date >= :next_start)"
+)
 
 
 class Queries:
@@ -8,106 +51,648 @@ class Queries:
         (
             "SELECT number, series "
             "FROM c_blanks as b "
-            "WHERE b.date LIKE ? AND b.status = ? ORDER BY series, number"
+            "WHERE b.status = ? AND b.date >= ? AND b.date < ? "
+            "ORDER BY series, number"
         )
     new_blanks = \
         (
             "SELECT number, series "
             "FROM c_blanks as b "
-            "WHERE b.created_at LIKE ? ORDER BY series, number"
+            "WHERE b.created_at >= ? AND b.created_at < ? "
+            "ORDER BY series, number"
         )
+    # unary + keeps planner on idx_blanks_created_at instead of
+    # walking whole (series, number) index to skip sorting
     clean_blanks_at_month_begin = \
         (
             "SELECT number, series FROM c_blanks as b "
             "WHERE b.created_at < ? AND "
-            "(b.date >= ? OR b.date is NULL) ORDER BY series, number"
+            "(b.date >= ? OR b.date is NULL) ORDER BY +series, number"
+        )
+    # movements turning clean ranges at month begin into ones at its end
+    dated_blanks = \
+        (
+            "SELECT number, series "
+            "FROM c_blanks as b "
+            f"WHERE b.{_ANY_STATUS} AND b.date >= ? AND b.date < ? "
+            "ORDER BY series, number"
+        )
+    added_blanks = \
+        (
+            "SELECT number, series "
+            "FROM c_blanks as b "
+            "WHERE b.created_at >= ? AND b.created_at < ? "
+            "AND (b.date >= ? OR b.date is NULL) "
+            "ORDER BY series, number"
+        )
+
+    # all movements of a month in one statement, see _MOVEMENT_FLAGS,
+    # one row per (series, number) edge of a movement range
+    movements = \
+        (
+            "WITH base AS MATERIALIZED ("
+            f"SELECT series, number, {_MOVEMENT_FLAGS} AS flags FROM c_blanks "
+            f"WHERE {_ANY_STATUS} AND {_DATED} "
+            "UNION ALL "
+            f"SELECT series, number, {_MOVEMENT_FLAGS} AS flags FROM c_blanks "
+            f"WHERE {_CREATED}"
+            ") "
+            "SELECT series, number, number, starts, ends FROM ("
+            "SELECT series, number, "
+            "flags & ~iif(prev_number = number - 1, prev_flags, 0) AS starts, "
+            "flags & ~iif(next_number = number + 1, next_flags, 0) AS ends "
+            "FROM ("
+            "SELECT series, number, flags, "
+            "lag(number) OVER w AS prev_number, lag(flags) OVER w AS prev_flags, "
+            "lead(number) OVER w AS next_number, lead(flags) OVER w AS next_flags "
+            "FROM base WINDOW w AS (PARTITION BY series ORDER BY number)"
+            ")) WHERE starts OR ends ORDER BY series, number"
+        )
+
+    last_close = "SELECT max(month) FROM month_closes WHERE month <= ?"
+    snapshot = \
+        (
+            "SELECT series, ranges FROM month_snapshots "
+            "WHERE month = ? ORDER BY series"
+        )
+    delete_snapshot = "DELETE FROM month_snapshots WHERE month = ?"
+    insert_snapshot = \
+        (
+            "INSERT INTO month_snapshots(month, series, ranges) "
+            "VALUES(?,?,?)"
+        )
+    insert_close = "INSERT OR REPLACE INTO month_closes(month) VALUES(?)"
+    is_closed = "SELECT 1 FROM month_closes WHERE month = ?"
+    data_version = "SELECT coalesce(max(version), 0) FROM data_changes"
+    # a logged write after version may have changed month ending at ?,
+    # or rows after version are pruned so it is unknown
+    changed_since = \
+        (
+            "SELECT 1 FROM data_changes WHERE version > :version "
+            "AND (since IS NULL OR since < :next_start) "
+            "UNION ALL SELECT 1 WHERE "
+            "(SELECT min(version) FROM data_changes) > :version + 1 "
+            "LIMIT 1"
+        )
+
+
+class IntervalQueries(Queries):
+    """Same as Queries over interval storage, rows are (series, start, end)"""
+    blanks_by_date_and_status = \
+        (
+            "SELECT series, start, end "
+            "FROM c_blank_intervals as b "
+            "WHERE b.status = ? AND b.date >= ? AND b.date < ? "
+            "ORDER BY series, start"
         )
+    new_blanks = \
+        (
+            "SELECT series, start, end "
+            "FROM c_blank_intervals as b "
+            "WHERE b.created_at >= ? AND b.created_at < ? "
+            "ORDER BY series, start"
+        )
+    clean_blanks_at_month_begin = \
+        (
+            "SELECT series, start, end FROM c_blank_intervals as b "
+            "WHERE b.created_at < ? AND "
+            "(b.date >= ? OR b.date is NULL) ORDER BY +series, start"
+        )
+    dated_blanks = \
+        (
+            "SELECT series, start, end "
+            "FROM c_blank_intervals as b "
+            f"WHERE b.{_ANY_STATUS} AND b.date >= ? AND b.date < ? "
+            "ORDER BY series, start"
+        )
+    added_blanks = \
+        (
+            "SELECT series, start, end "
+            "FROM c_blank_intervals as b "
+            "WHERE b.created_at >= ? AND b.created_at < ? "
+            "AND (b.date >= ? OR b.date is NULL) "
+            "ORDER BY series, start"
+        )
+    # same as Queries.movements, intervals are adjacent by start and end
+    movements = \
+        (
+            "WITH base AS MATERIALIZED ("
+            f"SELECT series, start, end, {_MOVEMENT_FLAGS} AS flags "
+            f"FROM c_blank_intervals WHERE {_ANY_STATUS} AND {_DATED} "
+            "UNION ALL "
+            f"SELECT series, start, end, {_MOVEMENT_FLAGS} AS flags "
+            f"FROM c_blank_intervals WHERE {_CREATED}"
+            ") "
+            "SELECT series, start, end, starts, ends FROM ("
+            "SELECT series, start, end, "
+            "flags & ~iif(prev_end = start - 1, prev_flags, 0) AS starts, "
+            "flags & ~iif(next_start = end + 1, next_flags, 0) AS ends "
+            "FROM ("
+            "SELECT series, start, end, flags, "
+            "lag(end) OVER w AS prev_end, lag(flags) OVER w AS prev_flags, "
+            "lead(start) OVER w AS next_start, lead(flags) OVER w AS next_flags "
+            "FROM base WINDOW w AS (PARTITION BY series ORDER BY start)"
+            ")) WHERE starts OR ends ORDER BY series, start"
+        )
+
+
+def _subtract_ranges(
+    ranges: list[tuple[int]],
+    removed: list[tuple[int]]
+) -> list[tuple[int]]:
+    """Both are sorted disjoint ranges"""
+    result = []
+    i = 0
+    for start, end in ranges:
+        while i < len(removed) and removed[i][1] < start:
+            i += 1
+        j = i
+        while j < len(removed) and removed[j][0] <= end:
+            if removed[j][0] > start:
+                result.append((start, removed[j][0] - 1))
+            start = max(start, removed[j][1] + 1)
+            j += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+def _union_ranges(
+    ranges: list[tuple[int]],
+    added: list[tuple[int]]
+) -> list[tuple[int]]:
+    """Both are sorted disjoint ranges, adjacent ones are joined"""
+    result = []
+    for start, end in merge(ranges, added):
+        if result and result[-1][1] + 1 >= start:
+            if end > result[-1][1]:
+                result[-1] = (result[-1][0], end)
+        else:
+            result.append((start, end))
+    return result
+
+
+def _build_ranges(
+    numbers: Iterable[tuple[int, str]]
+) -> dict[str, list[tuple[int]]]:
+    """
+    Runs of consecutive numbers from (number, series) rows grouped by
+    series, only the open run is kept besides the result. A series met
+    again continues its last run, as if rows were grouped first
+    """
+    ranges_by_series = {}
+    for series, rows in groupby(numbers, itemgetter(1)):
+        ranges = ranges_by_series.setdefault(series, list())
+        if ranges:
+            start, end = ranges.pop()
+        else:
+            start = end = next(rows)[0]
+        for number, _ in rows:
+            if number != end + 1:
+                ranges.append((start, end))
+                start = number
+            end = number
+        ranges.append((start, end))
+    return ranges_by_series
+
+
+def period_totals(reports: list[dict]) -> dict:
+    """
+    Report of consecutive months: movements of all of them joined,
+    clean ranges at begin of the first and at end of the last one
+    """
+    totals = {}
+    for category in ("use", "new", "spoiled", "lost"):
+        joined = {}
+        for report in reports:
+            for series, ranges in report[category].items():
+                joined[series] = _union_ranges(joined.get(series, []), ranges)
+        totals[category] = dict(sorted(joined.items()))
+    totals["clean_at_begin"] = reports[0]["clean_at_begin"]
+    totals["clean_at_end"] = reports[-1]["clean_at_end"]
+    return totals
+
+
+def _pack_ranges(ranges: list[tuple[int]]) -> bytes:
+    """Flat little endian int64 start, end pairs"""
+    packed = array("q", chain.from_iterable(ranges))
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_ranges(blob: bytes) -> list[tuple[int]]:
+    packed = array("q")
+    packed.frombytes(blob)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return list(zip(packed[::2], packed[1::2]))
+
+
+def _shift_month(month_start: str, months: int) -> str:
+    """'YYYY-MM-01' moved by months"""
+    index = int(month_start[:4]) * 12 + int(month_start[5:7]) - 1 + months
+    return f"{index // 12}-{index % 12 + 1:02}-01"
+
+
+# closing clean ranges of months computed by a report: (month start, ranges)
+Closes = list[tuple[str, dict[str, list[tuple[int]]]]]
 
 
 class ReportService:
-    """Generates report of strict accounting forms(in code - blank)"""
-    def __init__(self, get_connection: Callable[[], sqlite3.Connection]):
+    """
+    Generates report of strict accounting forms(in code - blank).
+
+    Reports only read. Closing ranges they compute for months that are
+    over and have no snapshot yet are handed to `on_close` with the data
+    version they are computed from, e.g. to be queued to the writer,
+    which persists them with save_closes
+    """
+    _queries = Queries
+    max_roll_forward = 1
+
+    def __init__(
+        self,
+        get_connection: Callable[[], sqlite3.Connection],
+        on_close: Optional[Callable[[int, Closes], Any]] = None
+    ):
         self._get_connection = get_connection
+        self._on_close = on_close
+        self._logger = logging.getLogger("report_service")
 
-    def _fetch(
-        self, 
-        query: str, 
-        params: tuple = tuple()
-    ) -> list[tuple[int, str]]:
-        with self._get_connection() as conn:
+    def _execute(
+        self,
+        conn: sqlite3.Connection,
+        query: str,
+        params: Iterable | dict = tuple(),
+        many: bool = False
+    ) -> sqlite3.Cursor:
+        """Statement metered under its name in self._queries"""
+        name = query_names(self._queries).get(query, type(self).__name__)
+        started = perf_counter()
+        if many:
+            cur = conn.executemany(query, params)
+        else:
             cur = conn.execute(query, params)
-        return cur.fetchall()
-
-    def _goruped_numbers(
-        self, 
-        numbers: Iterable[tuple[int, str]]
-        ) -> dict[str, list]:
-        """Grouping numbers by series"""
-        grouped_numbers = {}
-        for number, series in numbers:
-            grouped_numbers.setdefault(series, list()).append(number)
-        return grouped_numbers
+        return metered(cur, name, started, query, None if many else params)
 
     def _get_ranges(
         self, 
         numbers: Iterable[tuple[int, str]]
     ) -> dict[str, list[tuple[int]]]:
-        """Represents numbers as ranges grouped by series"""
-        numbers_by_series_raw = self._goruped_numbers(numbers)
-        ranges_by_series = {}
-        for series in numbers_by_series_raw:
-            numbers = numbers_by_series_raw[series]
-            ranges_by_series[series] = list()
-            start = end = numbers[0]
-            for number in numbers[1:]:
-                if number != end + 1:
-                    ranges_by_series[series].append((start, end))
-                    start = number
-                end = number
-            ranges_by_series[series].append((start, end))
-        return ranges_by_series
+        """
+        Represents numbers as ranges grouped by series.
+        Rows are consumed one by one
+        """
+        return _build_ranges(numbers)
 
-    def get_report(self, year: int, month: int) -> dict:
-        period_template = f'{year}-{month:02}-%'
+    def _to_ranges(self, rows: Iterable[tuple]) -> dict[str, list[tuple[int]]]:
+        """Ranges grouped by series from rows of clean query"""
+        return self._get_ranges(rows)
+
+    def _ranges(
+        self,
+        conn: sqlite3.Connection,
+        query: str,
+        params: tuple
+    ) -> dict[str, list[tuple[int]]]:
+        return self._to_ranges(self._execute(conn, query, params))
+
+    def _period(self, year: int, month: int) -> tuple[str, str]:
         period_start = f'{year}-{month:02}-01'
         period_next_start = f'{year+int(month/12)}-{month%12+1:02}-01'
+        return period_start, period_next_start
 
-        report = {
-            "use": self._get_ranges(
-                self._fetch(
-                    Queries.blanks_by_date_and_status, 
-                    (period_template, 1)
+    def _movements(
+        self,
+        conn: sqlite3.Connection,
+        start: str
+    ) -> dict[str, dict[str, list[tuple[int]]]]:
+        """
+        Ranges of MOVEMENTS of month beginning at start by one statement,
+        months of a period are read this way
+        """
+        movements = {i: {} for i in MOVEMENTS}
+        rows = self._execute(
+            conn,
+            self._queries.movements,
+            {"start": start, "next_start": _shift_month(start, 1)}
+        )
+        # rows are range edges ordered by series and number,
+        # starts/ends are bit masks of MOVEMENTS
+        opened = [None] * len(MOVEMENTS)
+        for series, first, last, starts, ends in rows:
+            for i in _BITS[starts]:
+                opened[i] = first
+            for i in _BITS[ends]:
+                movements[MOVEMENTS[i]].setdefault(series, list()).append(
+                    (opened[i], last)
                 )
+        return movements
+
+    def _movements_by_category(
+        self,
+        conn: sqlite3.Connection,
+        start: str
+    ) -> dict[str, dict[str, list[tuple[int]]]]:
+        """
+        Ranges of MOVEMENTS of month beginning at start, a query per
+        movement, cheaper than _movements for a single month
+        """
+        next_start = _shift_month(start, 1)
+        return {
+            "use": self._ranges(
+                conn,
+                self._queries.blanks_by_date_and_status,
+                (1, start, next_start)
             ),
-            "new": self._get_ranges(
-                self._fetch(
-                    Queries.new_blanks, 
-                    (period_template,)
-                )
+            "new": self._ranges(
+                conn, self._queries.new_blanks, (start, next_start)
             ),
-            "spoiled": self._get_ranges(
-                self._fetch(
-                    Queries.blanks_by_date_and_status, 
-                    (period_template, 2)
-                )
+            "spoiled": self._ranges(
+                conn,
+                self._queries.blanks_by_date_and_status,
+                (2, start, next_start)
             ),
-            "lost": self._get_ranges(
-                self._fetch(
-                    Queries.blanks_by_date_and_status, 
-                    (period_template, 3)
-                )
+            "lost": self._ranges(
+                conn,
+                self._queries.blanks_by_date_and_status,
+                (3, start, next_start)
             ),
-            "clean_at_begin": self._get_ranges(
-                self._fetch(
-                    Queries.clean_blanks_at_month_begin, 
-                    (period_start, period_start)
-                )
+            "dated": self._ranges(
+                conn, self._queries.dated_blanks, (start, next_start)
             ),
-            "clean_at_end": self._get_ranges(
-                self._fetch(
-                    Queries.clean_blanks_at_month_begin, 
-                    (period_next_start, period_next_start)
-                )
+            "added": self._ranges(
+                conn,
+                self._queries.added_blanks,
+                (start, next_start, next_start)
             ),
         }
-        return report
+
+    def _close_month(
+        self,
+        clean: dict[str, list[tuple[int]]],
+        movements: dict[str, dict[str, list[tuple[int]]]]
+    ) -> dict[str, list[tuple[int]]]:
+        """Clean ranges at month end from ones at its begin"""
+        dated, added = movements["dated"], movements["added"]
+        closing = {}
+        for series in sorted(clean.keys() | added.keys()):
+            ranges = _union_ranges(
+                _subtract_ranges(clean.get(series, []), dated.get(series, [])),
+                added.get(series, [])
+            )
+            if ranges:
+                closing[series] = ranges
+        return closing
+
+    def _closing(self, start: str, clean: dict, closes: Closes):
+        """Collect closing clean ranges of month if it is already over"""
+        today = datetime.datetime.now(datetime.UTC).strftime("%Y-%m-%d")
+        if _shift_month(start, 1) <= today:
+            closes.append((start, clean))
+
+    def _report_closes(self, version: int, closes: Closes):
+        if closes and self._on_close is not None:
+            self._on_close(version, closes)
+
+    def save_closes(self, version: int, closes: Closes) -> int:
+        """
+        Persist closing clean ranges computed from data of `version`,
+        return count of saved months. A month a later write may have
+        changed is skipped with the ones after it, saved ones are kept
+        """
+        saved = 0
+        with self._get_connection() as conn:
+            try:
+                with transaction(conn):
+                    for start, clean in closes:
+                        changed = self._execute(
+                            conn,
+                            self._queries.changed_since,
+                            {
+                                "version": version,
+                                "next_start": _shift_month(start, 1)
+                            }
+                        ).fetchone()
+                        if changed:
+                            break
+                        if self._execute(
+                            conn, self._queries.is_closed, (start,)
+                        ).fetchone():
+                            continue
+                        self._execute(
+                            conn, self._queries.delete_snapshot, (start,)
+                        )
+                        self._execute(
+                            conn,
+                            self._queries.insert_snapshot,
+                            (
+                                (start, series, _pack_ranges(ranges))
+                                for series, ranges in clean.items()
+                            ),
+                            many=True
+                        )
+                        self._execute(conn, self._queries.insert_close, (start,))
+                        saved += 1
+            except sqlite3.OperationalError as oe:
+                # e.g. lock timeout, the months are closed by a later report
+                self._logger.warning(
+                    f"closes of {len(closes)} months skipped: {oe}"
+                )
+                return 0
+        return saved
+
+    def _load_snapshot(
+        self,
+        conn: sqlite3.Connection,
+        start: str
+    ) -> dict[str, list[tuple[int]]]:
+        return {
+            series: _unpack_ranges(ranges)
+            for series, ranges in self._execute(
+                conn, self._queries.snapshot, (start,)
+            )
+        }
+
+    def _clean_at_end(
+        self,
+        conn: sqlite3.Connection,
+        start: str,
+        closes: Closes
+    ) -> dict[str, list[tuple[int]]]:
+        """
+        Clean ranges at end of month beginning at start, rolled forward
+        from the latest snapshot before it, closed months on the way
+        are collected to closes
+        """
+        closed = self._execute(
+            conn, self._queries.last_close, (start,)
+        ).fetchone()[0]
+        # rolling a month costs about as much as its clean ranges,
+        # far from a snapshot one full query is cheaper
+        if closed is None or \
+                closed < _shift_month(start, -self.max_roll_forward):
+            next_start = _shift_month(start, 1)
+            clean = self._to_ranges(
+                self._execute(
+                    conn,
+                    self._queries.clean_blanks_at_month_begin,
+                    (next_start, next_start)
+                )
+            )
+            self._closing(start, clean, closes)
+            return clean
+        clean = self._load_snapshot(conn, closed)
+        while closed < start:
+            closed = _shift_month(closed, 1)
+            clean = self._close_month(
+                clean, self._movements_by_category(conn, closed)
+            )
+            self._closing(closed, clean, closes)
+        return clean
+
+    def get_report(self, year: int, month: int) -> dict:
+        """
+        Movements of the month and clean ranges at its begin, taken from
+        the snapshot of the previous month, see _clean_at_end. Clean
+        ranges at its end are its own snapshot or are rolled forward by
+        the movements, so history is scanned only far from a snapshot
+        """
+        period_start, _ = self._period(year, month)
+        closes = []
+        with self._get_connection() as conn:
+            with transaction(conn, immediate=False):
+                version = self._execute(
+                    conn, self._queries.data_version
+                ).fetchone()[0]
+                clean_at_begin = self._clean_at_end(
+                    conn, _shift_month(period_start, -1), closes
+                )
+                movements = self._movements_by_category(conn, period_start)
+                closed = self._execute(
+                    conn, self._queries.last_close, (period_start,)
+                ).fetchone()[0]
+                if closed == period_start:
+                    clean_at_end = self._load_snapshot(conn, period_start)
+                else:
+                    clean_at_end = self._close_month(clean_at_begin, movements)
+                    self._closing(period_start, clean_at_end, closes)
+        self._report_closes(version, closes)
+        return {
+            "use": movements["use"],
+            "new": movements["new"],
+            "spoiled": movements["spoiled"],
+            "lost": movements["lost"],
+            "clean_at_begin": clean_at_begin,
+            "clean_at_end": clean_at_end,
+        }
+
+    def get_period_reports(
+        self,
+        year: int,
+        month: int,
+        end_year: int,
+        end_month: int
+    ) -> list[dict]:
+        """
+        Reports of every month from year-month to end_year-end_month,
+        clean ranges are computed once for the period begin and rolled
+        forward by movements, each month's closing is the next opening
+        """
+        period_start, _ = self._period(year, month)
+        period_end, _ = self._period(end_year, end_month)
+        reports = []
+        closes = []
+        with self._get_connection() as conn:
+            with transaction(conn, immediate=False):
+                version = self._execute(
+                    conn, self._queries.data_version
+                ).fetchone()[0]
+                clean = self._clean_at_end(
+                    conn, _shift_month(period_start, -1), closes
+                )
+                closed = self._execute(
+                    conn, self._queries.last_close, (period_end,)
+                ).fetchone()[0]
+                start = period_start
+                while start <= period_end:
+                    movements = self._movements(conn, start)
+                    clean_at_end = self._close_month(clean, movements)
+                    if closed is None or start > closed:
+                        self._closing(start, clean_at_end, closes)
+                    reports.append({
+                        "use": movements["use"],
+                        "new": movements["new"],
+                        "spoiled": movements["spoiled"],
+                        "lost": movements["lost"],
+                        "clean_at_begin": clean,
+                        "clean_at_end": clean_at_end,
+                    })
+                    clean = clean_at_end
+                    start = _shift_month(start, 1)
+        self._report_closes(version, closes)
+        return reports
+
+    def _get_report_by_category(self, year: int, month: int) -> dict:
+        """
+        Query per category in one read transaction, clean ranges from
+        the whole history. Tests and benchmarks check get_report by it
+        """
+        period_start, period_next_start = self._period(year, month)
+        with self._get_connection() as conn:
+            with transaction(conn, immediate=False):
+                return {
+                    "use": self._ranges(
+                        conn,
+                        self._queries.blanks_by_date_and_status,
+                        (1, period_start, period_next_start)
+                    ),
+                    "new": self._ranges(
+                        conn,
+                        self._queries.new_blanks,
+                        (period_start, period_next_start)
+                    ),
+                    "spoiled": self._ranges(
+                        conn,
+                        self._queries.blanks_by_date_and_status,
+                        (2, period_start, period_next_start)
+                    ),
+                    "lost": self._ranges(
+                        conn,
+                        self._queries.blanks_by_date_and_status,
+                        (3, period_start, period_next_start)
+                    ),
+                    "clean_at_begin": self._ranges(
+                        conn,
+                        self._queries.clean_blanks_at_month_begin,
+                        (period_start, period_start)
+                    ),
+                    "clean_at_end": self._ranges(
+                        conn,
+                        self._queries.clean_blanks_at_month_begin,
+                        (period_next_start, period_next_start)
+                    ),
+                }
+
+
+class IntervalReportService(ReportService):
+    """Report over interval storage, only interval bounds are fetched"""
+    _queries = IntervalQueries
+
+    def _merge_intervals(
+        self,
+        intervals: Iterable[tuple[str, int, int]]
+    ) -> dict[str, list[tuple[int]]]:
+        """Join adjacent intervals into ranges grouped by series"""
+        ranges_by_series = {}
+        for series, start, end in intervals:
+            ranges = ranges_by_series.setdefault(series, list())
+            if ranges and ranges[-1][1] + 1 == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges_by_series
+
+    def _to_ranges(self, rows: Iterable[tuple]) -> dict[str, list[tuple[int]]]:
+        return self._merge_intervals(rows)
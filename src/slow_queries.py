@@ -0,0 +1,48 @@
+"""
+Slow query log: statements spending more than BSO_SLOW_QUERY_MS in their
+execute and fetch calls are written to the "slow_queries" logger with
+their plan, see metrics.MeteredCursor
+"""
+import logging
+import sqlite3
+from typing import Any, Optional
+
+from database import LazyParams
+
+logger = logging.getLogger("slow_queries")
+
+
+def query_plan(conn: sqlite3.Connection, sql: str, params: Any) -> str:
+    """EXPLAIN QUERY PLAN output indented as a tree, like sqlite3 shell does"""
+    depths = {0: 0}
+    lines = []
+    for id, parent, _, detail in conn.execute(
+        f"EXPLAIN QUERY PLAN {sql}", params
+    ):
+        depths[id] = depths.get(parent, 0) + 1
+        lines.append("  " * depths[id] + detail)
+    return "\n".join(lines)
+
+
+def slow_query_plan(conn: sqlite3.Connection, sql: str, params: Any) -> str:
+    """Plan for the log, params are None for executemany, its plan is skipped"""
+    if params is None:
+        return ""
+    try:
+        return query_plan(conn, sql, params)
+    except sqlite3.Error as e:
+        return f"no plan: {e}"
+
+
+def log_slow_query(
+    name: str,
+    sql: str,
+    params: Optional[Any],
+    elapsed: float,
+    rows: int,
+    plan: str
+):
+    logger.warning(
+        "%s %.1f ms, %d rows\n%s\nparams=%s\n%s",
+        name, elapsed * 1000, rows, sql, LazyParams(params), plan
+    )
@@ -0,0 +1,105 @@
+import os
+import asyncio
+import unittest
+from time import perf_counter
+from random import random
+
+import loggers
+from database import ConnectionPool, init_database
+from blanks.async_crud import AsyncBlankCRUD
+from blanks.models import BlankInDTO, BlankRangeInDTO, BlankUpdateDTO
+
+
+def p99(latencies: list[float]) -> float:
+    latencies = sorted(latencies)
+    return latencies[int(len(latencies) * 0.99)]
+
+
+class AsyncBlankCRUDTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_db_path = os.path.join(
+            os.getcwd(),
+            f"{random()*1000}.sqlite3"
+        )
+        init_database(self.test_db_path)
+        self.pool = ConnectionPool(self.test_db_path, size=4)
+        self.crud = AsyncBlankCRUD(self.pool.get_connection, max_workers=3)
+
+    def tearDown(self):
+        self.crud.shutdown()
+        self.pool.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    async def _lookup_latencies(self, count: int) -> list[float]:
+        latencies = []
+        for _ in range(count):
+            started = perf_counter()
+            self.assertIsNotNone(await self.crud.get(1))
+            latencies.append(perf_counter() - started)
+        return latencies
+
+    async def test_crud(self):
+        await self.crud.create_from_range(
+            BlankRangeInDTO(series="AF", start=1, end=3)
+        )
+        self.assertEqual(
+            BlankInDTO(series="AF", number=1),
+            await self.crud.get(1)
+        )
+        self.assertEqual(3, len(await self.crud.read()))
+        self.assertTrue(await self.crud.delete(1))
+        self.assertIsNone(await self.crud.get(1))
+
+    async def test_concurrent_writes_are_grouped(self):
+        await self.crud.create_from_range(
+            BlankRangeInDTO(series="AF", start=1, end=200)
+        )
+        results = await asyncio.gather(
+            *(
+                self.crud.update(BlankUpdateDTO(id=i, comment=str(i)))
+                for i in range(1, 201)
+            ),
+            self.crud.delete(1000),
+            self.crud.create_from_range(
+                BlankRangeInDTO(series="AF", start=200, end=201)
+            ),
+            return_exceptions=True
+        )
+        self.assertListEqual([True] * 200, results[:200])
+        self.assertFalse(results[200])
+        self.assertIsInstance(results[201], ValueError)
+        self.assertListEqual(
+            [str(i) for i in range(1, 201)],
+            [
+                i.comment
+                for i in sorted(await self.crud.read(), key=lambda i: i.number)
+            ]
+        )
+        stats = self.crud.writer.stats()
+        self.assertEqual(203, stats["writes"])
+        self.assertLess(stats["groups"], 203)
+
+    async def test_lookup_latency_during_range_insert(self):
+        await self.crud.create_from_range(
+            BlankRangeInDTO(series="AA", start=1, end=1)
+        )
+        baseline = p99(await self._lookup_latencies(200))
+
+        insert = asyncio.create_task(
+            self.crud.create_from_range(
+                BlankRangeInDTO(series="AB", start=1, end=1_000_000)
+            )
+        )
+        started = perf_counter()
+        latencies = []
+        while not insert.done():
+            latencies.extend(await self._lookup_latencies(10))
+        await insert
+        insert_time = perf_counter() - started
+
+        # lookups keep being served while the insert runs
+        self.assertGreater(len(latencies), 50)
+        self.assertLess(p99(latencies), max(baseline * 20, 0.05))
+        self.assertLess(p99(latencies), insert_time / 10)
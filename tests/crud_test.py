@@ -1,10 +1,13 @@
 import os
 import sqlite3
+import time
 import unittest 
 import datetime
 from random import random
 from functools import partial
 
+from pydantic import BaseModel
+
 import loggers
 from blanks.crud import BlankAdapter, BlankCRUD
 from database import init_database, get_connection
@@ -12,6 +15,8 @@ from blanks.models import BlankStatus
 from blanks.models import BlankOutDTO
 from blanks.models import BlankUpdateDTO, Undefined
 from blanks.models import BlankInDTO, BlankRangeInDTO
+from blanks.models import BlankRangeUpdateDTO
+from blanks.models import BlankBatchDTO
 
 
 class BlankAdapterTest(unittest.TestCase):
@@ -59,6 +64,50 @@ class BlankAdapterTest(unittest.TestCase):
         )
         self.assertTrue(res.full_compare(excepted))
 
+    def test_from_trusted(self):
+        rows = (
+            {
+                "id": 1, "number": 1, "series": "AF",
+                "date": "2024-12-12 00:00:00", "comment": "c", "status": 2,
+                "created_at": "2024-12-12 10:11:12",
+                "updated_at": "2024-12-13 00:00:00", "deleted_at": None,
+            },
+            {
+                "id": 2, "number": 2, "series": "AF", "date": None,
+                "comment": None, "status": 0, "created_at": None,
+                "updated_at": None, "deleted_at": None,
+            },
+        )
+        for row in rows:
+            expected = BlankAdapter.from_dict(dict(row))
+            res = BlankAdapter.from_trusted(dict(row))
+            self.assertTrue(res.full_compare(expected))
+            self.assertEqual(expected.model_dump_json(), res.model_dump_json())
+        res = BlankAdapter.row_decoder(("series", "number"))(("AA", 3))
+        self.assertTrue(
+            res.full_compare(BlankOutDTO(series="AA", number=3))
+        )
+
+    def test_construct(self):
+        # _construct writes pydantic slots by hand, a pydantic upgrade
+        # adding or changing them has to fail here
+        self.assertEqual(
+            ("__dict__", "__pydantic_fields_set__",
+             "__pydantic_extra__", "__pydantic_private__"),
+            BaseModel.__slots__
+        )
+        values = {
+            "date": datetime.date(2024, 12, 12), "series": "AF", "number": 1,
+            "comment": None, "status": BlankStatus.Clean, "id": 1,
+            "created_at": None, "updated_at": None, "deleted_at": None,
+        }
+        self.assertEqual(list(BlankOutDTO.model_fields), list(values))
+        expected = BlankOutDTO.model_construct(**values)
+        res = BlankAdapter._construct(dict(values))
+        for slot in BaseModel.__slots__:
+            self.assertEqual(getattr(expected, slot), getattr(res, slot), slot)
+        self.assertEqual(expected, res)
+
 
 class BlanksCRUDTest(unittest.TestCase):
     def setUp(self):
@@ -101,6 +150,38 @@ class BlanksCRUDTest(unittest.TestCase):
             self.crud.read_with_filter("WHERE series=?", ("AF",))
         )
 
+    def test_read_with_filter_page(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=5))
+        self.crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=5))
+        self.crud.delete(2)
+        for params, raw_filter in (
+            (("AF",), "WHERE series=?"),
+            ({"series": "AF"}, "WHERE series=:series"),
+        ):
+            pages, after = [], None
+            while True:
+                page = self.crud.read_with_filter(raw_filter, params, 2, after)
+                pages.append([i.number for i in page])
+                if len(page) < 2:
+                    break
+                after = page[-1].id
+            self.assertListEqual([[1, 3], [4, 5], []], pages)
+
+    def test_read_page(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        first = self.crud.read_page(2)
+        self.assertListEqual([1, 2], [i.number for i in first])
+        second = self.crud.read_page(2, first[-1].id)
+        self.assertListEqual([3], [i.number for i in second])
+        with self.get_connection() as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN "
+                "SELECT * FROM (SELECT * FROM c_blanks) "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (1, 2)
+            ).fetchall()
+        self.assertRegex(plan[-1][-1], r"^SEARCH blanks USING INTEGER PRIMARY KEY")
+
     def test_read(self):
         with self.get_connection() as conn:
             conn.executemany(
@@ -115,6 +196,20 @@ class BlanksCRUDTest(unittest.TestCase):
         ]
         self.assertListEqual(expected_result, self.crud.read())
 
+    def test_read_in_id_order(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=2))
+        self.crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=2))
+        self.assertListEqual([1, 2, 3, 4], [i.id for i in self.crud.read()])
+        self.assertListEqual(
+            [1, 2, 3, 4],
+            [i.id for i in self.crud.read_with_filter("WHERE number > 0")]
+        )
+        with self.get_connection() as conn:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM c_blanks ORDER BY id"
+            ).fetchall()
+        self.assertEqual("SCAN blanks", plan[-1][-1])
+
     def test_read_empty(self):
         self.assertListEqual([], self.crud.read())
 
@@ -144,6 +239,40 @@ class BlanksCRUDTest(unittest.TestCase):
             self.crud.read()
         )
 
+    def test_create_from_range_overlap(self):
+        self.crud.create_from_range(
+            BlankRangeInDTO(series="AF", start=10, end=20)
+        )
+        for start, end in ((1, 10), (20, 30), (12, 15), (1, 100)):
+            with self.assertRaises(ValueError):
+                self.crud.create_from_range(
+                    BlankRangeInDTO(series="AF", start=start, end=end)
+                )
+        self.assertEqual(11, len(self.crud.read()))
+        self.crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=20))
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=9))
+        self.assertEqual(40, len(self.crud.read()))
+
+    def test_create_from_range_overlap_deleted(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=1))
+        self.crud.delete(1)
+        with self.assertRaises(ValueError):
+            self.crud.create_from_range(
+                BlankRangeInDTO(series="AF", start=1, end=5)
+            )
+
+    def test_create_from_range_overlap_fail_fast(self):
+        self.crud.create_from_range(
+            BlankRangeInDTO(series="AF", start=5_000_000, end=5_000_000)
+        )
+        started = time.perf_counter()
+        with self.assertRaises(ValueError):
+            self.crud.create_from_range(
+                BlankRangeInDTO(series="AF", start=1, end=5_000_000)
+            )
+        self.assertLess(time.perf_counter() - started, 0.1)
+        self.assertEqual(1, len(self.crud.read()))
+
     def test_update_comment(self):
         blank = BlankInDTO(series="AF", number=1, comment="gapan")
         self.crud._create(blank)
@@ -191,4 +320,78 @@ class BlanksCRUDTest(unittest.TestCase):
         blank = BlankInDTO(series="AF", number=1)
         cur = self.crud._create(blank)
         self.assertTrue(self.crud.delete(1))
-        self.assertFalse(self.crud.delete(2))
\ No newline at end of file
+        self.assertFalse(self.crud.delete(2))
+
+    def test_update_range(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=5))
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=8, end=9))
+        self.crud.delete(self.crud.search("AF3")[0].id)
+        affected, missing = self.crud.update_range(
+            BlankRangeUpdateDTO(
+                series="AF",
+                start=10,
+                end=0,
+                status=BlankStatus.Spoiled,
+                date=datetime.date(2024, 1, 1)
+            )
+        )
+        self.assertEqual(6, affected)
+        self.assertListEqual([(0, 0), (3, 3), (6, 7), (10, 10)], missing)
+        for blank in self.crud.read():
+            self.assertEqual(BlankStatus.Spoiled, blank.status)
+            self.assertEqual(datetime.date(2024, 1, 1), blank.date)
+            self.assertIsNone(blank.comment)
+        self.assertEqual(
+            (0, [(1, 10)]),
+            self.crud.update_range(
+                BlankRangeUpdateDTO(series="AA", start=1, end=10, comment="a")
+            )
+        )
+        with self.assertRaises(ValueError):
+            self.crud.update_range(
+                BlankRangeUpdateDTO(series="AF", start=1, end=10)
+            )
+
+    def test_delete_range(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=5))
+        self.assertEqual(
+            (3, [(0, 0)]),
+            self.crud.delete_range(BlankRangeInDTO(series="AF", start=0, end=3))
+        )
+        self.assertListEqual([4, 5], [i.number for i in self.crud.read()])
+        self.assertEqual(
+            (0, [(1, 3)]),
+            self.crud.delete_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        )
+
+    def _batch(self, atomic: bool) -> tuple[bool, list]:
+        changes = []
+        self.crud._on_change = changes.append
+        batch = BlankBatchDTO.model_validate({
+            "atomic": atomic,
+            "operations": [
+                {"op": "create", "series": "AF", "start": 1, "end": 3},
+                {"op": "update", "id": 1, "status": 1, "date": "2024-01-01"},
+                {"op": "delete", "id": 100},
+                {"op": "create", "series": "AF", "start": 3, "end": 4},
+                {"op": "delete", "id": 2},
+            ]
+        })
+        result = self.crud.batch(batch.operations, batch.atomic)
+        self.assertLessEqual(len(changes), 1)
+        return result
+
+    def test_batch(self):
+        self.assertEqual(
+            (True, [None, None, "Not found", "Invalid range", None]),
+            self._batch(False)
+        )
+        self.assertListEqual([1, 3], [i.number for i in self.crud.read()])
+        self.assertEqual(BlankStatus.Use, self.crud.get(1).status)
+
+    def test_batch_atomic(self):
+        self.assertEqual(
+            (False, ["Rolled back", "Rolled back", "Not found"] + ["Rolled back"] * 2),
+            self._batch(True)
+        )
+        self.assertListEqual([], self.crud.read())
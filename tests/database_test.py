@@ -0,0 +1,262 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+import logging
+import threading
+from random import random
+
+import loggers
+import metrics
+from database import ConnectionPool, init_database, transaction
+from database import get_migrations, get_schema_version, migrate
+from database import LazyParams
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.test_db_path = os.path.join(
+            os.getcwd(),
+            f"{random()*1000}.sqlite3"
+        )
+        init_database(self.test_db_path)
+        self.pool = ConnectionPool(self.test_db_path, size=2, timeout=0.1)
+
+    def tearDown(self):
+        self.pool.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _in_thread(self, target):
+        result = []
+        def run():
+            try:
+                result.append(target())
+            except Exception as e:
+                result.append(e)
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        if isinstance(result[0], Exception):
+            raise result[0]
+        return result[0]
+
+    def test_pragmas(self):
+        conn = self.pool.get_connection()
+        self.assertEqual(
+            conn.execute("PRAGMA journal_mode").fetchone()[0],
+            "wal"
+        )
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+        self.assertGreater(
+            conn.execute("PRAGMA busy_timeout").fetchone()[0],
+            0
+        )
+
+    def test_same_thread_reuse(self):
+        conn = self.pool.get_connection()
+        self.assertIs(conn, self.pool.get_connection())
+        stats = self.pool.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["opened"], 1)
+
+    def test_per_thread_connections(self):
+        conn = self.pool.get_connection()
+        other = self._in_thread(self.pool.get_connection)
+        self.assertIsNot(conn, other)
+        self.assertEqual(self.pool.stats()["opened"], 2)
+
+    def test_release_reuses_connection(self):
+        def get_and_release():
+            conn = self.pool.get_connection()
+            self.pool.release()
+            return conn
+        first = self._in_thread(get_and_release)
+        second = self._in_thread(get_and_release)
+        self.assertIs(first, second)
+        stats = self.pool.stats()
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["idle"], 1)
+
+    def test_metrics(self):
+        counters = (
+            metrics.DB_POOL_HITS, metrics.DB_POOL_MISSES,
+            metrics.DB_POOL_CHECKOUTS
+        )
+        before = [i._values.get((), 0) for i in counters]
+        def get_and_release():
+            self.pool.get_connection()
+            self.pool.get_connection()
+            self.pool.release()
+        self._in_thread(get_and_release)
+        self._in_thread(get_and_release)
+        after = [i._values.get((), 0) for i in counters]
+        stats = self.pool.stats()
+        stats = [stats["hits"], stats["misses"], stats["checkouts"]]
+        self.assertListEqual([3, 1, 2], stats)
+        self.assertListEqual(stats, [j - i for i, j in zip(before, after)])
+        rendered = metrics.REGISTRY.render()
+        for counter in counters:
+            self.assertIn(f"# TYPE {counter.name} counter\n", rendered)
+
+    def test_exhausted(self):
+        self.pool.get_connection()
+        done = threading.Event()
+        def hold():
+            self.pool.get_connection()
+            done.wait()
+        thread = threading.Thread(target=hold)
+        thread.start()
+        try:
+            while self.pool.stats()["checkouts"] < 2:
+                time.sleep(0.01)
+            with self.assertRaises(sqlite3.OperationalError):
+                self._in_thread(self.pool.get_connection)
+        finally:
+            done.set()
+            thread.join()
+
+    def test_thread_exit_releases(self):
+        self.pool.get_connection()
+        # threads exit without release(), their slot comes back anyway
+        first = self._in_thread(self.pool.get_connection)
+        second = self._in_thread(self.pool.get_connection)
+        self.assertIs(first, second)
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+
+class TransactionTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", autocommit=True)
+        self.conn.execute("CREATE TABLE t(x INTEGER)")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def _count(self) -> int:
+        return self.conn.execute("SELECT count(*) FROM t").fetchone()[0]
+
+    def test_commit(self):
+        with transaction(self.conn):
+            self.conn.execute("INSERT INTO t VALUES(1)")
+            self.assertTrue(self.conn.in_transaction)
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(1, self._count())
+
+    def test_rollback(self):
+        with self.assertRaises(ValueError):
+            with transaction(self.conn):
+                self.conn.execute("INSERT INTO t VALUES(1)")
+                raise ValueError
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(0, self._count())
+
+    def test_nested(self):
+        with transaction(self.conn):
+            self.conn.execute("INSERT INTO t VALUES(1)")
+            with self.assertRaises(ValueError):
+                with transaction(self.conn):
+                    self.conn.execute("INSERT INTO t VALUES(2)")
+                    raise ValueError
+            with transaction(self.conn):
+                self.conn.execute("INSERT INTO t VALUES(3)")
+        self.assertEqual(
+            [(1,), (3,)],
+            self.conn.execute("SELECT x FROM t ORDER BY x").fetchall()
+        )
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.sql_path = self.dir.name
+        self.db_path = os.path.join(self.dir.name, "test.sqlite3")
+        self._write(
+            "0001_init.sql",
+            "CREATE TABLE t(id INTEGER PRIMARY KEY, x INTEGER, y INTEGER);"
+            "INSERT INTO t(x) SELECT value FROM json_each('[1,2,3,4,5]');"
+        )
+        self._write("readme.txt", "not a migration")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _write(self, name: str, text: str):
+        with open(os.path.join(self.sql_path, name), "w") as file:
+            file.write(text)
+
+    def _version(self) -> int:
+        with sqlite3.connect(self.db_path) as conn:
+            return get_schema_version(conn)
+
+    def test_get_migrations(self):
+        self._write("0002_second.py", "")
+        self.assertListEqual(
+            [1, 2],
+            [i[0] for i in get_migrations(self.sql_path)]
+        )
+
+    def test_migrate(self):
+        self.assertEqual(1, migrate(self.db_path, self.sql_path))
+        self._write("0002_index.sql", "CREATE INDEX idx_t_x ON t(x);")
+        self.assertEqual(2, migrate(self.db_path, self.sql_path))
+        self.assertEqual(2, migrate(self.db_path, self.sql_path))
+        self.assertEqual(2, self._version())
+
+    def test_failed_migration_rollback(self):
+        migrate(self.db_path, self.sql_path)
+        self._write(
+            "0002_broken.sql",
+            "CREATE INDEX idx_t_x ON t(x); INSERT INTO missing VALUES(1);"
+        )
+        with self.assertRaises(sqlite3.OperationalError):
+            migrate(self.db_path, self.sql_path)
+        self.assertEqual(1, self._version())
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertIsNone(
+                conn.execute(
+                    "SELECT name FROM sqlite_master WHERE name='idx_t_x'"
+                ).fetchone()
+            )
+
+    def test_batched_py_migration(self):
+        self._write(
+            "0002_backfill.py",
+            "from database import run_in_batches\n"
+            "def migrate(conn):\n"
+            "    run_in_batches(\n"
+            "        conn,\n"
+            "        'UPDATE t SET y = x * 2 WHERE id IN '\n"
+            "        '(SELECT id FROM t WHERE y IS NULL LIMIT :batch_size)',\n"
+            "        batch_size=2,\n"
+            "        pause=0\n"
+            "    )\n"
+        )
+        self.assertEqual(2, migrate(self.db_path, self.sql_path))
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertListEqual(
+                [(2,), (4,), (6,), (8,), (10,)],
+                conn.execute("SELECT y FROM t ORDER BY id").fetchall()
+            )
+
+    def test_repository_migrations(self):
+        init_database(self.db_path)
+        self.assertEqual(get_migrations()[-1][0], self._version())
+
+
+class LoggingTest(unittest.TestCase):
+    def test_lazy_params(self):
+        params = list(range(10**6))
+        self.assertEqual("[0, 1, 2, 3, 4, 5, 6, 7, ...]", str(LazyParams(params)))
+        self.assertLess(len(str(LazyParams({"a": "x" * 1000}))), 100)
+
+    def test_queue_handler(self):
+        handler = logging.getHandlerByName("queue")
+        self.assertIsInstance(handler, logging.handlers.QueueHandler)
+        self.assertIsNotNone(handler.listener._thread)
+        for name in ("database", "blanks", "report_service"):
+            self.assertIn(handler, logging.getLogger(name).handlers)
@@ -0,0 +1,234 @@
+import os
+import csv
+import io
+import json
+import unittest
+import datetime
+from random import random
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+import loggers
+import blanks.handlers
+from database import ConnectionPool, init_database
+from blanks.crud import BlankCRUD
+from blanks.async_crud import AsyncBlankCRUD
+from blanks.handlers import EXPORT_PAGE_SIZE, PAGE_LIMIT
+from blanks.handlers import encode_cursor, decode_cursor, make_page
+from blanks.models import BlankOutDTO, BlankStatus
+from blanks.models import BlankRangeInDTO, BlankRangeUpdateDTO
+
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        for id in (0, 1, 9999999, 2**62):
+            self.assertEqual(id, decode_cursor(encode_cursor(id)))
+
+    def test_invalid_cursor(self):
+        for cursor in ("", "!", "YWJj", encode_cursor(1)[:-1] + "*", "/w=="):
+            with self.assertRaises(HTTPException) as raised:
+                decode_cursor(cursor)
+            self.assertEqual(400, raised.exception.status_code, cursor)
+
+    def test_make_page(self):
+        items = [BlankOutDTO(id=i, series="AF", number=i) for i in (3, 5)]
+        page = make_page(items, 2)
+        self.assertListEqual(items, page.items)
+        self.assertEqual(5, decode_cursor(page.next))
+        # a short page is the last one
+        self.assertIsNone(make_page(items, 3).next)
+        self.assertIsNone(make_page([], 2).next)
+
+
+class HandlersTest(unittest.TestCase):
+    def setUp(self):
+        self.test_db_path = os.path.join(
+            os.getcwd(),
+            f"{random()*1000}.sqlite3"
+        )
+        init_database(self.test_db_path)
+        self.pool = ConnectionPool(self.test_db_path, size=4)
+        self.crud = BlankCRUD(self.pool.get_connection)
+        self.async_crud = AsyncBlankCRUD(self.pool.get_connection, max_workers=2)
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def add_crud(request: Request, call_next):
+            request.state.crud = self.async_crud
+            return await call_next(request)
+
+        app.include_router(blanks.handlers.router)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.client.close()
+        self.async_crud.shutdown()
+        self.pool.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.test_db_path + suffix):
+                os.remove(self.test_db_path + suffix)
+
+    def _export(self, **params) -> list[dict]:
+        response = self.client.get("/blank/export", params=params)
+        self.assertEqual(200, response.status_code)
+        if params.get("format") == "csv":
+            self.assertEqual("text/csv", response.headers["content-type"][:8])
+            return list(csv.DictReader(io.StringIO(response.text)))
+        self.assertEqual(
+            "application/x-ndjson", response.headers["content-type"]
+        )
+        return [json.loads(i) for i in response.text.splitlines()]
+
+    def test_export_ndjson(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        self.crud.delete(2)
+        response = self.client.get("/blank/export")
+        self.assertEqual(
+            'attachment; filename="blanks.ndjson"',
+            response.headers["content-disposition"]
+        )
+        rows = self._export()
+        self.assertListEqual([1, 3], [i["number"] for i in rows])
+        self.assertDictEqual(
+            self.crud.get(1).model_dump(mode="json"), rows[0]
+        )
+
+    def test_export_csv(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        comment = 'one, "two"\nthree'
+        self.crud.update_range(
+            BlankRangeUpdateDTO(series="AF", start=2, end=2, comment=comment)
+        )
+        response = self.client.get("/blank/export", params={"format": "csv"})
+        self.assertEqual(
+            'attachment; filename="blanks.csv"',
+            response.headers["content-disposition"]
+        )
+        self.assertEqual(
+            ",".join(BlankOutDTO.model_fields),
+            response.text.split("\r\n")[0]
+        )
+        rows = self._export(format="csv")
+        self.assertListEqual(["1", "2", "3"], [i["number"] for i in rows])
+        self.assertEqual(comment, rows[1]["comment"])
+        self.assertEqual("", rows[0]["date"])
+        expected = self.crud.get(2).model_dump(mode="json")
+        self.assertDictEqual(
+            {k: "" if v is None else str(v) for k, v in expected.items()},
+            rows[1]
+        )
+
+    def test_export_filters(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=4))
+        self.crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=4))
+        self.crud.update_range(
+            BlankRangeUpdateDTO(
+                series="AF", start=2, end=3,
+                status=BlankStatus.Use, date=datetime.date(2024, 3, 1)
+            )
+        )
+        self.crud.update_range(
+            BlankRangeUpdateDTO(
+                series="AA", start=3, end=3,
+                status=BlankStatus.Spoiled, date=datetime.date(2024, 3, 1)
+            )
+        )
+        for params, expected in (
+            ({"series": "AA"}, [("AA", 1), ("AA", 2), ("AA", 3), ("AA", 4)]),
+            ({"date": "2024-03-01"}, [("AF", 2), ("AF", 3), ("AA", 3)]),
+            ({"status": 1}, [("AF", 2), ("AF", 3)]),
+            ({"series": "AF", "status": 0}, [("AF", 1), ("AF", 4)]),
+            ({"series": "AF", "date": "2024-03-01", "status": 2}, []),
+        ):
+            for format in ("ndjson", "csv"):
+                rows = self._export(format=format, **params)
+                self.assertListEqual(
+                    expected,
+                    [(i["series"], int(i["number"])) for i in rows],
+                    (params, format)
+                )
+
+    def test_export_invalid_params(self):
+        for params in (
+            {"format": "xml"},
+            {"status": len(BlankStatus)},
+            {"date": "2024-13-01"},
+        ):
+            response = self.client.get("/blank/export", params=params)
+            self.assertEqual(422, response.status_code, params)
+
+    def test_export_pages(self):
+        count = EXPORT_PAGE_SIZE * 2 + 1
+        self.crud.create_from_range(
+            BlankRangeInDTO(series="AF", start=1, end=count)
+        )
+        self.crud.delete(EXPORT_PAGE_SIZE)
+        expected = [i for i in range(1, count + 1) if i != EXPORT_PAGE_SIZE]
+        for format in ("ndjson", "csv"):
+            rows = self._export(format=format)
+            self.assertListEqual(expected, [int(i["id"]) for i in rows])
+            rows = self._export(format=format, series="AF")
+            self.assertListEqual(expected, [int(i["id"]) for i in rows])
+
+    def _pages(self, **params) -> list[list[int]]:
+        pages = []
+        while True:
+            response = self.client.get("/blank", params=params)
+            self.assertEqual(200, response.status_code, params)
+            page = response.json()
+            self.assertSetEqual({"items", "next"}, set(page))
+            pages.append([i["number"] for i in page["items"]])
+            if page["next"] is None:
+                return pages
+            params = {**params, "after": page["next"]}
+
+    def test_get_blanks_list_or_page(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=5))
+        self.crud.update_range(
+            BlankRangeUpdateDTO(
+                series="AF", start=1, end=3, date=datetime.date(2024, 3, 1)
+            )
+        )
+        for params in ({}, {"date": "2024-03-01"}, {"number": "AF%"}):
+            response = self.client.get("/blank", params=params)
+            self.assertEqual(200, response.status_code, params)
+            self.assertIsInstance(response.json(), list, params)
+        self.assertListEqual([[1, 2], [3, 4], [5]], self._pages(limit=2))
+        self.assertListEqual(
+            [[1, 2], [3]], self._pages(limit=2, date="2024-03-01")
+        )
+        self.assertListEqual(
+            [[1, 2], [3, 4], [5]], self._pages(limit=2, number="AF%")
+        )
+        # `after` alone pages by PAGE_LIMIT
+        self.assertLess(5, PAGE_LIMIT)
+        self.assertListEqual(
+            [[2, 3, 4, 5]], self._pages(after=encode_cursor(1))
+        )
+
+    def test_get_blanks_empty_page(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=2))
+        # no match at all is 404 either way, past the last one an empty page
+        for params in ({"date": "2024-03-01"}, {"date": "2024-03-01", "limit": 2}):
+            response = self.client.get("/blank", params=params)
+            self.assertEqual(404, response.status_code, params)
+        response = self.client.get(
+            "/blank", params={"number": "AF%", "after": encode_cursor(2)}
+        )
+        self.assertDictEqual({"items": [], "next": None}, response.json())
+
+    def test_get_blanks_invalid_page(self):
+        for params in (
+            {"after": "!"},
+            {"after": "YWJj", "limit": 2},
+            {"after": "YWJj", "number": "AF%"},
+            {"limit": 0},
+            {"limit": blanks.handlers.MAX_PAGE_LIMIT + 1},
+        ):
+            response = self.client.get("/blank", params=params)
+            self.assertEqual(
+                400 if "after" in params else 422,
+                response.status_code,
+                params
+            )
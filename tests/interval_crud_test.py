@@ -0,0 +1,280 @@
+import os
+import unittest
+import datetime
+from random import random
+from functools import partial
+
+import loggers
+from database import init_database, get_connection
+from blanks.crud import BlankCRUD
+from blanks.interval_crud import IntervalBlankCRUD, blank_id, split_blank_id
+from blanks.models import BlankStatus
+from blanks.models import BlankInDTO, BlankRangeInDTO, BlankUpdateDTO
+from blanks.models import BlankRangeUpdateDTO
+from report_service import ReportService, IntervalReportService
+
+
+class BlankIdTest(unittest.TestCase):
+    def test_round_trip(self):
+        for series, number in (("AA", 1), ("ZZ", 9999999), ("ЖЯ", 0)):
+            self.assertEqual(
+                (series, number),
+                split_blank_id(blank_id(series, number))
+            )
+
+    def test_not_a_series(self):
+        surrogate = (0xD800 * 65536 + 65) * 10**7 + 1
+        for id in (-1, surrogate, blank_id("aa", 1), blank_id("A1", 1)):
+            self.assertIsNone(split_blank_id(id), id)
+
+    def test_order(self):
+        self.assertLess(blank_id("AA", 9999999), blank_id("AB", 1))
+        self.assertLess(blank_id("AA", 1), blank_id("AA", 2))
+
+
+class IntervalBlankCRUDTest(unittest.TestCase):
+    def setUp(self):
+        self.test_db_path = os.path.join(
+            os.getcwd(),
+            f"{random()*1000}.sqlite3"
+        )
+        self.get_connection = partial(get_connection, self.test_db_path)
+        init_database(self.test_db_path)
+        self.crud = IntervalBlankCRUD(self.get_connection)
+
+    def tearDown(self):
+        del self.crud
+        os.remove(self.test_db_path)
+
+    def _intervals(self) -> list[tuple]:
+        with self.get_connection() as conn:
+            return conn.execute(
+                "SELECT series, start, end, status "
+                "FROM blank_intervals ORDER BY series, start"
+            ).fetchall()
+
+    def test_create_from_range(self):
+        blanks_range = BlankRangeInDTO(series="AF", start=100, end=115)
+        expected_result = [
+            BlankInDTO(series="AF", number=n)
+            for n in blanks_range.get_range()
+        ]
+        self.crud.create_from_range(blanks_range)
+        self.assertListEqual(expected_result, self.crud.read())
+        self.assertListEqual([("AF", 100, 115, 0)], self._intervals())
+
+    def test_create_from_range_overlap(self):
+        self.crud.create_from_range(
+            BlankRangeInDTO(series="AF", start=10, end=20)
+        )
+        for start, end in ((1, 10), (20, 30), (12, 15), (1, 100)):
+            with self.assertRaises(ValueError):
+                self.crud.create_from_range(
+                    BlankRangeInDTO(series="AF", start=start, end=end)
+                )
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=9))
+        self.crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=9))
+        self.assertEqual(29, len(self.crud.read()))
+
+    def test_get(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        for number in (1, 2, 3):
+            blank = self.crud.get(blank_id("AF", number))
+            self.assertEqual(BlankInDTO(series="AF", number=number), blank)
+            self.assertEqual(blank_id("AF", number), blank.id)
+        self.assertIsNone(self.crud.get(blank_id("AF", 4)))
+        self.assertIsNone(self.crud.get(blank_id("AA", 1)))
+        self.assertIsNone(self.crud.get(4))
+
+    def test_crafted_id(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        surrogate = (0xD800 * 65536 + 65) * 10**7 + 1
+        self.assertIsNone(self.crud.get(surrogate))
+        self.assertListEqual([], self.crud.read_page(2, surrogate))
+        self.assertListEqual(
+            [], self.crud.read_with_filter("WHERE series = ?", ("AF",), 2, surrogate)
+        )
+        self.assertListEqual([], self.crud.search("AF%", 2, surrogate))
+        self.assertFalse(self.crud.delete(surrogate))
+
+    def test_read_with_filter(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        self.crud.create_from_range(BlankRangeInDTO(series="AA", start=2, end=2))
+        self.assertListEqual(
+            [BlankInDTO(series="AF", number=2)],
+            self.crud.read_with_filter("WHERE series||number LIKE ?", ("AF2",))
+        )
+
+    def test_read_with_filter_by_interval(self):
+        rows = BlankCRUD(self.get_connection)
+        for crud in (rows, self.crud):
+            crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=20))
+            crud.create_from_range(BlankRangeInDTO(series="AA", start=5, end=9))
+            crud.update_range(
+                BlankRangeUpdateDTO(
+                    series="AF", start=4, end=12,
+                    status=BlankStatus.Use, date=datetime.date(2024, 3, 1)
+                )
+            )
+            crud.update_range(
+                BlankRangeUpdateDTO(
+                    series="AA", start=7, end=9,
+                    status=BlankStatus.Use, date=datetime.date(2024, 3, 1)
+                )
+            )
+        filters = (
+            ("WHERE date = ?", ("2024-03-01 00:00:00",)),
+            ("WHERE series = ? AND +status = ?", ("AF", 0)),
+            ("WHERE status = :status", {"status": 1}),
+            ("", ()),
+        )
+        for raw_filter, params in filters:
+            # ids of intervals are in (series, number) order
+            expected = sorted(
+                (i.series, i.number, i.status, i.date)
+                for i in rows.read_with_filter(raw_filter, params)
+            )
+            for limit in (None, 1, 4, 100):
+                blanks, after = [], None
+                while page := self.crud.read_with_filter(
+                    raw_filter, params, limit, after
+                ):
+                    blanks += page
+                    if limit is None:
+                        break
+                    self.assertLessEqual(len(page), limit)
+                    after = page[-1].id
+                self.assertListEqual(
+                    expected,
+                    [(i.series, i.number, i.status, i.date) for i in blanks],
+                    (raw_filter, limit)
+                )
+
+    def test_read_page(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=4))
+        self.crud.create_from_range(BlankRangeInDTO(series="AA", start=8, end=9))
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=7, end=7))
+        self.crud.delete(blank_id("AF", 2))
+        expected = [(i.series, i.number) for i in self.crud.read()]
+        for limit in (1, 2, 3, 10):
+            blanks, after = [], None
+            while page := self.crud.read_page(limit, after):
+                self.assertLessEqual(len(page), limit)
+                blanks += page
+                after = page[-1].id
+            self.assertListEqual(expected, [(i.series, i.number) for i in blanks])
+            self.assertListEqual(
+                [blank_id(*i) for i in expected],
+                [i.id for i in blanks]
+            )
+
+    def test_update_splits_and_merges(self):
+        self.crud.create_from_range(
+            BlankRangeInDTO(series="AF", start=1, end=10)
+        )
+        for number in (5, 4, 6):
+            self.assertTrue(
+                self.crud.update(
+                    BlankUpdateDTO(
+                        id=blank_id("AF", number),
+                        status=BlankStatus.Use,
+                        date=datetime.date(2024, 1, 1)
+                    )
+                )
+            )
+        self.assertListEqual(
+            [("AF", 1, 3, 0), ("AF", 4, 6, 1), ("AF", 7, 10, 0)],
+            self._intervals()
+        )
+        updated_blank = self.crud.get(blank_id("AF", 5))
+        self.assertEqual(updated_blank.status, BlankStatus.Use)
+        self.assertEqual(updated_blank.date, datetime.date(2024, 1, 1))
+        self.assertEqual(self.crud.get(blank_id("AF", 7)).status, BlankStatus.Clean)
+
+    def test_merge_ignores_updated_at(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        for number, updated_at in ((1, "2024-01-01"), (3, "2024-01-03")):
+            self.crud.update(BlankUpdateDTO(id=blank_id("AF", number), comment="c"))
+            with self.get_connection() as conn:
+                conn.execute(
+                    "UPDATE blank_intervals SET updated_at = ? "
+                    "WHERE series = 'AF' AND start = ?",
+                    (f"{updated_at} 00:00:00", number)
+                )
+        self.crud.update(BlankUpdateDTO(id=blank_id("AF", 2), comment="c"))
+        with self.get_connection() as conn:
+            intervals = conn.execute(
+                "SELECT start, end, comment, updated_at FROM blank_intervals"
+            ).fetchall()
+        self.assertEqual(1, len(intervals))
+        self.assertEqual((1, 3, "c"), intervals[0][:3])
+        self.assertGreater(intervals[0][3], "2024-01-03")
+
+    def test_update_return(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=1))
+        self.assertTrue(
+            self.crud.update(BlankUpdateDTO(id=blank_id("AF", 1), comment="a"))
+        )
+        self.assertFalse(
+            self.crud.update(BlankUpdateDTO(id=blank_id("AF", 2), comment="a"))
+        )
+
+    def test_delete(self):
+        self.crud.create_from_range(BlankRangeInDTO(series="AF", start=1, end=3))
+        self.assertTrue(self.crud.delete(blank_id("AF", 2)))
+        self.assertIsNone(self.crud.get(blank_id("AF", 2)))
+        self.assertFalse(self.crud.delete(blank_id("AF", 4)))
+        self.assertListEqual(
+            [BlankInDTO(series="AF", number=1), BlankInDTO(series="AF", number=3)],
+            self.crud.read()
+        )
+        with self.assertRaises(ValueError):
+            self.crud.create_from_range(
+                BlankRangeInDTO(series="AF", start=2, end=2)
+            )
+
+    def test_update_range(self):
+        for start, end in ((1, 5), (8, 9), (12, 20)):
+            self.crud.create_from_range(
+                BlankRangeInDTO(series="AF", start=start, end=end)
+            )
+        self.crud.delete(blank_id("AF", 3))
+        affected, missing = self.crud.update_range(
+            BlankRangeUpdateDTO(
+                series="AF", start=2, end=14, status=BlankStatus.Use
+            )
+        )
+        self.assertEqual(8, affected)
+        self.assertListEqual([(3, 3), (6, 7), (10, 11)], missing)
+        self.assertListEqual(
+            [
+                ("AF", 1, 1, 0), ("AF", 2, 2, 1), ("AF", 3, 3, 0),
+                ("AF", 4, 5, 1), ("AF", 8, 9, 1), ("AF", 12, 14, 1),
+                ("AF", 15, 20, 0)
+            ],
+            self._intervals()
+        )
+        self.assertIsNone(self.crud.get(blank_id("AF", 3)))
+        self.assertEqual(
+            (9, [(0, 0), (3, 3), (6, 7), (10, 11)]),
+            self.crud.delete_range(BlankRangeInDTO(series="AF", start=0, end=14))
+        )
+        self.assertListEqual(
+            list(range(15, 21)), [i.number for i in self.crud.read()]
+        )
+
+    def test_report_matches_rows_storage(self):
+        with open("sql/insert_test_data.sql", "r") as file:
+            script = file.read()
+        with self.get_connection() as conn:
+            conn.executescript(script)
+        rows_report = ReportService(self.get_connection)
+        months = [(2013, 1)] + [(2024, m) for m in range(9, 13)] + \
+            [(2025, m) for m in range(1, 4)]
+        expected = [rows_report.get_report(*i) for i in months]
+
+        self.assertGreater(self.crud.import_blanks(), 0)
+        self.assertListEqual([], BlankCRUD(self.get_connection).read())
+        interval_report = IntervalReportService(self.get_connection)
+        for month, report in zip(months, expected):
+            self.assertDictEqual(report, interval_report.get_report(*month))
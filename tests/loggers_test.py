@@ -0,0 +1,37 @@
+import queue
+import logging
+import threading
+import unittest
+from io import StringIO
+from logging.handlers import QueueListener
+
+from loggers import DeferredQueueHandler
+
+
+class FormattedOn:
+    """Log argument remembering the threads it was formatted on"""
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self) -> str:
+        self.threads.append(threading.current_thread())
+        return "formatted"
+
+
+class DeferredQueueHandlerTest(unittest.TestCase):
+    def test_format_on_listener(self):
+        records = queue.Queue()
+        stream = StringIO()
+        listener = QueueListener(records, logging.StreamHandler(stream))
+        # out of the logger tree, no other handler formats its records
+        logger = logging.Logger("test")
+        logger.addHandler(DeferredQueueHandler(records))
+        arg = FormattedOn()
+        listener.start()
+        try:
+            logger.warning("%s", arg)
+        finally:
+            listener.stop()
+        self.assertEqual("formatted\n", stream.getvalue())
+        self.assertEqual(1, len(arg.threads))
+        self.assertIsNot(threading.current_thread(), arg.threads[0])
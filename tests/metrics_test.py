@@ -0,0 +1,124 @@
+import sqlite3
+import unittest
+from time import perf_counter, sleep
+
+import loggers
+import metrics
+from metrics import Registry, metered
+
+
+class HistogramTest(unittest.TestCase):
+    def test_render(self):
+        registry = Registry()
+        histogram = registry.histogram("t_seconds", "test", ("route",), (0.1, 1.0))
+        counter = registry.counter("t_total", "test", ("route",))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value, '/a"b')
+        counter.inc(3, "/a")
+        self.assertEqual(
+            "# HELP t_seconds test\n"
+            "# TYPE t_seconds histogram\n"
+            't_seconds_bucket{route="/a\\"b",le="0.1"} 1\n'
+            't_seconds_bucket{route="/a\\"b",le="1.0"} 3\n'
+            't_seconds_bucket{route="/a\\"b",le="+Inf"} 4\n'
+            't_seconds_sum{route="/a\\"b"} 6.05\n'
+            't_seconds_count{route="/a\\"b"} 4\n'
+            "# HELP t_total test\n"
+            "# TYPE t_total counter\n"
+            't_total{route="/a"} 3\n',
+            registry.render()
+        )
+
+
+class MeteredCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:", autocommit=True)
+        self.conn.execute("CREATE TABLE t(x)")
+        self.conn.executemany("INSERT INTO t VALUES(?)", ((i,) for i in range(10)))
+
+    def _series(self, name: str) -> tuple[int, float]:
+        """Count of observations and rows of query"""
+        buckets = metrics.DB_QUERY_DURATION._series.get((name,), [0, 0])[:-1]
+        return sum(buckets), metrics.DB_QUERY_ROWS._values.get((name,), 0)
+
+    def test_rows(self):
+        cur = metered(
+            self.conn.execute("SELECT x FROM t"), "test.iter", perf_counter(), ""
+        )
+        self.assertEqual(10, len(list(cur)))
+        self.assertEqual((1, 10), self._series("test.iter"))
+
+        cur = metered(
+            self.conn.execute("SELECT x FROM t"), "test.one", perf_counter(), ""
+        )
+        self.assertEqual(0, cur.fetchone()[0])
+        del cur
+        self.assertEqual((1, 1), self._series("test.one"))
+
+        cur = metered(
+            self.conn.execute("SELECT x FROM t"), "test.many", perf_counter(), ""
+        )
+        while cur.fetchmany(4):
+            pass
+        self.assertEqual((1, 10), self._series("test.many"))
+
+        cur = metered(
+            self.conn.execute("UPDATE t SET x = x WHERE x < 4"),
+            "test.update",
+            perf_counter(),
+            ""
+        )
+        self.assertEqual(4, cur.rowcount)
+        self.assertEqual((1, 4), self._series("test.update"))
+
+    def test_slow_query_log(self):
+        threshold, metrics.SLOW_QUERY_SECONDS = metrics.SLOW_QUERY_SECONDS, 0
+        try:
+            with self.assertLogs("slow_queries", "WARNING") as logs:
+                query = "SELECT x FROM t WHERE x > ?"
+                metered(
+                    self.conn.execute(query, (5,)),
+                    "test.slow", perf_counter(), query, (5,)
+                ).fetchall()
+        finally:
+            metrics.SLOW_QUERY_SECONDS = threshold
+        message = logs.records[0].getMessage()
+        self.assertRegex(message, r"^test.slow [0-9.]+ ms, 4 rows\n")
+        self.assertIn("params=(5,)", message)
+        self.assertIn("\n  SCAN t", message)
+
+    def test_reader_time(self):
+        threshold, metrics.SLOW_QUERY_SECONDS = metrics.SLOW_QUERY_SECONDS, 0.05
+        try:
+            with self.assertNoLogs("slow_queries", "WARNING"):
+                cur = metered(
+                    self.conn.execute("SELECT x FROM t"),
+                    "test.reader", perf_counter(), "SELECT x FROM t", ()
+                )
+                for _ in cur:
+                    sleep(0.01)
+        finally:
+            metrics.SLOW_QUERY_SECONDS = threshold
+        series = metrics.DB_QUERY_DURATION._series[("test.reader",)]
+        self.assertLess(series[-1], 0.05)
+
+    def test_dropped_slow_query(self):
+        statements = []
+        threshold, metrics.SLOW_QUERY_SECONDS = metrics.SLOW_QUERY_SECONDS, 0
+        try:
+            with self.assertLogs("slow_queries", "WARNING") as logs:
+                query = "SELECT x FROM t WHERE x > ?"
+                cur = metered(
+                    self.conn.execute(query, (5,)),
+                    "test.dropped", perf_counter(), query, (5,)
+                )
+                cur.fetchone()
+                self.conn.set_trace_callback(statements.append)
+                del cur
+        finally:
+            metrics.SLOW_QUERY_SECONDS = threshold
+            self.conn.set_trace_callback(None)
+        self.assertEqual([], statements, "plan should not be read at GC time")
+        message = logs.records[0].getMessage()
+        self.assertRegex(message, r"^test.dropped [0-9.]+ ms, 1 rows\n")
+        self.assertIn("\n  SCAN t", message)
@@ -0,0 +1,103 @@
+import os
+import csv
+import json
+import tempfile
+import unittest
+from random import Random
+from functools import partial
+from contextlib import redirect_stdout
+from io import StringIO
+
+import report_batch
+from database import get_connection, init_database
+from report_service import ReportService
+
+
+class ReportBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.test_db_path = os.path.join(os.getcwd(), "test.sqlite3")
+        self.get_connection = partial(get_connection, self.test_db_path)
+        init_database(self.test_db_path)
+        rnd = Random(11)
+        days = [
+            f"{y}-{m:02}-{d:02} 12:00:00"
+            for y in (2023, 2024) for m in range(1, 13) for d in (1, 28)
+        ]
+        rows = []
+        for series in ("AA", "AB"):
+            for number in range(1, 200):
+                date = rnd.choice((None, rnd.choice(days)))
+                rows.append((
+                    series, number, rnd.choice(days), date,
+                    0 if date is None else rnd.randint(1, 3)
+                ))
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at, date, status) "
+                "VALUES(?,?,?,?,?)",
+                rows
+            )
+        self.output_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.output_dir.cleanup()
+        if os.path.exists(self.test_db_path):
+            os.remove(self.test_db_path)
+
+    def _run(self, *args: str):
+        with redirect_stdout(StringIO()):
+            code = report_batch.main([
+                *args,
+                "--db-path", self.test_db_path,
+                "--output-dir", self.output_dir.name,
+                "--processes", "5",
+            ])
+        self.assertEqual(0, code)
+
+    def test_split_months(self):
+        self.assertEqual(
+            [(0, 2), (3, 5), (6, 8), (9, 11)],
+            report_batch.split_months(0, 11, 4)
+        )
+        self.assertEqual(
+            [(0, 4), (5, 8), (9, 12)], report_batch.split_months(0, 12, 3)
+        )
+        self.assertEqual([(5, 5)], report_batch.split_months(5, 5, 8))
+
+    def test_json(self):
+        self._run("2023", "2024")
+        with self.get_connection() as conn:
+            closes = conn.execute("SELECT count(*) FROM month_closes").fetchone()
+        self.assertEqual(0, closes[0], "batch should not write")
+        rep = ReportService(self.get_connection)
+        for year in (2023, 2024):
+            for month in range(1, 13):
+                path = os.path.join(
+                    self.output_dir.name, f"{year}-{month:02}.json"
+                )
+                with open(path) as file:
+                    report = json.load(file)
+                expected = {
+                    "year": year, "month": month,
+                    **rep._get_report_by_category(year, month)
+                }
+                self.assertEqual(
+                    json.loads(json.dumps(expected)), report, path
+                )
+
+    def test_csv(self):
+        self._run("2024", "--format", "csv")
+        self.assertEqual(12, len(os.listdir(self.output_dir.name)))
+        report = ReportService(self.get_connection).get_report(2024, 7)
+        with open(os.path.join(self.output_dir.name, "2024-07.csv")) as file:
+            rows = list(csv.reader(file))
+        self.assertEqual(list(report_batch.CSV_HEADER), rows[0])
+        self.assertEqual(
+            [
+                ["2024", "7", category, series, str(start), str(end)]
+                for category, ranges_by_series in report.items()
+                for series, ranges in ranges_by_series.items()
+                for start, end in ranges
+            ],
+            rows[1:]
+        )
@@ -0,0 +1,186 @@
+import os
+import unittest
+import datetime
+from typing import Optional
+from random import random
+from functools import partial
+
+import loggers
+from blanks.crud import BlankCRUD
+from blanks.interval_crud import IntervalBlankCRUD, blank_id
+from blanks.models import BlankStatus
+from blanks.models import BlankRangeInDTO, BlankUpdateDTO
+from database import init_database, get_connection
+from report_cache import ReportCache, read_changes
+from report_service import ReportService
+
+
+class ReportCacheTest(unittest.TestCase):
+    def test_lru(self):
+        cache = ReportCache(max_size=2)
+        cache.sync(None, [(0, None)])
+        cache.put(2024, 1, {"m": 1}, cache.version)
+        cache.put(2024, 2, {"m": 2}, cache.version)
+        self.assertEqual({"m": 1}, cache.get(2024, 1))
+        cache.put(2024, 3, {"m": 3}, cache.version)
+        self.assertIsNone(cache.get(2024, 2))
+        self.assertEqual({"m": 1}, cache.get(2024, 1))
+        self.assertEqual({"m": 3}, cache.get(2024, 3))
+        stats = cache.stats()
+        self.assertEqual((3, 1, 1), (stats["hits"], stats["misses"], stats["evictions"]))
+        self.assertEqual(0.75, stats["hit_rate"])
+
+    def test_invalidate_since(self):
+        cache = ReportCache()
+        cache.sync(None, [(0, None)])
+        for month in range(1, 13):
+            cache.put(2024, month, {}, cache.version)
+        cache.put(2025, 1, {}, cache.version)
+        cache.invalidate("2024-06-15 10:00:00")
+        self.assertEqual(
+            [(2024, m) for m in range(1, 6)],
+            [(2024, m) for m in range(1, 13) if cache.get(2024, m) is not None]
+        )
+        self.assertIsNone(cache.get(2025, 1))
+        cache.invalidate(None)
+        self.assertEqual(0, cache.stats()["size"])
+
+    def test_sync(self):
+        cache = ReportCache()
+        self.assertEqual(3, cache.sync(None, [(3, None)]))
+        for month in (1, 2, 3):
+            cache.put(2024, month, {}, 3)
+        self.assertEqual(5, cache.sync(3, [(4, "2024-03-01"), (5, "2024-02-10")]))
+        self.assertEqual(1, cache.stats()["size"])
+        # applied by a concurrent sync already
+        self.assertEqual(5, cache.sync(4, [(5, "2024-01-01")]))
+        self.assertEqual(1, cache.stats()["size"])
+        self.assertEqual(5, cache.sync(5, []))
+        # rows 6 and 7 are pruned, scope of the gap is unknown
+        cache.sync(5, [(8, "2030-01-01")])
+        self.assertEqual((0, 8), (cache.stats()["size"], cache.version))
+
+    def test_stale_put(self):
+        cache = ReportCache()
+        version = cache.sync(None, [(1, None)])
+        cache.sync(1, [(2, "2030-01-01")])
+        cache.put(2024, 1, {}, version)
+        self.assertIsNone(cache.get(2024, 1))
+        cache.put(2024, 1, {}, 2)
+        self.assertIsNotNone(cache.get(2024, 1))
+
+
+class ReportCacheCRUDTest(unittest.TestCase):
+    def setUp(self):
+        self.test_db_path = os.path.join(
+            os.getcwd(),
+            f"{random()*1000}.sqlite3"
+        )
+        self.get_connection = partial(get_connection, self.test_db_path)
+        init_database(self.test_db_path)
+        self.changes = []
+
+    def tearDown(self):
+        os.remove(self.test_db_path)
+
+    def _set_created_at(
+        self,
+        table: str,
+        created_at: str,
+        id: Optional[int] = None
+    ):
+        with self.get_connection() as conn:
+            conn.execute(
+                f"UPDATE {table} SET created_at = ? WHERE ? IS NULL OR id = ?",
+                (created_at, id, id)
+            )
+
+    def test_blank_crud(self):
+        crud = BlankCRUD(self.get_connection, self.changes.append)
+        crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=3))
+        self.assertEqual(
+            datetime.datetime.now(datetime.UTC).strftime("%Y-%m"),
+            self.changes.pop()[:7]
+        )
+        self._set_created_at("blanks", "2024-03-10 00:00:00")
+        blank = crud.read()[0]
+        crud.update(
+            BlankUpdateDTO(
+                id=blank.id,
+                status=BlankStatus.Use,
+                date=datetime.date(2024, 5, 1)
+            )
+        )
+        self.assertEqual("2024-05-01 00:00:00", self.changes.pop())
+        # reports do not show comments
+        crud.update(BlankUpdateDTO(id=blank.id, comment="a"))
+        self.assertListEqual([], self.changes)
+        crud.update(BlankUpdateDTO(id=blank.id, date=datetime.date(2024, 1, 2)))
+        self.assertEqual("2024-01-02 00:00:00", self.changes.pop())
+        crud.delete(blank.id)
+        self.assertEqual("2024-01-02 00:00:00", self.changes.pop())
+        self.assertFalse(crud.update(BlankUpdateDTO(id=100, comment="a")))
+        self.assertFalse(crud.delete(100))
+        self.assertListEqual([], self.changes)
+
+    def test_interval_crud(self):
+        crud = IntervalBlankCRUD(self.get_connection, self.changes.append)
+        crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=3))
+        self.changes.clear()
+        self._set_created_at("blank_intervals", "2024-03-10 00:00:00")
+        crud.update(
+            BlankUpdateDTO(id=blank_id("AA", 2), date=datetime.date(2024, 2, 1))
+        )
+        self.assertEqual("2024-02-01 00:00:00", self.changes.pop())
+        crud.delete(blank_id("AA", 3))
+        self.assertEqual("2024-03-10 00:00:00", self.changes.pop())
+
+    def _sync(self, cache: ReportCache) -> int:
+        with self.get_connection() as conn:
+            return cache.sync(cache.version, read_changes(conn, cache.version))
+
+    def test_changes_log(self):
+        crud = BlankCRUD(self.get_connection, self.changes.append)
+        crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=3))
+        with crud.grouped():
+            with self.assertRaises(ValueError):
+                with crud.grouped():
+                    crud.update(
+                        BlankUpdateDTO(id=1, date=datetime.date(2024, 1, 10))
+                    )
+                    raise ValueError
+            crud.update(BlankUpdateDTO(id=2, date=datetime.date(2024, 3, 20)))
+            crud.update(BlankUpdateDTO(id=3, date=datetime.date(2024, 3, 10)))
+        # a row per transaction, a rolled back call is not in it
+        with self.get_connection() as conn:
+            self.assertEqual(
+                [(2, "2024-03-10 00:00:00")], read_changes(conn, 1)
+            )
+            self.assertEqual([(2, None)], read_changes(conn, None))
+        self.assertEqual("2024-03-10 00:00:00", self.changes.pop())
+
+    def test_report_invalidation(self):
+        # caches of two processes, writes go through one of them
+        cache, other = ReportCache(), ReportCache()
+        crud = BlankCRUD(self.get_connection)
+        report_service = ReportService(self.get_connection)
+        crud.create_from_range(BlankRangeInDTO(series="AA", start=1, end=3))
+        self._set_created_at("blanks", "2024-03-10 00:00:00")
+        for reports in (cache, other):
+            version = self._sync(reports)
+            for month in (2, 3, 4):
+                reports.put(
+                    2024, month, report_service.get_report(2024, month), version
+                )
+        crud.update(
+            BlankUpdateDTO(
+                id=crud.read()[0].id,
+                status=BlankStatus.Use,
+                date=datetime.date(2024, 4, 1)
+            )
+        )
+        for reports in (cache, other):
+            self._sync(reports)
+            self.assertIsNotNone(reports.get(2024, 2))
+            self.assertIsNotNone(reports.get(2024, 3))
+            self.assertIsNone(reports.get(2024, 4))
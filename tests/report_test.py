@@ -1,9 +1,22 @@
 import os
+import json
+import datetime
 import unittest
+from random import Random
 from functools import partial
 
-from report_service import ReportService
+import metrics
+from blanks.crud import BlankCRUD
+from blanks.interval_crud import IntervalBlankCRUD, blank_id
+from blanks.models import BlankRangeInDTO, BlankRangeUpdateDTO, BlankStatus
+from blanks.models import BlankUpdateDTO
+from report_service import Queries, IntervalQueries
+from report_service import _build_ranges
+from report_service import period_totals
+from report_service import ReportService, IntervalReportService
 from database import get_connection, init_database
+from report_cache import ReportCache
+from report_service import CATEGORIES
 
 
 class ReportTest(unittest.TestCase):
@@ -12,7 +25,7 @@ class ReportTest(unittest.TestCase):
         self.get_connection = partial(get_connection, self.test_db_path)
         init_database(self.test_db_path)
 
-    def test_normalize_ranges(self):
+    def test_build_ranges(self):
         test_data = (
             {
                 "input_data": tuple(),
@@ -20,31 +33,34 @@ class ReportTest(unittest.TestCase):
             },
             {
                 "input_data": ((1,"AA"),),
-                "expected_result": {"AA": [1]},
+                "expected_result": {"AA": [(1, 1)]},
             },
             {
                 "input_data": ((1, "AA"), (3, "AA"), (4, "AA")),
-                "expected_result": {"AA": [1, 3, 4]},
+                "expected_result": {"AA": [(1, 1), (3, 4)]},
             },
             {
                 "input_data": (
                     (1, "AA"), (2, "AA"), (3, "AA"), 
                     (1, "BB"), (2, "BB"), (3, "BB")
                 ),
-                "expected_result": {"AA": [1, 2, 3], "BB": [1, 2, 3]},
+                "expected_result": {"AA": [(1, 3)], "BB": [(1, 3)]},
             },
             {
+                # series met again continue their last run, order is kept
                 "input_data": (
                     (1, "AA"), (2, "BB"), (3, "AA"), 
                     (1, "BB"), (2, "AA"), (3, "BB")
                 ),
-                "expected_result": {"AA": [1, 3, 2], "BB": [2, 1, 3]},
+                "expected_result": {
+                    "AA": [(1, 1), (3, 3), (2, 2)],
+                    "BB": [(2, 2), (1, 1), (3, 3)],
+                },
             },
         )
-        rep = ReportService(None)  # noqa
         for data in test_data:
             self.assertDictEqual(
-                rep._goruped_numbers(data["input_data"]),
+                _build_ranges(data["input_data"]),
                 data["expected_result"]
             )
 
@@ -229,6 +245,407 @@ class ReportTest(unittest.TestCase):
                 data["expected_result"]
             )
 
+    def test_query_plans(self):
+        params = {
+            "blanks_by_date_and_status": (1, "2024-10-01", "2024-11-01"),
+            "new_blanks": ("2024-10-01", "2024-11-01"),
+            "clean_blanks_at_month_begin": ("2024-10-01", "2024-10-01"),
+            "dated_blanks": ("2024-10-01", "2024-11-01"),
+            "added_blanks": ("2024-10-01", "2024-11-01", "2024-11-01"),
+            "movements": {"start": "2024-10-01", "next_start": "2024-11-01"},
+        }
+        with self.get_connection() as conn:
+            for queries in (Queries, IntervalQueries):
+                for name, query_params in params.items():
+                    plan = conn.execute(
+                        f"EXPLAIN QUERY PLAN {getattr(queries, name)}",
+                        query_params
+                    ).fetchall()
+                    for *_, detail in plan:
+                        self.assertNotRegex(
+                            detail,
+                            r"^SCAN (blanks|blank_intervals)\b",
+                            f"{queries.__name__}.{name}"
+                        )
+
+    def test_movements_match_per_category(self):
+        rnd = Random(8)
+        days = [
+            f"2024-{m:02}-{d:02} {h:02}:00:00"
+            for m in range(1, 13) for d in (1, 15, 28) for h in (0, 23)
+        ]
+        rows = []
+        for series in ("AA", "AB", "ZZ"):
+            for number in rnd.sample(range(1, 400), 300):
+                created_at = rnd.choice(days)
+                date, status = rnd.choice(
+                    ((None, 0), (rnd.choice(days), rnd.randint(0, 3)))
+                )
+                rows.append((series, number, created_at, date, status))
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at, date, status) "
+                "VALUES(?,?,?,?,?)",
+                rows
+            )
+            conn.execute(
+                "UPDATE blanks SET deleted_at = created_at WHERE number % 17 = 0"
+            )
+        rep = ReportService(self.get_connection)
+        interval_rep = IntervalReportService(self.get_connection)
+        months = [(2024, m) for m in range(1, 13)] + [(2025, 1)]
+        expected = [rep._get_report_by_category(*i) for i in months]
+        for month, report in zip(months, expected):
+            self.assertEqual(
+                repr(report), repr(rep.get_period_reports(*month, *month)[0])
+            )
+        IntervalBlankCRUD(self.get_connection).import_blanks()
+        for month, report in zip(months, expected):
+            self.assertEqual(
+                repr(report),
+                repr(interval_rep.get_period_reports(*month, *month)[0])
+            )
+
+    def test_period_matches_monthly(self):
+        rnd = Random(9)
+        days = [
+            f"{y}-{m:02}-{d:02} 12:00:00"
+            for y in (2023, 2024) for m in range(1, 13) for d in (1, 28)
+        ]
+        rows = []
+        for series in ("AA", "AB"):
+            for number in range(1, 300):
+                created_at = rnd.choice(days)
+                date = rnd.choice((None, rnd.choice(days)))
+                rows.append(
+                    (series, number, created_at, date, 0 if date is None else 1)
+                )
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at, date, status) "
+                "VALUES(?,?,?,?,?)",
+                rows
+            )
+        rep = self._closing_service()
+        months = [(2023, m) for m in range(11, 13)] + [(2024, m) for m in range(1, 7)]
+        expected = [rep._get_report_by_category(*i) for i in months]
+        # snapshot in the middle of the period
+        rep.get_period_reports(2024, 2, 2024, 2)
+        self.assertEqual(
+            repr(expected), repr(rep.get_period_reports(2023, 11, 2024, 6))
+        )
+        self.assertEqual(
+            repr(expected), repr(rep.get_period_reports(2023, 11, 2024, 6))
+        )
+        self.assertEqual(
+            repr(expected[1]), repr(period_totals(expected[1:2]))
+        )
+        totals = period_totals(expected)
+        self.assertEqual(expected[0]["clean_at_begin"], totals["clean_at_begin"])
+        self.assertEqual(expected[-1]["clean_at_end"], totals["clean_at_end"])
+        self.assertEqual(
+            repr(rep._get_ranges(
+                (number, series)
+                for series, number, _, date, _ in sorted(rows, key=lambda i: i[:2])
+                if date is not None and "2023-11" <= date[:7] <= "2024-06"
+            )),
+            repr(totals["use"])
+        )
+        IntervalBlankCRUD(self.get_connection).import_blanks()
+        self.assertEqual(
+            repr(expected),
+            repr(
+                IntervalReportService(self.get_connection)
+                .get_period_reports(2023, 11, 2024, 6)
+            )
+        )
+
+    def _closing_service(self) -> ReportService:
+        """Service saving closes at once, as the writer would"""
+        rep = ReportService(
+            self.get_connection,
+            on_close=lambda *args: rep.save_closes(*args)
+        )
+        return rep
+
+    def _closes(self) -> list[str]:
+        with self.get_connection() as conn:
+            return [
+                i[0] for i in conn.execute(
+                    "SELECT month FROM month_closes ORDER BY month"
+                )
+            ]
+
+    def test_save_closes(self):
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at) VALUES(?,?,?)",
+                [("AA", i, f"2024-0{i}-10 00:00:00") for i in range(1, 6)]
+            )
+        queued = []
+        rep = ReportService(self.get_connection, on_close=lambda *i: queued.append(i))
+        rep.get_period_reports(2024, 4, 2024, 4)
+        self.assertEqual([], self._closes(), "reports only read")
+        (version, closes), = queued
+        self.assertEqual(["2024-03-01", "2024-04-01"], [i[0] for i in closes])
+        # a write logged after the report changed 2024-04 and later
+        with self.get_connection() as conn:
+            conn.execute(
+                "INSERT INTO data_changes(since) VALUES('2024-04-02 00:00:00')"
+            )
+        self.assertEqual(1, rep.save_closes(version, closes))
+        self.assertEqual(["2024-03-01"], self._closes())
+        self.assertEqual(0, rep.save_closes(version + 1, closes[:1]))
+        rep.get_period_reports(2024, 4, 2024, 4)
+        self.assertEqual(1, rep.save_closes(*queued[-1]))
+        self.assertEqual(["2024-03-01", "2024-04-01"], self._closes())
+        self.assertEqual(
+            repr(rep._get_report_by_category(2024, 5)),
+            repr(rep.get_period_reports(2024, 5, 2024, 5)[0])
+        )
+
+    def _clean_scans(self) -> int:
+        """Count of clean ranges queries over the whole history so far"""
+        return sum(
+            metrics.DB_QUERY_DURATION._series.get(
+                ("Queries.clean_blanks_at_month_begin",), [0]
+            )[:-1]
+        )
+
+    def test_report_from_snapshot(self):
+        rnd = Random(13)
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at, date, status) "
+                "VALUES('AA', ?, ?, ?, ?)",
+                [
+                    (
+                        number,
+                        f"2024-{rnd.randint(1, 8):02}-10 00:00:00",
+                        f"2024-{month:02}-20 00:00:00" if month else None,
+                        rnd.randint(1, 3) if month else 0
+                    )
+                    for number in range(1, 200)
+                    for month in (rnd.choice((None, rnd.randint(1, 8))),)
+                ]
+            )
+        rep = self._closing_service()
+        expected = {
+            month: rep._get_report_by_category(2024, month) for month in (6, 7)
+        }
+        scans = self._clean_scans()
+        self.assertEqual(repr(expected[6]), repr(rep.get_report(2024, 6)))
+        self.assertEqual(scans + 1, self._clean_scans(), "May is not closed")
+        self.assertEqual(["2024-05-01", "2024-06-01"], self._closes())
+        # from the June snapshot on, history is not scanned
+        self.assertEqual(repr(expected[6]), repr(rep.get_report(2024, 6)))
+        self.assertEqual(repr(expected[7]), repr(rep.get_report(2024, 7)))
+        self.assertEqual(scans + 1, self._clean_scans())
+        self.assertEqual(
+            ["2024-05-01", "2024-06-01", "2024-07-01"], self._closes()
+        )
+
+    def test_writes_drop_closes(self):
+        rep = self._closing_service()
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at) VALUES('AA',?,?)",
+                [(1, "2024-01-10 00:00:00"), (2, "2024-04-05 00:00:00")]
+            )
+        rep.get_report(2024, 4)
+        self.assertEqual(["2024-03-01", "2024-04-01"], self._closes())
+        crud = BlankCRUD(self.get_connection)
+        # created now, after the closed months
+        crud.create_from_range(BlankRangeInDTO(series="AB", start=1, end=3))
+        crud.update(BlankUpdateDTO(id=1, comment="not in reports"))
+        self.assertEqual(["2024-03-01", "2024-04-01"], self._closes())
+        crud.update(
+            BlankUpdateDTO(
+                id=2, date=datetime.date(2024, 4, 20), status=BlankStatus.Use
+            )
+        )
+        self.assertEqual(["2024-03-01"], self._closes())
+        self.assertEqual(
+            repr(rep._get_report_by_category(2024, 4)), repr(rep.get_report(2024, 4))
+        )
+        self.assertEqual(["2024-03-01", "2024-04-01"], self._closes())
+        # a deleted blank leaves clean ranges from when it is created
+        crud.delete(1)
+        self.assertEqual([], self._closes())
+
+        interval_crud = IntervalBlankCRUD(self.get_connection)
+        interval_crud.import_blanks()
+        interval_rep = IntervalReportService(
+            self.get_connection,
+            on_close=lambda *args: interval_rep.save_closes(*args)
+        )
+        interval_rep.get_report(2024, 4)
+        self.assertEqual(["2024-03-01", "2024-04-01"], self._closes())
+        # splits and merges of a comment change no report
+        interval_crud.update(
+            BlankUpdateDTO(id=blank_id("AB", 2), comment="split")
+        )
+        self.assertEqual(["2024-03-01", "2024-04-01"], self._closes())
+        interval_crud.update(
+            BlankUpdateDTO(id=blank_id("AA", 2), date=datetime.date(2024, 3, 1))
+        )
+        self.assertEqual([], self._closes())
+        self.assertEqual(
+            repr(interval_rep._get_report_by_category(2024, 4)),
+            repr(interval_rep.get_report(2024, 4))
+        )
+
+    def test_snapshots_follow_back_dated_updates(self):
+        rnd = Random(10)
+        days = [
+            f"{y}-{m:02}-{d:02} 12:00:00"
+            for y in (2023, 2024) for m in range(1, 13) for d in (1, 28)
+        ]
+        rows = [
+            (series, number, rnd.choice(days))
+            for series in ("AA", "AB")
+            for number in range(1, 300)
+        ]
+        with self.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at) VALUES(?,?,?)",
+                rows
+            )
+        rep = self._closing_service()
+        rep.max_roll_forward = 24
+        months = [(y, m) for y in (2023, 2024) for m in range(1, 13)]
+        rep.get_report(2024, 12)
+        self.assertEqual(["2024-11-01", "2024-12-01"], self._closes())
+        crud = BlankCRUD(self.get_connection)
+        for step in range(6):
+            for _ in range(40):
+                number = rnd.randint(1, 299)
+                crud.update_range(
+                    BlankRangeUpdateDTO(
+                        series=rnd.choice(("AA", "AB")),
+                        start=number,
+                        end=number,
+                        date=datetime.date.fromisoformat(rnd.choice(days)[:10]),
+                        status=rnd.randint(0, 3)
+                    )
+                )
+            if step % 2:
+                number = rnd.randint(1, 299)
+                for series in ("AA", "AB"):
+                    crud.delete_range(
+                        BlankRangeInDTO(series=series, start=number, end=number)
+                    )
+            for month in rnd.sample(months, 6):
+                expected = repr(rep._get_report_by_category(*month))
+                self.assertEqual(expected, repr(rep.get_report(*month)), month)
+                self.assertEqual(
+                    expected,
+                    repr(rep.get_period_reports(*month, *month)[0]),
+                    month
+                )
+
     def tearDown(self):
         if os.path.exists(self.test_db_path):
             os.remove(self.test_db_path)
+
+
+class PeriodEndpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # main initializes the BSO_DB_PATH database on import
+        import main
+        from fastapi.testclient import TestClient
+        cls.main = main
+        cls.client = TestClient(main.app)
+        cls.get_connection = partial(get_connection, main.database.DB_PATH)
+
+    def setUp(self):
+        rnd = Random(12)
+        days = [
+            f"2024-{m:02}-{d:02} 12:00:00" for m in range(1, 7) for d in (1, 28)
+        ]
+        rows = []
+        for number in range(1, 200):
+            date = rnd.choice((None, rnd.choice(days)))
+            rows.append(
+                ("AA", number, rnd.choice(days), date, 0 if date is None else 1)
+            )
+        with self.get_connection() as conn:
+            conn.execute("DELETE FROM blanks")
+            conn.execute("DELETE FROM month_closes")
+            conn.executemany(
+                "INSERT INTO blanks(series, number, created_at, date, status) "
+                "VALUES(?,?,?,?,?)",
+                rows
+            )
+            # closes still queued from a previous test are skipped
+            conn.execute("INSERT INTO data_changes(since) VALUES(NULL)")
+        self.main.app.state.report_cache = ReportCache()
+        self.rep = ReportService(self.get_connection)
+
+    def tearDown(self):
+        # queued closes are written before the next test changes data
+        self.main.app.state.crud.writer.submit(lambda: None).result()
+
+    def _get(self, start: tuple[int, int], end: tuple[int, int]):
+        return self.client.get(
+            "/report/period",
+            params={
+                "start_year": start[0], "start_month": start[1],
+                "end_year": end[0], "end_month": end[1],
+            }
+        )
+
+    def _expected(self, months: list[tuple[int, int]]) -> list[dict]:
+        return [
+            json.loads(json.dumps(self.rep._get_report_by_category(*i)))
+            for i in months
+        ]
+
+    def test_period_limits(self):
+        last = self.main.MAX_PERIOD_MONTHS - 1
+        end = (2024 + last // 12, last % 12 + 1)
+        self.assertEqual(200, self._get((2024, 1), end).status_code)
+        end = (2024 + (last + 1) // 12, (last + 1) % 12 + 1)
+        self.assertEqual(400, self._get((2024, 1), end).status_code)
+        self.assertEqual(400, self._get((2024, 2), (2024, 1)).status_code)
+        self.assertEqual(422, self._get((2024, 13), (2025, 1)).status_code)
+
+    def test_period_shape(self):
+        response = self._get((2024, 2), (2024, 4))
+        self.assertEqual(200, response.status_code)
+        body = response.json()
+        self.assertEqual({*CATEGORIES, "months"}, set(body))
+        months = [(2024, 2), (2024, 3), (2024, 4)]
+        expected = self._expected(months)
+        self.assertEqual(
+            [
+                {"year": year, "month": month, **report}
+                for (year, month), report in zip(months, expected)
+            ],
+            body["months"]
+        )
+        totals = json.loads(json.dumps(period_totals(
+            [self.rep._get_report_by_category(*i) for i in months]
+        )))
+        self.assertEqual(totals, {k: v for k, v in body.items() if k != "months"})
+
+    def test_partially_cached_period(self):
+        for month in (1, 2):
+            self.client.get("/report", params={"year": 2024, "month": month})
+        report_cache = self.main.app.state.report_cache
+        # cached months are served as they are
+        cached = {i: {} for i in CATEGORIES}
+        report_cache.put(2024, 1, cached, report_cache.version)
+        months = [(2024, m) for m in range(1, 6)]
+        body = self._get(months[0], months[-1]).json()
+        self.assertEqual({"year": 2024, "month": 1, **cached}, body["months"][0])
+        self.assertEqual(
+            self._expected(months[1:]),
+            [
+                {k: v for k, v in i.items() if k not in ("year", "month")}
+                for i in body["months"][1:]
+            ]
+        )
+        self.assertEqual(5, report_cache.stats()["size"])
+        self.assertEqual(body, self._get(months[0], months[-1]).json())
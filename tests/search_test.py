@@ -0,0 +1,100 @@
+import os
+import unittest
+from random import random
+from functools import partial
+
+import loggers
+from blanks.crud import BlankCRUD
+from blanks.interval_crud import IntervalBlankCRUD
+from blanks.models import BlankRangeInDTO
+from blanks.search import NumberPattern, number_filter, parse_number_pattern
+from database import init_database, get_connection
+
+PATTERNS = (
+    "AF15", "af15", "AF150", "AF0", "AF015", "AF1%", "AF15%", "AF%",
+    "AF", "AF99999999", "AF%5", "A%", "_F15", "AF1_", "%", "ZZ1%", "AF%%",
+)
+
+
+class ParseNumberPatternTest(unittest.TestCase):
+    def test_parse(self):
+        test_data = (
+            ("AF15", NumberPattern("AF", ((15, 15),))),
+            ("af15", NumberPattern("AF", ((15, 15),))),
+            ("жЯ15", NumberPattern("жЯ", ((15, 15),))),
+            ("AF%", NumberPattern("AF", None)),
+            ("AF", NumberPattern("AF", ())),
+            ("AF99999999", NumberPattern("AF", ())),
+            ("AF0%", NumberPattern("AF", ((0, 0),))),
+            (
+                "AF99999%",
+                NumberPattern("AF", ((99999, 99999), (999990, 999999), (9999900, 9999999)))
+            ),
+        )
+        for pattern, expected in test_data:
+            self.assertEqual(expected, parse_number_pattern(pattern), pattern)
+        self.assertEqual(7, len(parse_number_pattern("AF1%").ranges))
+
+    def test_fallback(self):
+        for pattern in ("AF015", "AF1_", "_F15", "%15", "AF%5", "A%"):
+            self.assertIsNone(parse_number_pattern(pattern), pattern)
+            self.assertEqual(
+                ("WHERE series||number LIKE ?", (pattern,)),
+                number_filter(pattern)
+            )
+
+
+class SearchTest(unittest.TestCase):
+    def setUp(self):
+        self.test_db_path = os.path.join(
+            os.getcwd(),
+            f"{random()*1000}.sqlite3"
+        )
+        self.get_connection = partial(get_connection, self.test_db_path)
+        init_database(self.test_db_path)
+        crud = BlankCRUD(self.get_connection)
+        for series, start, end in (
+            ("AF", 0, 20), ("AF", 100, 160), ("AF", 1490, 1510), ("AA", 1, 30)
+        ):
+            crud.create_from_range(
+                BlankRangeInDTO(series=series, start=start, end=end)
+            )
+        crud.delete(crud.search("AF151")[0].id)
+
+    def tearDown(self):
+        os.remove(self.test_db_path)
+
+    def _assert_like(self, crud: BlankCRUD):
+        for pattern in PATTERNS:
+            expected = [
+                (i.series, i.number)
+                for i in BlankCRUD.read_with_filter(
+                    crud, "WHERE series||number LIKE ?", (pattern,)
+                )
+            ]
+            found = [(i.series, i.number) for i in crud.search(pattern)]
+            self.assertListEqual(sorted(expected), sorted(found), pattern)
+            pages, after = [], None
+            while page := crud.search(pattern, 4, after):
+                pages += [(i.series, i.number) for i in page]
+                after = page[-1].id
+            self.assertListEqual(sorted(found), sorted(pages), pattern)
+
+    def test_matches_like(self):
+        self._assert_like(BlankCRUD(self.get_connection))
+
+    def test_interval_matches_like(self):
+        crud = IntervalBlankCRUD(self.get_connection)
+        crud.import_blanks()
+        self._assert_like(crud)
+
+    def test_query_plans(self):
+        with self.get_connection() as conn:
+            for pattern in ("AF15", "AF15%", "AF%"):
+                raw_filter, params = number_filter(pattern)
+                plan = conn.execute(
+                    f"EXPLAIN QUERY PLAN SELECT * FROM c_blanks {raw_filter}",
+                    params
+                ).fetchall()
+                for *_, detail in plan:
+                    self.assertNotRegex(detail, r"^SCAN blanks\b", pattern)